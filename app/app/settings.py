@@ -87,14 +87,35 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # postgresql with health checks and an optional pool , see core/db
+        'ENGINE': 'core.db',
         'HOST':os.environ.get('DB_HOST'),
         'NAME':os.environ.get('DB_NAME'),
         'USER':os.environ.get('DB_USER'),
         'PASSWORD':os.environ.get('DB_PASS'),
+        # seconds a worker thread keeps its connection for the next requests ,
+        # 0 opens a new one per request
+        'CONN_MAX_AGE':int(os.environ.get('DB_CONN_MAX_AGE' , 60)),
+        # ping a kept connection before its first query in a request
+        'CONN_HEALTH_CHECKS':bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS' , 1))),
+        'OPTIONS':{},
     }
 }
 
+# per worker process pool shared by its threads ( requests , image workers ) ,
+# off when DB_POOL_MAX_SIZE is 0 . idle connections are closed after
+# DB_POOL_IDLE_TIMEOUT seconds , any after DB_POOL_MAX_LIFETIME seconds
+DB_POOL_MAX_SIZE=int(os.environ.get('DB_POOL_MAX_SIZE' , 0))
+if DB_POOL_MAX_SIZE:
+    # connections go back to the pool after each request
+    DATABASES['default']['CONN_MAX_AGE']=0
+    DATABASES['default']['OPTIONS']['pool']={
+        'max_size':DB_POOL_MAX_SIZE ,
+        'idle_timeout':int(os.environ.get('DB_POOL_IDLE_TIMEOUT' , 300)) ,
+        'max_lifetime':int(os.environ.get('DB_POOL_MAX_LIFETIME' , 3600)) ,
+        'timeout':int(os.environ.get('DB_POOL_TIMEOUT' , 10)) ,
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -136,6 +157,8 @@ MEDIA_URL='/static/media/'
 
 STATIC_ROOT='/vol/web/static'
 MEDIA_ROOT='/vol/web/media'
+# uploads are stored under their sha256 , identical files are shared
+DEFAULT_FILE_STORAGE='core.storage.ContentAddressedStorage'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -144,8 +167,130 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL= 'core.User'
 
 REST_FRAMEWORK={
-    'DEFAULT_SCHEMA_CLASS':'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS':'drf_spectacular.openapi.AutoSchema',
+    # orjson backed , same output as the stdlib json ones , and msgpack for
+    # Accept: application/msgpack , see core/renderers.py
+    'DEFAULT_RENDERER_CLASSES':[
+        'core.renderers.FastJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES':[
+        'core.parsers.FastJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # 401 instead of 500 for signed access tokens of deleted users
+    'EXCEPTION_HANDLER':'user.authentication.exception_handler',
+}
+
+# default page size for cursor paginated list endpoints
+API_PAGE_SIZE=int(os.environ.get('API_PAGE_SIZE' , 50))
+
+# key of the signed access tokens ( see user/tokens.py ) , separate from
+# SECRET_KEY and at least 32 characters . without it no access token is
+# issued or accepted
+ACCESS_TOKEN_SIGNING_KEY=os.environ.get('ACCESS_TOKEN_SIGNING_KEY' , '')
+
+# authentication of the user and recipe api views , comma separated , e.g.
+# user.authentication.CachedTokenAuthentication to skip the token query .
+# db tokens ( "Token <key>" ) are accepted by default , signed access tokens
+# ( "Bearer <token>" ) too once ACCESS_TOKEN_SIGNING_KEY is set
+API_AUTHENTICATION_CLASSES=os.environ.get('API_AUTHENTICATION_CLASSES' ,
+    'rest_framework.authentication.TokenAuthentication'+(
+        ',user.authentication.SignedTokenAuthentication'
+        if ACCESS_TOKEN_SIGNING_KEY else ''
+    )).split(',')
+
+# lifetimes in seconds of signed access tokens and of refresh tokens . an
+# access token is not checked against its user , one deactivated keeps
+# access to the recipe api for up to ACCESS_TOKEN_TTL
+ACCESS_TOKEN_TTL=int(os.environ.get('ACCESS_TOKEN_TTL' , 300))
+REFRESH_TOKEN_TTL=int(os.environ.get('REFRESH_TOKEN_TTL' , 14*24*3600))
+
+# response cache of the recipe , tag and ingredient lists . the backend must
+# be shared by the uwsgi workers ( memcached , see docker-compose-deploy.yml ) ,
+# with the per process locmem default a write only invalidates the worker
+# that handled it , so the cache is off unless a shared backend is set
+API_CACHE_BACKEND=os.environ.get('API_CACHE_BACKEND' ,
+    'django.core.cache.backends.locmem.LocMemCache')
+API_CACHE_SHARED=not API_CACHE_BACKEND.endswith(('.LocMemCache' , '.DummyCache'))
+API_CACHE_ENABLED=bool(int(os.environ.get('API_CACHE_ENABLED' , API_CACHE_SHARED)))
+API_CACHE_ALIAS='api'
+# ETag / Last-Modified of the recipe endpoints , derived from a change marker
+# kept in the api cache , so also off without a shared backend : a worker
+# that never saw a write would answer 304 to an outdated ETag indefinitely
+API_CONDITIONAL_GET=bool(int(os.environ.get('API_CONDITIONAL_GET' , API_CACHE_SHARED)))
+API_CACHE_TIMEOUT=int(os.environ.get('API_CACHE_TIMEOUT' , 300))
+
+CACHES={
+    'default':{
+        'BACKEND':'django.core.cache.backends.locmem.LocMemCache',
+    },
+    API_CACHE_ALIAS:{
+        'BACKEND':API_CACHE_BACKEND,
+        'LOCATION':os.environ.get('API_CACHE_LOCATION' , 'api-responses'),
+    },
+}
+
+# token -> user cache of CachedTokenAuthentication . the alias names the
+# shared cache that propagates revocations to every worker , the api cache
+# when it is shared . without one nothing is cached , a worker could not
+# learn about a token revoked or a user deactivated by another one .
+# local hits check the shared generation at most every SYNC_INTERVAL
+# seconds , the delay before the other workers see a revocation ( 0 checks
+# on every request , a shared cache round trip each )
+AUTH_TOKEN_CACHE_SIZE=int(os.environ.get('AUTH_TOKEN_CACHE_SIZE' , 10000))
+AUTH_TOKEN_CACHE_TTL=int(os.environ.get('AUTH_TOKEN_CACHE_TTL' , 300))
+AUTH_TOKEN_CACHE_SYNC_INTERVAL=float(
+    os.environ.get('AUTH_TOKEN_CACHE_SYNC_INTERVAL' , 1)
+)
+AUTH_TOKEN_CACHE_ALIAS=os.environ.get('AUTH_TOKEN_CACHE_ALIAS') or \
+    (API_CACHE_ALIAS if API_CACHE_SHARED else None)
+
+# serve recipe , tag and ingredient list / retrieve from .values() rows instead
+# of model instances , same output , see recipe/fastpath.py
+API_FAST_SERIALIZERS=bool(int(os.environ.get('API_FAST_SERIALIZERS' , 1)))
+
+# ?page_size=all streams recipe , tag and ingredient lists , reading and
+# serializing this many rows at a time , see recipe/streaming.py
+API_STREAM_CHUNK_SIZE=int(os.environ.get('API_STREAM_CHUNK_SIZE' , 500))
+
+# max suggestions returned by the tag / ingredient autocomplete endpoint
+AUTOCOMPLETE_MAX_RESULTS=int(os.environ.get('AUTOCOMPLETE_MAX_RESULTS' , 10))
+
+# background processing of uploaded recipe images , see recipe/images.py .
+# IMAGE_WORKERS threads per process , uploads beyond IMAGE_BACKLOG queued jobs
+# stay pending until IMAGE_STALE_AFTER below or `manage.py process_images`
+IMAGE_WORKERS=int(os.environ.get('IMAGE_WORKERS' , 2))
+IMAGE_BACKLOG=int(os.environ.get('IMAGE_BACKLOG' , 32))
+# images pending for longer ( rejected by a full pool , queued in a worker
+# that exited ) are queued again by the pool , checked at most this often
+IMAGE_STALE_AFTER=int(os.environ.get('IMAGE_STALE_AFTER' , 600))
+# bounding box of every generated variant , full replaces the upload
+RECIPE_IMAGE_SIZES={
+    'full':2048 ,
+    'large':1280 ,
+    'medium':640 ,
+    'thumb':160 ,
 }
+RECIPE_IMAGE_QUALITY=int(os.environ.get('RECIPE_IMAGE_QUALITY' , 80))
+
+# on demand resized recipe images , see recipe/variants.py . only the
+# allowed widths are rendered , kept on disk in IMAGE_VARIANT_ROOT up to
+# IMAGE_VARIANT_MAX_BYTES ( least recently used are evicted first )
+IMAGE_VARIANT_WIDTHS=[80 , 160 , 320 , 640 , 1280]
+IMAGE_VARIANT_ROOT=os.environ.get('IMAGE_VARIANT_ROOT' , '/vol/web/cache/variants')
+IMAGE_VARIANT_MAX_BYTES=int(
+    os.environ.get('IMAGE_VARIANT_MAX_BYTES' , 512*1024*1024)
+)
+# nginx internal location aliasing IMAGE_VARIANT_ROOT , empty to let django
+# send the file itself ( runserver , tests )
+IMAGE_VARIANT_ACCEL_PREFIX=os.environ.get('IMAGE_VARIANT_ACCEL_PREFIX' , '')
+
+# max operations accepted by the recipe batch endpoint
+RECIPE_BATCH_MAX_SIZE=int(os.environ.get('RECIPE_BATCH_MAX_SIZE' , 100))
 
 SPECTACULAR_SETTINGS = {
 'COMPONENT_SPLIT_REQUEST':True,
@@ -22,6 +22,8 @@ from drf_spectacular.views import (
     SpectacularSwaggerView
 )
 
+from core.views import DatabaseStatsView , ResponseCacheStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema/' , SpectacularAPIView.as_view() , name='api-schema'),# yml schema used by swagger
@@ -29,6 +31,9 @@ urlpatterns = [
         name='api-docs'),
     path('api/user/' , include('user.urls')) ,
     path('api/recipe/' , include('recipe.urls')) ,
+    path('api/health/db/' , DatabaseStatsView.as_view() , name='db-stats'),# per worker pool stats
+    path('api/health/cache/' , ResponseCacheStatsView.as_view() ,
+        name='cache-stats'),# response cache hits and misses
 
 ]
 # development stage 
@@ -0,0 +1,14 @@
+'''
+which cache backends are shared by the worker processes .
+'''
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# entries of these only exist in the process that wrote them
+PROCESS_LOCAL_BACKENDS=(LocMemCache , DummyCache)
+
+
+def is_shared_cache(alias):
+    ''' whether every worker process reads the writes of the others to alias '''
+    return not isinstance(caches[alias] , PROCESS_LOCAL_BACKENDS)
@@ -0,0 +1,155 @@
+'''
+postgresql backend with connection health checks and an optional pool .
+
+CONN_HEALTH_CHECKS ( as in django 4.1 ) pings a persistent connection
+before its first use in a request , a connection the server dropped while
+idle is replaced instead of failing the request .
+
+OPTIONS['pool'] ( True or a dict of core.db.pool.ConnectionPool arguments ,
+named like the pool option of django 5.1 ) shares the connections of the
+threads of a worker process through a ConnectionPool : closing a connection
+hands it back to the pool , opening one takes an idle one from it . use it
+with CONN_MAX_AGE=0 so connections go back to the pool after each request .
+'''
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.base import Database
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool , PoolTimeout
+
+_pools={}
+_pools_lock=threading.Lock()
+
+
+def _ping(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except Database.Error:
+        return False
+    return True
+
+
+def _broken(connection):
+    ''' whether a released connection can not be handed out again '''
+    if connection.closed:
+        return True
+    status=connection.get_transaction_status()
+    if status in (extensions.TRANSACTION_STATUS_INTRANS ,
+            extensions.TRANSACTION_STATUS_INERROR):
+        # left in a transaction , e.g. closed inside atomic()
+        try:
+            connection.rollback()
+        except Database.Error:
+            return True
+        return False
+    # ACTIVE ( a query still running ) or UNKNOWN ( connection lost )
+    return status != extensions.TRANSACTION_STATUS_IDLE
+
+
+def pool_stats():
+    ''' {alias:stats} of the pools of the current process '''
+    pid=os.getpid()
+    with _pools_lock:
+        return {
+            alias:pool.stats()
+            for (pool_pid , alias , _) , pool in _pools.items()
+            if pool_pid == pid
+        }
+
+
+def close_pools():
+    ''' close the idle connections of the pools of the current process '''
+    pid=os.getpid()
+    with _pools_lock:
+        pools=[pool for (pool_pid , _ , _) , pool in _pools.items() if pool_pid == pid]
+    for pool in pools:
+        pool.close_all()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self , *args , **kwargs):
+        super().__init__(*args , **kwargs)
+        self.health_check_done=False
+        # pool of the current connection
+        self._pool=None
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS' , False)
+
+    @property
+    def pool_options(self):
+        ''' ConnectionPool arguments , None without a pool '''
+        options=self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        return {} if options is True else dict(options)
+
+    def get_connection_params(self):
+        params=super().get_connection_params()
+        params.pop('pool' , None)
+        return params
+
+    def get_pool(self , conn_params):
+        options=self.pool_options
+        if options is None:
+            return None
+        # per process , a forked worker never uses the connections of its
+        # parent , and per database , the test runner renames it
+        key=(os.getpid() , self.alias , repr(sorted(conn_params.items())))
+        with _pools_lock:
+            pool=_pools.get(key)
+            if pool is None:
+                # any wrapper of the alias opens them the same way
+                connect=super().get_new_connection
+                pool=_pools[key]=ConnectionPool(
+                    lambda: connect(conn_params) ,
+                    check=_ping if self.health_check_enabled else None ,
+                    discard=_broken ,
+                    **options ,
+                )
+        return pool
+
+    def get_new_connection(self , conn_params):
+        pool=self._pool=self.get_pool(conn_params)
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection=pool.acquire()
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+        self.isolation_level=connection.isolation_level
+        return connection
+
+    def _close(self):
+        if self._pool is None or self.connection is None:
+            return super()._close()
+        self._pool.release(self.connection)
+
+    def connect(self):
+        # a new or pool checked connection , nothing to check this request ,
+        # set first as connect() itself goes through ensure_connection()
+        self.health_check_done=True
+        super().connect()
+
+    def ensure_connection(self):
+        if self.connection is not None and self.health_check_enabled \
+                and not self.health_check_done and not self.in_atomic_block:
+            self.health_check_done=True
+            if not self.is_usable():
+                # reopened right below
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # called when a request starts and finishes , check the kept
+        # connection again before it serves the next one
+        self.health_check_done=False
@@ -0,0 +1,161 @@
+'''
+in process database connection pool , see core.db.base .
+
+every worker process keeps up to max_size open connections shared by its
+threads . a connection is handed out again , most recently used first ,
+until it sat idle for idle_timeout seconds or lived for max_lifetime
+seconds , then it is closed and replaced ( stale connections , memory held
+by long lived backends ) . callers wait up to timeout seconds for a free
+connection once max_size are in use .
+'''
+import threading
+import time
+from collections import Counter
+
+
+class PoolTimeout(Exception):
+    ''' no connection became free within the pool timeout '''
+
+
+class ConnectionPool:
+
+    def __init__(self , connect , max_size=4 , idle_timeout=300 ,
+                 max_lifetime=3600 , timeout=10 , check=None , discard=None):
+        '''
+        connect() opens a new raw connection , check(connection) tells
+        whether an idle one still works before it is handed out , and
+        discard(connection) tells whether a released one must be closed
+        instead of kept ( broken or in an unknown state )
+        '''
+        self._connect=connect
+        self._check=check
+        self._discard=discard
+        self.max_size=max_size
+        self.idle_timeout=idle_timeout
+        self.max_lifetime=max_lifetime
+        self.timeout=timeout
+        self._lock=threading.Condition()
+        # ( connection , released at ) , most recently released last
+        self._idle=[]
+        # connection -> opened at , idle or in use
+        self._opened={}
+        # slots reserved by callers opening a connection outside the lock
+        self._opening=0
+        self._counts=Counter()
+
+    def _close(self , connection , reason):
+        self._opened.pop(connection , None)
+        self._counts[reason]+=1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _stale(self , connection , now):
+        return now-self._opened[connection] > self.max_lifetime
+
+    def _expire(self , now):
+        ''' close the connections idle for longer than idle_timeout '''
+        while self._idle and now-self._idle[0][1] > self.idle_timeout:
+            connection , _ = self._idle.pop(0)
+            self._close(connection , 'expired')
+
+    def _take(self , deadline):
+        '''
+        the most recently released usable idle connection , or None once a
+        slot is reserved to open a new one
+        '''
+        waited=False
+        with self._lock:
+            while True:
+                now=time.monotonic()
+                self._expire(now)
+                while self._idle:
+                    connection , _ = self._idle.pop()
+                    if not self._stale(connection , now):
+                        return connection
+                    self._close(connection , 'recycled')
+                if len(self._opened)+self._opening < self.max_size:
+                    self._opening+=1
+                    return None
+                remaining=deadline-now
+                if remaining <= 0:
+                    self._counts['timeouts']+=1
+                    raise PoolTimeout(
+                        f'no connection free in {self.timeout}s , '
+                        f'{self.max_size} in use'
+                    )
+                if not waited:
+                    self._counts['waits']+=1
+                    waited=True
+                self._lock.wait(remaining)
+
+    def _open(self):
+        # connecting takes a round trip or more , do not hold the lock
+        try:
+            connection=self._connect()
+        except Exception:
+            with self._lock:
+                self._opening-=1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._opening-=1
+            self._opened[connection]=time.monotonic()
+            self._counts['opened']+=1
+        return connection
+
+    def acquire(self):
+        deadline=time.monotonic()+self.timeout
+        while True:
+            connection=self._take(deadline)
+            if connection is None:
+                return self._open()
+            # the server may have closed it meanwhile ( restart , timeout )
+            if self._check is None or self._check(connection):
+                with self._lock:
+                    self._counts['reused']+=1
+                return connection
+            with self._lock:
+                self._close(connection , 'failed_checks')
+                self._lock.notify()
+
+    def release(self , connection):
+        discard=self._discard is not None and self._discard(connection)
+        with self._lock:
+            if connection not in self._opened:
+                # opened before a fork or already closed
+                return
+            now=time.monotonic()
+            if discard:
+                self._close(connection , 'discarded')
+            elif self._stale(connection , now):
+                self._close(connection , 'recycled')
+            else:
+                self._idle.append((connection , now))
+            self._expire(now)
+            self._lock.notify()
+
+    def close_all(self):
+        ''' close the idle connections , e.g. before the process exits '''
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop()[0] , 'expired')
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            idle=len(self._idle)
+            size=len(self._opened)
+            return {
+                'max_size':self.max_size ,
+                'size':size ,
+                'idle':idle ,
+                'in_use':size-idle ,
+                **{
+                    name:self._counts.get(name , 0) for name in (
+                        'opened' , 'reused' , 'expired' , 'recycled' ,
+                        'failed_checks' , 'discarded' , 'waits' , 'timeouts'
+                    )
+                } ,
+            }
@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, model_name, relation):
+    '''
+    keep the oldest row of every ( user , name ) group , move the recipe
+    links of the other rows onto it and delete them
+    '''
+    Model = apps.get_model('core', model_name)
+    Recipe = apps.get_model('core', 'Recipe')
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    target = f'{field.m2m_reverse_field_name()}_id'
+
+    groups = Model.objects.values('user_id', 'name')\
+        .annotate(rows=Count('id'), keep=Min('id'))\
+        .filter(rows__gt=1)
+    for group in groups.iterator():
+        duplicates = Model.objects.filter(
+            user_id=group['user_id'], name=group['name'],
+        ).exclude(id=group['keep']).values_list('id', flat=True)
+        for duplicate in duplicates:
+            linked = through.objects.filter(**{target: group['keep']})\
+                .values('recipe_id')
+            # recipes already linked to the kept row only lose the duplicate
+            through.objects.filter(
+                recipe_id__in=linked, **{target: duplicate}
+            ).delete()
+            through.objects.filter(**{target: duplicate})\
+                .update(**{target: group['keep']})
+        Model.objects.filter(id__in=list(duplicates)).delete()
+
+
+def merge_tags_and_ingredients(apps, schema_editor):
+    merge_duplicates(apps, 'Tag', 'tags')
+    merge_duplicates(apps, 'Ingredient', 'ingredients')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auto_20241218_0359'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_tags_and_ingredients, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:26
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models.functions import Concat, Lower
+
+
+def create_search_index(apps, schema_editor):
+    ''' GIN index the search vector and fill it for existing recipes '''
+    Recipe = apps.get_model('core', 'Recipe')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx ON core_recipe '
+            'USING GIN (search_vector)'
+        )
+        document = SearchVector('title', weight='A', config='english') + \
+            SearchVector('description', weight='B', config='english')
+    else:
+        document = Lower(Concat('title', models.Value(' '), 'description',
+            output_field=models.TextField()))
+    Recipe.objects.using(schema_editor.connection.alias)\
+        .update(search_vector=document)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_indexes_and_unique_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # GinIndex is postgres only , keep the migration runnable on sqlite
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
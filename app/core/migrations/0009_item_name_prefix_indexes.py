@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+PREFIX_INDEXES = {
+    'core_tag': 'tag_name_prefix_idx',
+    'core_ingredient': 'ingredient_name_prefix_idx',
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    ''' case insensitive prefix indexes for tag / ingredient autocomplete '''
+    # text_pattern_ops lets LIKE 'abc%' on lower(name) use a btree range
+    # scan whatever the database collation is
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, index in PREFIX_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX {index} ON {table} '
+            f'(user_id, lower(name) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in PREFIX_INDEXES.values():
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_refreshtoken'),
+    ]
+
+    operations = [
+        # functional indexes with an opclass are not expressible with
+        # models.Index on django 3.2
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
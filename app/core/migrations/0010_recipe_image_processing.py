@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+def mark_existing_images(apps, schema_editor):
+    ''' queue images uploaded before the pipeline for process_images '''
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.using(schema_editor.connection.alias)\
+        .exclude(image__isnull=True).exclude(image='')\
+        .update(image_status='pending')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_item_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(mark_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:49
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def count_references(apps, schema_editor):
+    ''' reference counts of the media files already used by recipes '''
+    Recipe = apps.get_model('core', 'Recipe')
+    StoredFile = apps.get_model('core', 'StoredFile')
+    db = schema_editor.connection.alias
+    counts = Counter()
+    rows = Recipe.objects.using(db).exclude(image__isnull=True)\
+        .exclude(image='').values_list('image', 'image_variants')
+    for image, variants in rows.iterator():
+        counts.update([image, *(variants or {}).values()])
+    StoredFile.objects.using(db).bulk_create(
+        [StoredFile(name=name, refcount=count) for name, count in counts.items()],
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_image_processing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_storedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
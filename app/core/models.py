@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models , connections , transaction , IntegrityError
+from django.db.models.functions import Concat , Lower
 from django.conf import settings
+from django.contrib.postgres.search import SearchVector , SearchVectorField
 import uuid
 import os
 # Create your models here.
@@ -10,9 +12,27 @@ from django.contrib.auth.models import (
 )
 
 def recipe_image_file_path(instance , filename):
+    # the content addressed storage names the file after its hash ,
+    # only the directory and the extension are kept
     ext=os.path.splitext(filename)[1]
-    filename=f'{uuid.uuid4()}{ext}'
-    return os.path.join( 'uploads','recipe' , filename)
+    return os.path.join( 'uploads','recipe' , f'upload{ext}')
+
+# text search configuration of the recipe search vector
+SEARCH_CONFIG='english'
+
+def search_document(vendor):
+    ''' expression computing the stored search vector of a recipe row '''
+    if vendor == 'postgresql':
+        return SearchVector('title', weight='A', config=SEARCH_CONFIG) + \
+            SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    # portable fallback , a lower cased copy of the searchable text
+    return Lower(Concat('title', models.Value(' '), 'description',
+        output_field=models.TextField()))
+
+class RecipeQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        ''' recompute the stored search vector of the selected recipes '''
+        return self.update(search_vector=search_document(connections[self.db].vendor))
 
 class UserManager(BaseUserManager):
     def create_user(self , email , password=None , **kwargs):
@@ -42,7 +62,9 @@ class User(AbstractBaseUser , PermissionsMixin):
     USERNAME_FIELD= 'email'
 
 class Recipe(models.Model):
-    user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # user lookups are served by the composite index below
+    user=models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        db_index=False)
     title=models.CharField(max_length=255)
     description=models.TextField(blank=True)
     price=models.DecimalField( max_digits=5, decimal_places=2)
@@ -50,20 +72,127 @@ class Recipe(models.Model):
     link=models.CharField(blank=True, max_length=255)
     tags=models.ManyToManyField('Tag')
     ingredients=models.ManyToManyField('Ingredient')
+    class ImageStatus(models.TextChoices):
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
     image=models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # state of the background processing of image , see recipe.images
+    image_status=models.CharField(max_length=10, blank=True,
+        choices=ImageStatus.choices)
+    # storage names of the re encoded variants of image by variant name
+    image_variants=models.JSONField(default=dict, blank=True)
+    # when the pending image was last queued , see recipe.images
+    image_queued_at=models.DateTimeField(null=True, blank=True)
+    # GIN indexed on postgres , maintained by save()
+    search_vector=SearchVectorField(null=True, editable=False)
+
+    objects=RecipeQuerySet.as_manager()
+
+    # (title , description) the stored search vector was computed from
+    _search_source=None
+
+    class Meta:
+        indexes = [
+            # per user list ordered newest first
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance=super().from_db(db, field_names, values)
+        if 'title' in field_names and 'description' in field_names:
+            instance._search_source=(instance.title, instance.description)
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # only rows whose searchable text changed pay for the extra update
+        if self._search_source != (self.title, self.description):
+            Recipe.objects.using(self._state.db).filter(pk=self.pk)\
+                .update_search_vector()
+            self._search_source=(self.title, self.description)
+        # leave the vector deferred so later saves never write a stale copy
+        self.__dict__.pop('search_vector', None)
+
+    def stored_files(self):
+        ''' media files referenced by the row , counted in StoredFile '''
+        return [self.image.name , *self.image_variants.values()]
 
     def __str__(self):
         return self.title
 class Tag(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        db_index=False)
     name = models.CharField(max_length=255)
 
+    class Meta:
+        # the unique index also serves per user lists ordered by name
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                name='unique_tag_user_name'),
+        ]
+
     def __str__(self):
         return self.name
 
 class Ingredient(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        db_index=False)
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                name='unique_ingredient_user_name'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class RefreshToken(models.Model):
+    ''' long lived token exchanged for signed access tokens , see user.tokens '''
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # only a sha256 of the token is stored
+    token_hash = models.CharField(max_length=64, unique=True)
+    # tokens rotated from the same login share a family , reusing a rotated
+    # token revokes the whole family
+    family = models.UUIDField(default=uuid.uuid4, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.user_id} {self.family}'
+
+
+class StoredFileManager(models.Manager):
+
+    def acquire(self , *names):
+        ''' count one more reference to each storage name '''
+        for name in filter(None , names):
+            if self.filter(name=name).update(refcount=models.F('refcount')+1):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(name=name , refcount=1)
+            except IntegrityError:
+                # created by a concurrent upload of the same content
+                self.filter(name=name).update(refcount=models.F('refcount')+1)
+
+    def release(self , *names):
+        ''' drop one reference to each name , files are left to gc_media '''
+        for name in filter(None , names):
+            self.filter(name=name , refcount__gt=0)\
+                .update(refcount=models.F('refcount')-1)
+
+class StoredFile(models.Model):
+    ''' reference count of a content addressed media file , see core.storage '''
+    name = models.CharField(max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    objects = StoredFileManager()
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.name} ({self.refcount})'
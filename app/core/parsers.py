@@ -0,0 +1,47 @@
+'''
+parsers of the api , see core.renderers .
+
+FastJSONParser is an orjson backed json parser . utf-8 bodies are decoded
+by orjson . bodies in another charset , bodies orjson rejects and installs
+without orjson go through DRF's JSONParser , so the parsed data and the
+parse error messages stay the same .
+
+MessagePackParser reads application/msgpack request bodies .
+'''
+import io
+
+import msgpack
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser , JSONParser
+
+from core.renderers import FastJSONRenderer , MessagePackRenderer , orjson
+
+
+class FastJSONParser(JSONParser):
+    renderer_class=FastJSONRenderer
+
+    def parse(self , stream , media_type=None , parser_context=None):
+        parser_context=parser_context or {}
+        encoding=parser_context.get('encoding' , settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-' , '') != 'utf8':
+            return super().parse(stream , media_type , parser_context)
+        body=stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # big ints , nesting deeper than orjson allows or invalid json ,
+            # the stdlib parser accepts the first ones and raises the same
+            # ParseError as before for the others
+            return super().parse(io.BytesIO(body) , media_type , parser_context)
+
+
+class MessagePackParser(BaseParser):
+    media_type='application/msgpack'
+    renderer_class=MessagePackRenderer
+
+    def parse(self , stream , media_type=None , parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read() , raw=False)
+        except (ValueError , msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
@@ -0,0 +1,72 @@
+'''
+renderers of the api .
+
+FastJSONRenderer is an orjson backed json renderer .
+
+the output is byte for byte the one of rest_framework's JSONRenderer :
+compact separators , utf-8 without ascii escaping and U+2028 / U+2029
+escaped . datetimes , Decimal and the other types orjson does not encode
+like DRF go through the DRF encoder , everything else ( dicts , lists ,
+str , int , UUID ) is encoded natively . without orjson , for indented
+output ( browsable api ) or for values orjson rejects ( ints over 64 bits )
+the stdlib renderer is used .
+
+MessagePackRenderer answers Accept: application/msgpack with the data of
+the json output .
+'''
+import msgpack
+from rest_framework.renderers import BaseRenderer , JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson=None
+
+if orjson is not None:
+    # non str keys are converted like json.dumps does , datetimes are left
+    # to default() which shortens microseconds to milliseconds like DRF
+    OPTIONS=orjson.OPT_NON_STR_KEYS|orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def __init__(self):
+        super().__init__()
+        self._default=self.encoder_class().default
+
+    def render(self , data , accepted_media_type=None , renderer_context=None):
+        if data is None:
+            return b''
+        indent=self.get_indent(accepted_media_type , renderer_context or {})
+        if orjson is None or indent or self.ensure_ascii or not self.compact \
+                or not issubclass(self.encoder_class , JSONEncoder):
+            return super().render(data , accepted_media_type , renderer_context)
+        try:
+            ret=orjson.dumps(data , default=self._default , option=OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data , accepted_media_type , renderer_context)
+        # escaped by DRF for javascript embedding
+        return ret.replace(b'\xe2\x80\xa8' , b'\\u2028')\
+            .replace(b'\xe2\x80\xa9' , b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    '''
+    values msgpack has no type for ( Decimal , datetimes , UUID , lazy
+    strings ) are converted by the DRF json encoder , so a client decodes
+    the same data as from the json response . only non str dict keys differ ,
+    they are kept as is where json turns them into strings
+    '''
+    media_type='application/msgpack'
+    format='msgpack'
+    charset=None
+    render_style='binary'
+
+    def __init__(self):
+        self._default=JSONEncoder().default
+
+    def render(self , data , accepted_media_type=None , renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data , default=self._default , use_bin_type=True)
@@ -0,0 +1,73 @@
+'''
+content addressed media storage .
+
+every saved file is hashed while it is streamed to disk and stored as
+<upload dir>/<sha256[:2]>/<sha256><ext> , so saving the same bytes twice
+keeps a single copy . rows referencing a file count it in core.StoredFile ,
+`python manage.py gc_media` removes the files nobody references anymore .
+'''
+import hashlib
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self , name , digest):
+        ''' storage name of content with sha256 digest saved as name '''
+        directory , filename = os.path.split(name)
+        extension=os.path.splitext(filename)[1].lower()
+        return os.path.join(directory , digest[:2] , f'{digest}{extension}')
+
+    def save(self , name , content , max_length=None):
+        if name is None:
+            name=content.name
+        if not hasattr(content , 'chunks'):
+            content=File(content , name)
+        name=self.generate_filename(name)
+
+        # hash and write in one pass , into the upload dir so the final
+        # rename stays on the same filesystem
+        directory=self.path(os.path.dirname(name))
+        os.makedirs(directory , exist_ok=True)
+        digest=hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=directory , prefix='.' ,
+                delete=False) as output:
+            try:
+                if hasattr(content , 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            except BaseException:
+                os.unlink(output.name)
+                raise
+
+        final=self.content_name(name , digest.hexdigest())
+        path=self.path(final)
+        if self._touch(path):
+            os.unlink(output.name)
+        else:
+            os.makedirs(os.path.dirname(path) , exist_ok=True)
+            file_move_safe(output.name , path , allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path , self.file_permissions_mode)
+        return final.replace('\\' , '/')
+
+    def _touch(self , path):
+        '''
+        refresh the mtime of an existing file , which keeps gc_media from
+        collecting a file that is about to be referenced again . False when
+        there is none , or gc_media took it meanwhile
+        '''
+        try:
+            os.utime(path , None)
+        except FileNotFoundError:
+            return False
+        return True
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from unittest import skipUnless
+from django.test import TestCase
+from core.models import Recipe , Tag , Ingredient
+from recipe.filters import filter_prefix
+
+class IndexUsageTests(TestCase):
+    ''' EXPLAIN the hot per user queries and check they are index scans '''
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='explain@example.com' , password='testpass123'
+        )
+        if connection.vendor == 'postgresql':
+            # tiny test tables would otherwise always be seq scanned , or
+            # bitmap scanned through any index on user_id and sorted
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+
+    def assertIndexScan(self , queryset , index_names):
+        ''' plan reads through one of index_names and needs no sort '''
+        plan=queryset.explain()
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f'expected one of {index_names} in plan:\n{plan}'
+        )
+        self.assertNotIn('Seq Scan', plan)
+        self.assertNotIn('Sort', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_recipe_list_uses_user_id_index(self):
+        queryset=Recipe.objects.filter(user=self.user).order_by('-id')[:51]
+        self.assertIndexScan(queryset , ['recipe_user_id_idx'])
+
+    def test_recipe_next_page_uses_user_id_index(self):
+        queryset=Recipe.objects.filter(user=self.user , id__lt=100)\
+            .order_by('-id')[:51]
+        self.assertIndexScan(queryset , ['recipe_user_id_idx'])
+
+    def test_tag_list_uses_unique_name_index(self):
+        queryset=Tag.objects.filter(user=self.user).order_by('-name')[:51]
+        # sqlite names indexes of table constraints itself
+        self.assertIndexScan(
+            queryset , ['unique_tag_user_name' , 'sqlite_autoindex_core_tag']
+        )
+
+    def test_ingredient_lookup_uses_unique_name_index(self):
+        queryset=Ingredient.objects.filter(user=self.user , name='salt')
+        self.assertIndexScan(
+            queryset ,
+            ['unique_ingredient_user_name' , 'sqlite_autoindex_core_ingredient']
+        )
+
+    @skipUnless(connection.vendor == 'postgresql' , 'text_pattern_ops index')
+    def test_autocomplete_uses_prefix_index(self):
+        queryset=filter_prefix(Tag.objects.filter(user=self.user) , 'Tom')
+        plan=queryset.explain()
+        self.assertIn('tag_name_prefix_idx', plan)
+        self.assertNotIn('Seq Scan', plan)
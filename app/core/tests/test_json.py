@@ -0,0 +1,132 @@
+import datetime
+import io
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+
+import msgpack
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail , ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core import parsers , renderers
+from core.parsers import FastJSONParser , MessagePackParser
+from core.renderers import FastJSONRenderer , MessagePackRenderer
+
+PAYLOAD={
+    'results':[
+        OrderedDict([
+            ('id' , 1) ,
+            ('title' , 'crème brûlée \u2028\u2029 "quoted" \\ </script>') ,
+            ('price' , '5.50') ,
+            ('raw_price' , Decimal('5.50')) ,
+            ('token' , uuid.UUID('12345678-1234-5678-1234-567812345678')) ,
+            ('created' , datetime.datetime(2021 , 5 , 1 , 12 , 30 , 15 , 123456 ,
+                tzinfo=timezone.utc)) ,
+            ('naive' , datetime.datetime(2021 , 5 , 1 , 12 , 30)) ,
+            ('day' , datetime.date(2021 , 5 , 1)) ,
+            ('at' , datetime.time(8 , 15 , 30 , 250000)) ,
+            ('took' , datetime.timedelta(seconds=90)) ,
+            ('tags' , ({'id':1 , 'name':'vegan'} ,)) ,
+            ('flags' , [True , False , None]) ,
+            ('ratio' , 0.1) ,
+        ]) ,
+    ] ,
+    'errors':{'name':[ErrorDetail('name already exists' , code='unique')]} ,
+    'label':gettext_lazy('recipe') ,
+    'counts':{1:2 , 3:4} ,
+    'next':None ,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+
+    def assertSameOutput(self , data , **kwargs):
+        expected=JSONRenderer().render(data , **kwargs)
+        self.assertEqual(FastJSONRenderer().render(data , **kwargs), expected)
+
+    def test_same_bytes_as_stdlib_renderer(self):
+        self.assertSameOutput(PAYLOAD)
+        self.assertSameOutput([])
+        self.assertSameOutput('text')
+        self.assertSameOutput(None)
+
+    def test_encoded_by_orjson(self):
+        with mock.patch.object(JSONRenderer , 'render' ,
+                side_effect=AssertionError('fell back')):
+            FastJSONRenderer().render(PAYLOAD)
+
+    def test_indented_output(self):
+        self.assertSameOutput(PAYLOAD , renderer_context={'indent':4})
+        self.assertSameOutput(
+            PAYLOAD , accepted_media_type='application/json; indent=2'
+        )
+
+    def test_values_orjson_rejects(self):
+        self.assertSameOutput({'big':2**70 , 'set':{1}})
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers , 'orjson' , None):
+            self.assertSameOutput(PAYLOAD)
+
+
+class FastJSONParserTests(SimpleTestCase):
+
+    def parse(self , parser , body , encoding='utf-8'):
+        return parser.parse(io.BytesIO(body) , 'application/json' ,
+            {'encoding':encoding})
+
+    def assertSameResult(self , body , encoding='utf-8'):
+        expected=self.parse(JSONParser() , body , encoding)
+        self.assertEqual(self.parse(FastJSONParser() , body , encoding), expected)
+
+    def assertSameError(self , body):
+        with self.assertRaises(ParseError) as expected:
+            self.parse(JSONParser() , body)
+        with self.assertRaises(ParseError) as raised:
+            self.parse(FastJSONParser() , body)
+        self.assertEqual(str(raised.exception), str(expected.exception))
+
+    def test_same_data_as_stdlib_parser(self):
+        self.assertSameResult(
+            '{"title":"crème","price":"5.50","tags":[{"name":"a"}],'
+            '"ratio":0.1,"n":null}'.encode()
+        )
+        self.assertSameResult(b'{"big":1180591620717411303424}')
+        self.assertSameResult('{"title":"crème"}'.encode('latin-1') , 'latin-1')
+
+    def test_same_errors(self):
+        self.assertSameError(b'{"title":')
+        self.assertSameError(b'{"ratio":NaN}')
+
+    def test_without_orjson(self):
+        with mock.patch.object(parsers , 'orjson' , None):
+            self.assertSameResult(b'{"title":"soup"}')
+
+
+class MessagePackTests(SimpleTestCase):
+
+    def test_decodes_to_json_data(self):
+        data={name:value for name , value in PAYLOAD.items() if name!='counts'}
+
+        packed=MessagePackRenderer().render(data)
+
+        self.assertEqual(
+            msgpack.unpackb(packed), json.loads(JSONRenderer().render(data))
+        )
+
+    def test_parse(self):
+        body=msgpack.packb({'title':'crème' , 'tags':[{'name':'a'}]})
+
+        data=MessagePackParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data, {'title':'crème' , 'tags':[{'name':'a'}]})
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\x92\x01'))
@@ -1,5 +1,3 @@
-from unittest.mock import patch
-
 from django.contrib.auth import get_user_model
 from core import models
 from django.test import TestCase
@@ -72,14 +70,16 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient),ingredient.name)
 
-    @patch('core.models.uuid.uuid4')
-    def test_recipe_image_file_name_uuid(self , mock_uuid):
-        ''' test generate image unique path '''
+    def test_recipe_image_file_path(self):
+        ''' storage renames by content hash , only dir and ext matter '''
+        filepath=models.recipe_image_file_path(None, 'example.jpeg')
 
-        uuid='test-uuid'
-        mock_uuid.return_value=uuid
+        self.assertEqual(filepath, 'uploads/recipe/upload.jpeg')
 
-        filepath=models.recipe_image_file_path(None, 'example.jpeg')
+    def test_stored_file_refcount(self):
+        models.StoredFile.objects.acquire('a.jpg' , 'a.jpg' , None)
+        models.StoredFile.objects.release('a.jpg' , 'missing.jpg')
 
-        self.assertEqual(filepath, f'uploads/recipe/{uuid}.jpeg')
+        self.assertEqual(models.StoredFile.objects.get(name='a.jpg').refcount, 1)
+        self.assertFalse(models.StoredFile.objects.filter(name='missing.jpg').exists())
 
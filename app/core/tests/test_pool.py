@@ -0,0 +1,214 @@
+from unittest import mock , skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase , TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db.base import DatabaseWrapper , close_pools
+from core.db.pool import ConnectionPool , PoolTimeout
+
+DB_STATS_URL=reverse('db-stats')
+
+
+class FakeConnection:
+
+    def __init__(self , number):
+        self.number=number
+        self.closed=False
+        self.works=True
+
+    def close(self):
+        self.closed=True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now=1000.0
+        patcher=mock.patch('core.db.pool.time.monotonic' , lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.opened=[]
+
+    def connect(self):
+        connection=FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+    def pool(self , **kwargs):
+        kwargs.setdefault('check' , lambda connection: connection.works)
+        return ConnectionPool(self.connect , **kwargs)
+
+    def test_reuses_most_recently_released(self):
+        pool=self.pool()
+        first , second = pool.acquire() , pool.acquire()
+        pool.release(first)
+        pool.release(second)
+
+        self.assertIs(pool.acquire(), second)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(pool.stats()['reused'], 2)
+
+    def test_waits_then_times_out_when_full(self):
+        pool=self.pool(max_size=1 , timeout=0)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats=pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_idle_connections_expire(self):
+        pool=self.pool(idle_timeout=10)
+        first=pool.acquire()
+        pool.release(first)
+
+        self.now+=11
+        self.assertIsNot(pool.acquire(), first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['expired'], 1)
+
+    def test_old_connections_recycled(self):
+        pool=self.pool(max_lifetime=60)
+        first=pool.acquire()
+        self.now+=61
+        pool.release(first)
+
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['recycled'], 1)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_failed_check_replaced(self):
+        pool=self.pool()
+        first=pool.acquire()
+        pool.release(first)
+        first.works=False
+
+        self.assertIsNot(pool.acquire(), first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+    def test_discarded_on_release(self):
+        pool=self.pool(discard=lambda connection: True)
+        first=pool.acquire()
+        pool.release(first)
+
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_failed_connect_frees_its_slot(self):
+        pool=ConnectionPool(mock.Mock(side_effect=OSError) , max_size=1 , timeout=0)
+
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                pool.acquire()
+
+    def test_close_all(self):
+        pool=self.pool()
+        first , second = pool.acquire() , pool.acquire()
+        pool.release(first)
+
+        pool.close_all()
+
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+
+@skipUnless(connection.vendor == 'postgresql' , 'postgresql backend')
+class DatabaseWrapperTests(SimpleTestCase):
+    ''' wrappers of their own , outside the test transaction '''
+
+    def wrapper(self , alias='lifecycle' , **settings):
+        wrapper=DatabaseWrapper({
+            **connection.settings_dict ,
+            'OPTIONS':{} ,
+            **settings ,
+        } , alias=alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def backend_pid(self , wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def terminate(self , pid):
+        with self.wrapper(alias='terminate').cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)' , [pid])
+
+    def new_request(self , wrapper):
+        ''' what request_started and request_finished do '''
+        wrapper.close_if_unusable_or_obsolete()
+
+    def test_health_check_replaces_dropped_connection(self):
+        wrapper=self.wrapper(CONN_MAX_AGE=60 , CONN_HEALTH_CHECKS=True)
+        pid=self.backend_pid(wrapper)
+        self.new_request(wrapper)
+        self.assertEqual(self.backend_pid(wrapper), pid)
+
+        self.terminate(pid)
+        self.new_request(wrapper)
+
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+
+    def test_pool_reuses_connections(self):
+        self.addCleanup(close_pools)
+        pool={'pool':{'max_size':2}}
+        wrapper=self.wrapper(alias='pooled' , CONN_MAX_AGE=0 , OPTIONS=pool)
+        pid=self.backend_pid(wrapper)
+        wrapper.close()
+
+        other=self.wrapper(alias='pooled' , CONN_MAX_AGE=0 , OPTIONS=pool)
+        self.assertEqual(self.backend_pid(other), pid)
+        self.assertNotEqual(self.backend_pid(wrapper), pid)
+        stats=other.get_pool(other.get_connection_params()).stats()
+        self.assertEqual(stats['opened'], 2)
+        self.assertEqual(stats['reused'], 1)
+
+    def test_pool_rolls_back_released_transaction(self):
+        self.addCleanup(close_pools)
+        wrapper=self.wrapper(alias='pooled_transaction' , CONN_MAX_AGE=0 ,
+            OPTIONS={'pool':True})
+        wrapper.set_autocommit(False)
+        pid=self.backend_pid(wrapper)
+        wrapper.close()
+
+        # autocommit again , without the open transaction
+        self.assertEqual(self.backend_pid(wrapper), pid)
+        self.assertTrue(wrapper.get_autocommit())
+        self.assertFalse(wrapper.connection.get_transaction_status())
+
+
+class DatabaseStatsViewTests(TestCase):
+
+    def setUp(self):
+        self.client=APIClient()
+
+    def test_staff_only(self):
+        user=get_user_model().objects.create_user(
+            email='user@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(user)
+
+        res=self.client.get(DB_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats(self):
+        staff=get_user_model().objects.create_superuser(
+            'admin@example.com' , 'testpass123'
+        )
+        self.client.force_authenticate(staff)
+
+        res=self.client.get(DB_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['default']['vendor'], connection.vendor)
+        self.assertIn('pool', res.data['default'])
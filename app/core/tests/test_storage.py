@@ -0,0 +1,42 @@
+import hashlib
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+class ContentAddressedStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root=tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree , self.root)
+        self.storage=ContentAddressedStorage(location=self.root)
+
+    def test_named_after_content_hash(self):
+        digest=hashlib.sha256(b'photo').hexdigest()
+
+        name=self.storage.save('uploads/recipe/IMG_1.JPG' , ContentFile(b'photo'))
+
+        self.assertEqual(name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'photo')
+
+    def test_identical_uploads_share_one_file(self):
+        first=self.storage.save('uploads/recipe/a.jpg' , ContentFile(b'photo'))
+        retry=self.storage.save('uploads/recipe/b.jpg' , ContentFile(b'photo'))
+        other=self.storage.save('uploads/recipe/c.jpg' , ContentFile(b'other'))
+
+        self.assertEqual(first, retry)
+        self.assertNotEqual(first, other)
+        _ , files = self.storage.listdir(f'uploads/recipe/{first.split("/")[2]}')
+        self.assertEqual(len(files), 1)
+
+    def test_no_temporary_file_left(self):
+        self.storage.save('uploads/recipe/a.jpg' , ContentFile(b'photo'))
+        self.storage.save('uploads/recipe/a.jpg' , ContentFile(b'photo'))
+
+        directories , files = self.storage.listdir('uploads/recipe')
+        self.assertEqual(files, [])
+        self.assertEqual(len(directories), 1)
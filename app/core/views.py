@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import connections
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.cache import is_shared_cache
+from core.db.base import pool_stats
+from recipe.cache import response_cache
+from user.authentication import api_authentication_classes
+
+
+class DatabaseStatsView(APIView):
+    '''
+    connection settings and pool statistics of the worker process answering ,
+    staff only
+    '''
+    authentication_classes=api_authentication_classes()
+    permission_classes=[permissions.IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self , request):
+        pools=pool_stats()
+        return Response({
+            alias:{
+                'vendor':connections[alias].vendor ,
+                'conn_max_age':database.get('CONN_MAX_AGE' , 0) ,
+                'health_checks':database.get('CONN_HEALTH_CHECKS' , False) ,
+                # None without a pool or before its first connection
+                'pool':pools.get(alias) if database.get('OPTIONS' , {}).get('pool')
+                    else None ,
+            }
+            for alias , database in settings.DATABASES.items()
+        })
+
+
+class ResponseCacheStatsView(APIView):
+    '''
+    hits and misses of the list response cache , counted by every worker
+    sharing its backend , staff only
+    '''
+    authentication_classes=api_authentication_classes()
+    permission_classes=[permissions.IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self , request):
+        return Response({
+            'enabled':settings.API_CACHE_ENABLED ,
+            'shared':is_shared_cache(settings.API_CACHE_ALIAS) ,
+            **response_cache.stats() ,
+        })
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        # connect cache invalidation signals
+        from recipe import signals  # noqa
+        # register the deploy checks of the api cache and conditional get
+        from recipe import checks  # noqa
@@ -0,0 +1,378 @@
+'''
+micro benchmarks for the recipe api , run them against the real database
+with `python manage.py benchmark <name>` . every run seeds its own data
+inside a transaction that is rolled back at the end .
+'''
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from core.models import Recipe , Tag , Ingredient
+from recipe.filters import filter_by_related
+
+BENCHMARKS={}
+
+
+def benchmark(name):
+    ''' register a benchmark function under name '''
+    def register(func):
+        BENCHMARKS[name]=func
+        return func
+    return register
+
+
+def timed(func , repeat=5):
+    ''' return best wall time of func over repeat runs in seconds '''
+    best=None
+    for _ in range(repeat):
+        start=time.perf_counter()
+        func()
+        elapsed=time.perf_counter()-start
+        best=elapsed if best is None else min(best , elapsed)
+    return best
+
+
+def seed_dataset(recipes=1000 , tags=50 , ingredients=100 , per_recipe=5 ,
+                 email='bench@example.com'):
+    ''' bulk insert a user library and return its user '''
+    rand=random.Random(0)
+    user=get_user_model().objects.create_user(email=email , password='bench123')
+    Tag.objects.bulk_create(
+        [Tag(user=user , name=f'tag {i}') for i in range(tags)]
+    )
+    Ingredient.objects.bulk_create(
+        [Ingredient(user=user , name=f'ingredient {i}') for i in range(ingredients)]
+    )
+    Recipe.objects.bulk_create([
+        Recipe(
+            user=user ,
+            title=f'recipe {i}' ,
+            description='bench description '*20 ,
+            price=Decimal('9.99') ,
+            time_minutes=rand.randint(5 , 120) ,
+        )
+        for i in range(recipes)
+    ])
+    # pks are not returned by bulk_create on every backend , so reload them
+    recipe_ids=list(Recipe.objects.filter(user=user).values_list('id' , flat=True))
+    tag_ids=list(Tag.objects.filter(user=user).values_list('id' , flat=True))
+    ingred_ids=list(
+        Ingredient.objects.filter(user=user).values_list('id' , flat=True)
+    )
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe_id , tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rand.sample(tag_ids , min(per_recipe , len(tag_ids)))
+    ])
+    Recipe.ingredients.through.objects.bulk_create([
+        Recipe.ingredients.through(recipe_id=recipe_id , ingredient_id=ingred_id)
+        for recipe_id in recipe_ids
+        for ingred_id in rand.sample(ingred_ids , min(per_recipe , len(ingred_ids)))
+    ])
+    return user
+
+
+@benchmark('filters')
+def bench_filters(size , report):
+    ''' JOIN + DISTINCT against EXISTS semi join tag/ingredient filtering '''
+    user=seed_dataset(recipes=size)
+    base=Recipe.objects.filter(user=user).order_by('-id')
+    tag_ids=list(Tag.objects.filter(user=user).values_list('id' , flat=True)[:10])
+    ingred_ids=list(
+        Ingredient.objects.filter(user=user).values_list('id' , flat=True)[:20]
+    )
+
+    def join_distinct():
+        list(base.filter(tags__id__in=tag_ids)
+            .filter(ingredients__id__in=ingred_ids).distinct())
+
+    def semi_join():
+        queryset=filter_by_related(base , 'tags' , tag_ids)
+        list(filter_by_related(queryset , 'ingredients' , ingred_ids))
+
+    def semi_join_all():
+        list(filter_by_related(base , 'tags' , tag_ids[:2] , match_all=True))
+
+    report('join + distinct' , timed(join_distinct))
+    report('exists semi join' , timed(semi_join))
+    report('match=all (2 tags)' , timed(semi_join_all))
+
+
+@benchmark('auth')
+def bench_auth(size , report):
+    ''' per request authentication overhead of the supported token modes '''
+    import tempfile
+    from django.conf import settings
+    from django.test import override_settings
+    from rest_framework.authtoken.models import Token
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.test import APIRequestFactory
+    from user.authentication import (CachedTokenAuthentication ,
+        SignedTokenAuthentication , token_cache)
+    from user.tokens import issue_access_token
+
+    user=seed_dataset(recipes=1 , tags=1 , ingredients=1 , per_recipe=1)
+    key=Token.objects.create(user=user).key
+    factory=APIRequestFactory()
+    token_request=factory.get('/' , HTTP_AUTHORIZATION=f'Token {key}')
+    # signed tokens need a key of their own
+    signing_key=override_settings(ACCESS_TOKEN_SIGNING_KEY='benchmark-'*4)
+    signing_key.enable()
+    signed_request=factory.get(
+        '/' , HTTP_AUTHORIZATION=f'Bearer {issue_access_token(user)}'
+    )
+
+    def run(backend , request):
+        def authenticate():
+            for _ in range(size):
+                backend.authenticate(request)
+        return authenticate
+
+    report(f'db token x{size}' , timed(run(TokenAuthentication() , token_request)))
+    # the token cache needs a cache shared by the workers , file based here
+    with tempfile.TemporaryDirectory() as location , override_settings(
+            AUTH_TOKEN_CACHE_ALIAS='tokens' , CACHES={**settings.CACHES ,
+                'tokens':{'BACKEND':'django.core.cache.backends.filebased.FileBasedCache' ,
+                    'LOCATION':location}}):
+        token_cache.clear()
+        CachedTokenAuthentication().authenticate(token_request)
+        report(f'cached token x{size}' ,
+            timed(run(CachedTokenAuthentication() , token_request)))
+    report(f'signed token x{size}' ,
+        timed(run(SignedTokenAuthentication() , signed_request)))
+    signing_key.disable()
+
+
+@benchmark('autocomplete')
+def bench_autocomplete(size , report):
+    ''' latency of the tag autocomplete request , one per keystroke '''
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+
+    user=seed_dataset(recipes=1 , tags=size , ingredients=1 , per_recipe=1)
+    client=APIClient()
+    client.force_authenticate(user)
+    url=reverse('recipe:tag-autocomplete')
+    timings=[]
+    for prefix in ('t' , 'ta' , 'tag' , 'tag ' , 'tag 1' , 'tag 12')*50:
+        start=time.perf_counter()
+        client.get(url , {'prefix':prefix})
+        timings.append(time.perf_counter()-start)
+    timings.sort()
+    report(f'p50 of {len(timings)} requests' , timings[len(timings)//2])
+    report(f'p99 of {len(timings)} requests' , timings[int(len(timings)*0.99)])
+
+
+@benchmark('serializers')
+def bench_serializers(size , report):
+    ''' recipe list serialization , model serializers against the fast path '''
+    from recipe.fastpath import FastSerializer
+    from recipe.serializers import RecipeSerializer
+
+    user=seed_dataset(recipes=size)
+    queryset=Recipe.objects.filter(user=user).order_by('-id')\
+        .defer('search_vector')
+    fast=FastSerializer.compile(RecipeSerializer())
+
+    def model_serializer():
+        RecipeSerializer(
+            queryset.prefetch_related('tags' , 'ingredients') , many=True
+        ).data
+
+    def fast_path():
+        fast.to_representation_many(fast.values(queryset))
+
+    report(f'model serializer x{size}' , timed(model_serializer , repeat=3))
+    report(f'fast path x{size}' , timed(fast_path , repeat=3))
+
+
+@benchmark('json')
+def bench_json(size , report):
+    ''' encode and parse a recipe list payload , stdlib json against orjson '''
+    import io
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from core.parsers import FastJSONParser
+    from core.renderers import FastJSONRenderer
+    from recipe.serializers import RecipeSerializer
+
+    user=seed_dataset(recipes=size)
+    queryset=Recipe.objects.filter(user=user).order_by('-id')\
+        .prefetch_related('tags' , 'ingredients')
+    data={'next':None , 'previous':None ,
+        'results':RecipeSerializer(queryset , many=True).data}
+    body=JSONRenderer().render(data)
+
+    def encode(renderer):
+        return lambda: renderer.render(data)
+
+    def parse(parser):
+        return lambda: parser.parse(io.BytesIO(body) , 'application/json' , {})
+
+    report(f'stdlib encode x{size} ( {len(body)//1024} KiB )' ,
+        timed(encode(JSONRenderer())))
+    report(f'orjson encode x{size}' , timed(encode(FastJSONRenderer())))
+    report(f'stdlib parse x{size}' , timed(parse(JSONParser())))
+    report(f'orjson parse x{size}' , timed(parse(FastJSONParser())))
+
+
+@benchmark('msgpack')
+def bench_msgpack(size , report):
+    ''' encoded size and client decode time of recipe list pages , json against msgpack '''
+    import json
+    import msgpack
+    from core.renderers import FastJSONRenderer , MessagePackRenderer , orjson
+    from recipe.serializers import RecipeSerializer
+
+    user=seed_dataset(recipes=size)
+    queryset=Recipe.objects.filter(user=user).order_by('-id')\
+        .prefetch_related('tags' , 'ingredients')
+    # list responses at the max page size
+    page_size=200
+    pages=[
+        {'next':'http://localhost/api/recipe/recipes/?cursor=cD0xMjM0' ,
+            'previous':None ,
+            'results':RecipeSerializer(queryset[start:start+page_size] , many=True).data}
+        for start in range(0 , size , page_size)
+    ]
+    json_pages=[FastJSONRenderer().render(page) for page in pages]
+    msgpack_pages=[MessagePackRenderer().render(page) for page in pages]
+
+    def decode(loads , bodies):
+        return lambda: [loads(body) for body in bodies]
+
+    count=len(pages)
+    report(f'json decode {count} pages ( {sum(map(len , json_pages))//1024} KiB )' ,
+        timed(decode(json.loads , json_pages)))
+    if orjson is not None:
+        report(f'orjson decode {count} pages' ,
+            timed(decode(orjson.loads , json_pages)))
+    report(
+        f'msgpack decode {count} pages ( {sum(map(len , msgpack_pages))//1024} KiB )' ,
+        timed(decode(msgpack.unpackb , msgpack_pages)) ,
+    )
+
+
+@benchmark('normalized')
+def bench_normalized(size , report):
+    ''' nested against side loaded ( ?format=normalized ) recipe list pages '''
+    from core.renderers import FastJSONRenderer
+    from recipe.fastpath import FastSerializer
+    from recipe.serializers import RecipeSerializer
+
+    user=seed_dataset(recipes=size)
+    fast=FastSerializer.compile(RecipeSerializer())
+    rows=list(fast.values(
+        Recipe.objects.filter(user=user).order_by('-id').defer('search_vector')
+    ))
+    # pages of the max page size
+    pages=[rows[start:start+200] for start in range(0 , len(rows) , 200)]
+    renderer=FastJSONRenderer()
+
+    def nested():
+        return [
+            renderer.render({'results':fast.to_representation_many(page)})
+            for page in pages
+        ]
+
+    def normalized():
+        bodies=[]
+        for page in pages:
+            results , included=fast.to_normalized_many(
+                page , ('tags' , 'ingredients')
+            )
+            bodies.append(renderer.render({'results':results , **included}))
+        return bodies
+
+    report(f'nested x{size} ( {sum(map(len , nested()))//1024} KiB )' ,
+        timed(nested , repeat=3))
+    report(f'normalized x{size} ( {sum(map(len , normalized()))//1024} KiB )' ,
+        timed(normalized , repeat=3))
+
+
+@benchmark('streaming')
+def bench_streaming(size , report):
+    ''' peak python memory of the whole recipe list , buffered against streamed '''
+    import tracemalloc
+    from rest_framework.test import APIRequestFactory , force_authenticate
+    from core.renderers import FastJSONRenderer
+    from recipe.fastpath import FastSerializer
+    from recipe.serializers import RecipeSerializer
+    from recipe.views import RecipeViewSet
+
+    user=seed_dataset(recipes=size)
+    factory=APIRequestFactory()
+    view=RecipeViewSet.as_view({'get':'list'})
+
+    def buffered():
+        # what a single unpaginated list response holds at once
+        fast=FastSerializer.compile(RecipeSerializer())
+        queryset=Recipe.objects.filter(user=user).order_by('-id')
+        data={'next':None , 'previous':None ,
+            'results':fast.to_representation_many(fast.values(queryset))}
+        return len(FastJSONRenderer().render(data))
+
+    def streamed():
+        request=factory.get('/' , {'page_size':'all'})
+        force_authenticate(request , user)
+        response=view(request)
+        return sum(len(part) for part in response.streaming_content)
+
+    for label , func in (('buffered' , buffered) , ('streamed' , streamed)):
+        tracemalloc.start()
+        start=time.perf_counter()
+        written=func()
+        elapsed=time.perf_counter()-start
+        peak=tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report(f'{label} x{size} ( {written//1024} KiB , peak {peak/2**20:.1f} MiB )' ,
+            elapsed)
+
+
+@benchmark('connections')
+def bench_connections(size , report):
+    ''' size requests of one query over 8 threads , per connection lifecycle '''
+    import threading
+    from django.db import connections
+    from core.db.base import close_pools
+
+    settings_dict=connections['default'].settings_dict
+    wrapper_class=connections['default'].__class__
+    modes=(
+        ('new connection per request' , {'CONN_MAX_AGE':0}) ,
+        ('persistent' , {'CONN_MAX_AGE':60}) ,
+        ('persistent + health checks' , {'CONN_MAX_AGE':60 ,
+            'CONN_HEALTH_CHECKS':True}) ,
+        ('pool of 4 + health checks' , {'CONN_MAX_AGE':0 ,
+            'CONN_HEALTH_CHECKS':True , 'OPTIONS':{'pool':{'max_size':4}}}) ,
+    )
+    threads=8
+
+    def run(alias , overrides , requests):
+        # a wrapper of its own per thread , outside the benchmark transaction
+        wrapper=wrapper_class({**settings_dict , 'CONN_HEALTH_CHECKS':False ,
+            'OPTIONS':{} , **overrides} , alias=alias)
+        try:
+            for _ in range(requests):
+                # what request_started and request_finished do
+                wrapper.close_if_unusable_or_obsolete()
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT COUNT(*) FROM core_tag')
+                wrapper.close_if_unusable_or_obsolete()
+        finally:
+            wrapper.close()
+
+    for index , (label , overrides) in enumerate(modes):
+        workers=[
+            threading.Thread(target=run ,
+                args=(f'bench_{index}' , overrides , size//threads))
+            for _ in range(threads)
+        ]
+        start=time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        report(f'{label} x{size}' , time.perf_counter()-start)
+    close_pools()
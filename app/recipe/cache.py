@@ -0,0 +1,157 @@
+'''
+per user response cache of the list endpoints .
+
+entries are keyed by user , version , endpoint and normalized query .
+every write to a recipe , tag or ingredient of a user bumps the version
+of that user ( see recipe.signals ) so stale entries are never read again
+and simply expire , nothing has to be scanned or deleted .
+'''
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+
+class ResponseCache:
+    LOCK_TIMEOUT=10
+    LOCK_POLL=0.05
+
+    def __init__(self , alias=None , timeout=None):
+        self.alias=alias
+        self.timeout=timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias or settings.API_CACHE_ALIAS]
+
+    def _version_key(self , user_id):
+        return f'api:{user_id}:version'
+
+    def version(self , user_id):
+        version=self.cache.get(self._version_key(user_id))
+        if version is None:
+            # start from the clock so an evicted counter never reuses the
+            # version of entries that are still cached
+            self.cache.add(self._version_key(user_id) , time.time_ns() , None)
+            version=self.cache.get(self._version_key(user_id))
+        return version
+
+    def _modified_key(self , user_id):
+        return f'api:{user_id}:modified'
+
+    def _incr_version(self , user_id):
+        try:
+            self.cache.incr(self._version_key(user_id))
+        except ValueError:
+            self.cache.set(self._version_key(user_id) , time.time_ns() , None)
+        self.cache.set(self._modified_key(user_id) , time.time() , None)
+
+    def marker(self , user_id):
+        ''' ( version , modified timestamp ) of the library of user '''
+        keys=[self._version_key(user_id) , self._modified_key(user_id)]
+        values=self.cache.get_many(keys)
+        if len(values) < 2:
+            # lost or never set , anything cached before is unknown now
+            self._incr_version(user_id)
+            values=self.cache.get_many(keys)
+        return values[keys[0]] , values[keys[1]]
+
+    def bump(self , user_id):
+        ''' invalidate every cached response of user '''
+        self._incr_version(user_id)
+        # a concurrent request may cache the pre commit state meanwhile ,
+        # bump again once the write is visible to everyone
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._incr_version(user_id))
+
+    def key(self , request , endpoint):
+        params=sorted(
+            (name , value)
+            for name , values in request.query_params.lists()
+            for value in values
+        )
+        # absolute pagination links depend on the host
+        query=f'{request.get_host()}?{urlencode(params)}'
+        digest=hashlib.sha1(query.encode()).hexdigest()
+        user_id=request.user.pk
+        return f'api:{user_id}:v{self.version(user_id)}:{endpoint}:{digest}'
+
+    def _count(self , outcome):
+        try:
+            self.cache.incr(f'api:stats:{outcome}')
+        except ValueError:
+            self.cache.add(f'api:stats:{outcome}' , 0 , None)
+            self.cache.incr(f'api:stats:{outcome}')
+
+    def stats(self):
+        ''' hits and misses counted by every worker sharing the backend '''
+        counts=self.cache.get_many(['api:stats:hit' , 'api:stats:miss'])
+        return {
+            'hits':counts.get('api:stats:hit' , 0) ,
+            'misses':counts.get('api:stats:miss' , 0) ,
+        }
+
+    def get_or_compute(self , key , compute):
+        '''
+        return ( value , hit ) . on a miss only one caller computes the
+        value , concurrent callers wait for it instead of stampeding
+        '''
+        value=self.cache.get(key)
+        if value is not None:
+            self._count('hit')
+            return value , True
+
+        # add() is atomic on every backend , so it doubles as a lock shared
+        # by the threads and workers using the same cache
+        lock_key=f'{key}:lock'
+        deadline=time.monotonic()+self.LOCK_TIMEOUT
+        while not self.cache.add(lock_key , 1 , self.LOCK_TIMEOUT):
+            time.sleep(self.LOCK_POLL)
+            value=self.cache.get(key)
+            if value is not None:
+                self._count('hit')
+                return value , True
+            if time.monotonic() > deadline:
+                # the holder died or is too slow , compute it ourselves
+                self._count('miss')
+                return compute() , False
+        try:
+            value=compute()
+            timeout=self.timeout if self.timeout is not None \
+                else settings.API_CACHE_TIMEOUT
+            self.cache.set(key , value , timeout)
+        finally:
+            self.cache.delete(lock_key)
+        self._count('miss')
+        return value , False
+
+
+response_cache=ResponseCache()
+
+
+class CachedListMixin:
+    ''' serve list responses of a viewset from the per user cache '''
+    cache_endpoint=None
+
+    def list(self , request , *args , **kwargs):
+        if not settings.API_CACHE_ENABLED:
+            return super().list(request , *args , **kwargs)
+
+        response=None
+        def compute():
+            nonlocal response
+            response=super(CachedListMixin , self).list(request , *args , **kwargs)
+            return response.data
+
+        endpoint=self.cache_endpoint or self.basename
+        data , hit=response_cache.get_or_compute(
+            response_cache.key(request , endpoint) , compute
+        )
+        if response is None:
+            response=Response(data)
+        response['X-Cache']='HIT' if hit else 'MISS'
+        return response
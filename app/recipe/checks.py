@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error , Warning , register
+
+from core.cache import is_shared_cache
+
+
+@register()
+def check_api_cache(app_configs , **kwargs):
+    ''' the response cache needs a backend every worker sees '''
+    if not settings.API_CACHE_ENABLED or is_shared_cache(settings.API_CACHE_ALIAS):
+        return []
+    return [Warning(
+        'API_CACHE_ENABLED on a per process cache backend' ,
+        hint='writes only invalidate the lists cached by the worker that '
+            'handled them , the other workers serve stale lists for up to '
+            'API_CACHE_TIMEOUT seconds . set API_CACHE_BACKEND to a shared '
+            'backend ( memcached ) or API_CACHE_ENABLED=0' ,
+        id='recipe.W001' ,
+    )]
+
+
+@register()
+def check_conditional_get(app_configs , **kwargs):
+    ''' the change marker behind the ETags needs a backend every worker sees '''
+    if not settings.API_CONDITIONAL_GET or is_shared_cache(settings.API_CACHE_ALIAS):
+        return []
+    return [Error(
+        'API_CONDITIONAL_GET on a per process cache backend' ,
+        hint='workers that did not handle a write keep answering 304 to the '
+            'ETag it outdated . set API_CACHE_BACKEND to a shared backend '
+            '( memcached ) or API_CONDITIONAL_GET=0' ,
+        id='recipe.E001' ,
+    )]
@@ -0,0 +1,52 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response , patch_vary_headers
+from django.utils.http import http_date
+
+from recipe.cache import response_cache
+
+
+class ConditionalGetMixin:
+    '''
+    strong ETag and Last-Modified for list and retrieve , derived from the
+    per user change marker so If-None-Match / If-Modified-Since are answered
+    with a 304 before any query or serialization runs .
+
+    http dates have whole seconds , so Last-Modified is only sent once the
+    second of the marker is over : sent earlier it would also cover a write
+    later in that second , and If-Modified-Since would hide it
+    '''
+
+    def _validators(self , request):
+        version , modified=response_cache.marker(request.user.pk)
+        # the same url renders differently per format
+        variant=f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT" , "")}'
+        digest=hashlib.sha1(variant.encode()).hexdigest()[:16]
+        last_modified=int(modified)
+        if time.time() < last_modified+1:
+            last_modified=None
+        return f'"{request.user.pk}-{version}-{digest}"' , last_modified
+
+    def _conditional(self , handler , request , *args , **kwargs):
+        if not settings.API_CONDITIONAL_GET:
+            return handler(request , *args , **kwargs)
+        etag , last_modified=self._validators(request)
+        response=get_conditional_response(
+            request , etag=etag , last_modified=last_modified
+        )
+        if response is None:
+            response=handler(request , *args , **kwargs)
+        if response.status_code in (200 , 304):
+            response['ETag']=etag
+            if last_modified is not None:
+                response['Last-Modified']=http_date(last_modified)
+            patch_vary_headers(response , ['Authorization'])
+        return response
+
+    def list(self , request , *args , **kwargs):
+        return self._conditional(super().list , request , *args , **kwargs)
+
+    def retrieve(self , request , *args , **kwargs):
+        return self._conditional(super().retrieve , request , *args , **kwargs)
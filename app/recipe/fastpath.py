@@ -0,0 +1,245 @@
+'''
+fast read path for list and retrieve .
+
+DRF spends most of a list request in the per field , per row machinery of
+ModelSerializer . FastSerializer compiles a serializer once per request into
+a plan of plain converters and applies it to .values() rows , nested many to
+many relations are fetched with one values query each . the output is the
+same , down to the bytes once rendered , as the serializer it was compiled
+from ( see recipe/tests/test_fastpath.py ) .
+'''
+from collections import defaultdict
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from recipe.fieldsets import fieldset_sources
+
+
+def _converter(field):
+    ''' value -> representation of a model backed serializer field '''
+    # same result as their to_representation , without the call overhead
+    if type(field) is serializers.CharField:
+        return str
+    if type(field) is serializers.IntegerField:
+        return int
+    return field.to_representation
+
+
+class FastSerializer:
+    '''
+    read only twin of a ( ModelSerializer ) instance working on .values()
+    rows . compile() returns None for serializers it can not reproduce
+    '''
+
+    def __init__(self , serializer , columns , scalars , methods , relations):
+        self.serializer=serializer
+        self.model=serializer.Meta.model
+        self.columns=columns
+        # ( name , source , converter ) , ( name , method ) and
+        # ( name , source , [( name , source , converter )] ) tuples
+        self.scalars=scalars
+        self.methods=methods
+        self.relations=relations
+        self.order=list(serializer.fields)
+
+    @classmethod
+    def compile(cls , serializer):
+        if not isinstance(serializer , serializers.ModelSerializer):
+            return None
+        names=list(serializer.fields)
+        columns , _ = fieldset_sources(serializer , names)
+        if columns is None:
+            return None
+        model_meta=serializer.Meta.model._meta
+        scalars , methods , relations = [] , [] , []
+        for name , field in serializer.fields.items():
+            if isinstance(field , serializers.SerializerMethodField):
+                methods.append((name , getattr(serializer , field.method_name)))
+            elif isinstance(field , serializers.ListSerializer):
+                child=cls._compile_child(field.child)
+                if child is None:
+                    return None
+                relations.append((name , field.source , child))
+            elif isinstance(field , serializers.Serializer):
+                return None
+            else:
+                try:
+                    model_field=model_meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    # an annotation , read when the queryset selects it
+                    model_field=None
+                if model_field is not None and (
+                        not model_field.concrete or model_field.is_relation):
+                    return None
+                scalars.append((name , field.source , _converter(field)))
+        return cls(serializer , columns , scalars , methods , relations)
+
+    @staticmethod
+    def _compile_child(child):
+        '''
+        [( name , source , converter )] of a nested serializer , fields not backed by a column are skipped like DRF skips a read only
+        field missing on the instance
+        '''
+        model_meta=child.Meta.model._meta
+        fields=[]
+        for name , field in child.fields.items():
+            if isinstance(field , (serializers.Serializer ,
+                    serializers.SerializerMethodField)):
+                return None
+            try:
+                model_field=model_meta.get_field(field.source)
+            except FieldDoesNotExist:
+                if field.read_only:
+                    continue
+                return None
+            if not model_field.concrete or model_field.is_relation:
+                return None
+            fields.append((name , field.source , _converter(field)))
+        return fields
+
+    def _fetch_related(self , relation , columns):
+        '''
+        ( related pk name , fetch ) of a many to many relation , fetch(ids)
+        returns {parent pk:[row , ...]}
+        '''
+        field=self.model._meta.get_field(relation)
+        reverse=field.related_query_name()
+        related_pk=field.related_model._meta.pk.attname
+        manager=field.related_model._default_manager
+
+        def fetch(ids):
+            # same join and filter as prefetch_related , so rows come back in
+            # the same order
+            rows=manager.filter(**{f'{reverse}__in':ids})\
+                .values(*dict.fromkeys([reverse , related_pk , *columns]))
+            grouped=defaultdict(list)
+            for row in rows:
+                grouped[row.pop(reverse)].append(row)
+            return grouped
+        return related_pk , fetch
+
+    def _represent(self , row , source , converter):
+        value=row[source]
+        return None if value is None else converter(value)
+
+    def _represent_child(self , row , child):
+        return {
+            name:self._represent(row , source , converter)
+            for name , source , converter in child
+        }
+
+    def to_representation_many(self , rows):
+        return self.to_normalized_many(rows , ())[0]
+
+    def to_normalized_many(self , rows , side_loaded):
+        '''
+        ( data , included ) of rows . the relations named in side_loaded are
+        rendered as lists of ids , included maps each of them to its related
+        objects by str id , every distinct object represented once
+        '''
+        rows=list(rows)
+        pk=self.model._meta.pk.attname
+        ids=[row[pk] for row in rows]
+        related={}
+        included={}
+        for name , source , child in self.relations:
+            related_pk , fetch=self._fetch_related(
+                source , [field_source for _ , field_source , _ in child]
+            )
+            related[name]=(related_pk , fetch(ids) if ids else {})
+            if name in side_loaded:
+                included[name]={}
+
+        # an annotated field the queryset does not select is left out , as
+        # DRF skips a read only attribute missing on the instance
+        scalars=[
+            scalar for scalar in self.scalars
+            if rows and scalar[1] in rows[0]
+        ]
+        rendered={name for name , _ , _ in scalars}|{
+            name for name , *_ in self.methods+self.relations
+        }
+        order=[name for name in self.order if name in rendered]
+        data=[]
+        for row in rows:
+            item={}
+            for name , source , converter in scalars:
+                value=row[source]
+                item[name]=None if value is None else converter(value)
+            if self.methods:
+                instance=SimpleNamespace(**row)
+                for name , method in self.methods:
+                    item[name]=method(instance)
+            for name , _ , child in self.relations:
+                related_pk , grouped=related[name]
+                child_rows=grouped.get(row[pk] , ())
+                if name not in included:
+                    item[name]=[
+                        self._represent_child(child_row , child)
+                        for child_row in child_rows
+                    ]
+                    continue
+                seen=included[name]
+                item[name]=[]
+                for child_row in child_rows:
+                    key=child_row[related_pk]
+                    item[name].append(key)
+                    if key not in seen:
+                        seen[key]=self._represent_child(child_row , child)
+            # the declared field order of the serializer
+            data.append({name:item[name] for name in order})
+        included={
+            name:{str(key):value for key , value in objects.items()}
+            for name , objects in included.items()
+        }
+        return data , included
+
+    def values(self , queryset):
+        '''
+        queryset rows with the columns the plan reads , the ordering columns
+        and the selected annotations ( e.g. rank ) the cursor pagination reads
+        '''
+        ordering=[name.lstrip('-') for name in queryset.query.order_by]
+        names=dict.fromkeys(
+            [*self.columns , *ordering , *queryset.query.annotation_select]
+        )
+        return queryset.prefetch_related(None).values(*names)
+
+
+class FastReadMixin:
+    '''
+    serve list and retrieve through FastSerializer when API_FAST_SERIALIZERS
+    is on and the serializer can be compiled , otherwise the regular path
+    '''
+
+    def get_fast_serializer(self):
+        if not settings.API_FAST_SERIALIZERS:
+            return None
+        return FastSerializer.compile(self.get_serializer())
+
+    def list(self , request , *args , **kwargs):
+        fast=self.get_fast_serializer()
+        if fast is None:
+            return super().list(request , *args , **kwargs)
+        queryset=fast.values(self.filter_queryset(self.get_queryset()))
+        page=self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.to_representation_many(page))
+        return Response(fast.to_representation_many(queryset))
+
+    def retrieve(self , request , *args , **kwargs):
+        fast=self.get_fast_serializer()
+        if fast is None:
+            return super().retrieve(request , *args , **kwargs)
+        lookup_url_kwarg=self.lookup_url_kwarg or self.lookup_field
+        row=get_object_or_404(
+            fast.values(self.filter_queryset(self.get_queryset())) ,
+            **{self.lookup_field:kwargs[lookup_url_kwarg]} ,
+        )
+        self.check_object_permissions(request , row)
+        return Response(fast.to_representation_many([row])[0])
@@ -0,0 +1,151 @@
+'''
+sparse fieldsets for the recipe , tag and ingredient endpoints .
+
+?fields=id,title keeps only the listed fields of list / retrieve responses ,
+?omit=description drops some . the selection is pushed down to the queryset :
+columns no selected field reads are deferred and nested relations that are
+not rendered are not prefetched .
+'''
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.utils import OpenApiParameter , OpenApiTypes
+from rest_framework.exceptions import ValidationError
+
+FIELDSET_PARAMETERS=[
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='comma separated fields to return , e.g. id,title'
+    ),
+    OpenApiParameter(
+        'omit',
+        OpenApiTypes.STR,
+        description='comma separated fields to leave out , e.g. description'
+    ),
+]
+
+# names : serializer fields to render
+# columns : model columns they read , None when unknown ( load everything )
+# relations : many to many relations they render
+Fieldset=namedtuple('Fieldset' , ['names' , 'columns' , 'relations'])
+
+
+def _split(value):
+    ''' names listed in value , None when there are none ( ?fields= ) '''
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()] or None
+
+
+class SparseFieldsMixin:
+    ''' serializer taking fields= / omit= to trim its fields '''
+
+    def __init__(self , *args , fields=None , omit=None , **kwargs):
+        super().__init__(*args , **kwargs)
+        self._only_fields=fields
+        self._omit_fields=omit
+
+    def get_fields(self):
+        fields=super().get_fields()
+        if self._only_fields is not None:
+            fields={
+                name:field for name , field in fields.items()
+                if name in self._only_fields
+            }
+        for name in self._omit_fields or ():
+            fields.pop(name , None)
+        return fields
+
+
+def fieldset_sources(serializer , names):
+    '''
+    ( columns , relations ) of the model read by the serializer fields names .
+    Meta.fieldset_sources maps fields that are not backed by a single model
+    field ( method fields ) to the columns they need
+    '''
+    meta=serializer.Meta
+    model_meta=meta.model._meta
+    declared=getattr(meta , 'fieldset_sources' , {})
+    columns={model_meta.pk.name}
+    relations=set()
+    for name in names:
+        if name in declared:
+            columns.update(declared[name])
+            continue
+        source=serializer.fields[name].source.split('.')[0]
+        try:
+            model_field=model_meta.get_field(source)
+        except FieldDoesNotExist:
+            if source=='*':
+                # reads anything from the instance
+                return None , set(names)
+            # an annotation , computed by the queryset
+            continue
+        if model_field.many_to_many:
+            relations.add(source)
+        elif model_field.concrete:
+            columns.add(model_field.attname if model_field.is_relation
+                else source)
+    return columns , relations
+
+
+class SparseFieldsetMixin:
+    '''
+    viewset mixin handling ?fields= / ?omit= on list and retrieve , the
+    serializer must include SparseFieldsMixin
+    '''
+    fieldset_actions=('list' , 'retrieve')
+
+    def get_fieldset(self):
+        ''' the requested Fieldset , None when every field is rendered '''
+        if hasattr(self , '_fieldset'):
+            return self._fieldset
+        self._fieldset=None
+        params=self.request.query_params
+        only=_split(params.get('fields'))
+        omit=_split(params.get('omit')) or []
+        if self.action not in self.fieldset_actions or (only is None and not omit):
+            return None
+
+        serializer=self.get_serializer_class()(context=self.get_serializer_context())
+        available=list(serializer.fields)
+        for param , names in (('fields' , only or []) , ('omit' , omit)):
+            unknown=[name for name in names if name not in available]
+            if unknown:
+                raise ValidationError(
+                    {param:_('unknown fields: %s') % ', '.join(unknown)}
+                )
+        names=[
+            name for name in available
+            if (only is None or name in only) and name not in omit
+        ]
+        self._fieldset=Fieldset(names , *fieldset_sources(serializer , names))
+        return self._fieldset
+
+    def get_serializer(self , *args , **kwargs):
+        fieldset=self.get_fieldset()
+        if fieldset is not None:
+            kwargs['fields']=fieldset.names
+        return super().get_serializer(*args , **kwargs)
+
+    def sparse_queryset(self , queryset , prefetch=()):
+        '''
+        prefetch the relations of prefetch that are rendered and , for a
+        sparse fieldset , only load the columns its fields and the ordering
+        read
+        '''
+        fieldset=self.get_fieldset()
+        if fieldset is None:
+            return queryset.prefetch_related(*prefetch)
+        if fieldset.columns is not None:
+            # the cursor pagination reads the ordering fields of each row
+            ordering=[
+                name.lstrip('-') for name in queryset.query.order_by
+                if name.lstrip('-') not in queryset.query.annotations
+            ]
+            queryset=queryset.only(*fieldset.columns , *ordering)
+        return queryset.prefetch_related(
+            *[relation for relation in prefetch if relation in fieldset.relations]
+        )
@@ -0,0 +1,59 @@
+from django.db.models import Count , Exists , OuterRef
+from django.db.models.functions import Lower
+from core.models import Recipe
+
+
+def filter_by_related(queryset , relation , ids , match_all=False):
+    '''
+    filter recipes by ids of a many to many relation ( tags / ingredients )
+    using semi joins on the through table , so rows are never duplicated
+    and no DISTINCT is needed .
+    match_all keeps only recipes linked to every requested id .
+    '''
+    field=Recipe._meta.get_field(relation)
+    through=field.remote_field.through
+    source=field.m2m_field_name()
+    target=field.m2m_reverse_field_name()
+    links=through.objects.filter(**{f'{target}_id__in':ids})
+
+    if not match_all:
+        return queryset.filter(
+            Exists(links.filter(**{f'{source}_id':OuterRef('pk')}))
+        )
+    # through rows are unique per (recipe , item) , so counting them per
+    # recipe tells whether every requested id is linked
+    matching=links.values(f'{source}_id')\
+        .annotate(matched=Count(f'{target}_id'))\
+        .filter(matched=len(set(ids)))\
+        .values(f'{source}_id')
+    return queryset.filter(pk__in=matching)
+
+
+def filter_assigned(queryset):
+    '''
+    keep tags / ingredients linked to at least one recipe with a semi join
+    on the recipe through table instead of joining and DISTINCT
+    '''
+    field=next(
+        field for field in Recipe._meta.many_to_many
+        if field.related_model is queryset.model
+    )
+    through=field.remote_field.through
+    target=field.m2m_reverse_field_name()
+    return queryset.filter(
+        Exists(through.objects.filter(**{f'{target}_id':OuterRef('pk')}))
+    )
+
+
+def annotate_recipe_count(queryset):
+    ''' number of recipes using each tag / ingredient as one grouped count '''
+    return queryset.annotate(recipe_count=Count('recipe'))
+
+
+def filter_prefix(queryset , prefix):
+    '''
+    tags / ingredients whose name starts with prefix , ignoring case .
+    matches the lower(name) text_pattern_ops index on postgres
+    '''
+    return queryset.alias(name_lower=Lower('name'))\
+        .filter(name_lower__startswith=prefix.lower())
@@ -0,0 +1,266 @@
+'''
+background processing of uploaded recipe images .
+
+the upload endpoint only stores the raw file and marks the recipe pending ,
+a bounded per process thread pool then strips EXIF , applies the EXIF
+orientation , re encodes the image and renders the RECIPE_IMAGE_SIZES
+variants . uploads that do not fit in the pool , or were still queued in a
+worker that exited , stay pending : the pool of any worker queues them
+again once they are pending for IMAGE_STALE_AFTER seconds , and
+`python manage.py process_images` processes every pending one .
+'''
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections , transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image , ImageOps , features
+
+from core.models import Recipe , StoredFile
+from recipe.cache import response_cache
+
+logger=logging.getLogger(__name__)
+
+# pillow >= 9.1 moved the resampling filters
+LANCZOS=getattr(Image , 'Resampling' , Image).LANCZOS
+
+
+def output_format():
+    ''' (pillow format , file extension) used for every variant '''
+    if features.check('webp'):
+        return 'WEBP' , 'webp'
+    return 'JPEG' , 'jpg'
+
+
+def decode_image(source , largest):
+    '''
+    decode the image in the file object source , upright and without any
+    metadata , largest is the biggest bounding box that will be rendered
+    '''
+    image_format , _ = output_format()
+    with Image.open(source) as image:
+        # jpeg can decode straight at a reduced scale , much faster for
+        # large phone photos than decoding everything and resizing
+        image.draft('RGB' , (largest , largest))
+        image=ImageOps.exif_transpose(image)
+        alpha=image.mode in ('RGBA' , 'LA') or 'transparency' in image.info
+        mode='RGBA' if alpha and image_format=='WEBP' else 'RGB'
+        image=image.convert(mode)
+    # encoders copy some metadata ( exif , icc ) from info , drop all of it
+    image.info={}
+    return image
+
+
+def encode_image(image , image_format , quality=None):
+    ''' bytes of image saved as image_format ( WEBP / JPEG ) '''
+    options={'format':image_format ,
+        'quality':quality or settings.RECIPE_IMAGE_QUALITY}
+    if image_format=='WEBP':
+        options['method']=4
+    else:
+        if image.mode != 'RGB':
+            image=image.convert('RGB')
+        options.update(optimize=True , progressive=True)
+    output=io.BytesIO()
+    image.save(output , **options)
+    return output.getvalue()
+
+
+def render_variants(source , sizes=None , quality=None):
+    '''
+    return {variant name:encoded bytes} of the image in the file object
+    source for every bounding box in sizes
+    '''
+    sizes=sizes or settings.RECIPE_IMAGE_SIZES
+    image_format , _ = output_format()
+    image=decode_image(source , max(sizes.values()))
+
+    variants={}
+    # largest first , every variant is reduced from the previous one
+    for name , size in sorted(sizes.items() , key=lambda item: -item[1]):
+        image=image.copy()
+        image.thumbnail((size , size) , LANCZOS , reducing_gap=3.0)
+        variants[name]=encode_image(image , image_format , quality)
+    return variants
+
+
+def _set_status(recipe , image_name , **fields):
+    '''
+    update the image fields of recipe unless another upload replaced
+    image_name or another job finished it meanwhile , return whether the row
+    was updated
+    '''
+    updated=Recipe.objects.filter(pk=recipe.pk , image=image_name ,
+        image_status=Recipe.ImageStatus.PENDING).update(**fields)
+    if updated:
+        response_cache.bump(recipe.user_id)
+    return bool(updated)
+
+
+def process_recipe_image(recipe_id):
+    '''
+    render and store the variants of the current image of a recipe , only
+    while it is pending : a ready image is already re encoded and would lose
+    quality every time
+    '''
+    recipe=Recipe.objects.filter(pk=recipe_id)\
+        .only('id' , 'user_id' , 'image' , 'image_variants').first()
+    if recipe is None or not recipe.image:
+        return
+    image_name=recipe.image.name
+    # the claim restarts the stale clock , recovery leaves it alone meanwhile
+    if not Recipe.objects.filter(pk=recipe_id , image=image_name ,
+            image_status=Recipe.ImageStatus.PENDING)\
+            .update(image_queued_at=timezone.now()):
+        return
+    try:
+        with default_storage.open(image_name , 'rb') as source:
+            rendered=render_variants(source)
+    except (OSError , ValueError , Image.DecompressionBombError):
+        logger.warning('could not process image of recipe %s' , recipe_id ,
+            exc_info=True)
+        _set_status(recipe , image_name , image_status=Recipe.ImageStatus.FAILED)
+        return
+
+    _ , extension = output_format()
+    # stored under their content hash , the name only gives dir and extension
+    variants={
+        name:default_storage.save(
+            os.path.join('uploads' , 'recipe' , f'{name}.{extension}') ,
+            ContentFile(data) ,
+        )
+        for name , data in rendered.items()
+    }
+    with transaction.atomic():
+        if _set_status(recipe , image_name , image=variants['full'] ,
+                image_variants=variants , image_status=Recipe.ImageStatus.READY):
+            StoredFile.objects.acquire(variants['full'] , *variants.values())
+            # the raw upload still carries its EXIF , once unreferenced it
+            # goes with the next gc_media run
+            StoredFile.objects.release(*recipe.stored_files())
+    # otherwise a newer upload won and its own job renders it , the files
+    # saved here stay unreferenced and are collected the same way
+
+
+def claim_stale_images(limit):
+    '''
+    ids of up to limit recipes pending for longer than IMAGE_STALE_AFTER ,
+    their clock restarts so the pools of other workers skip them
+    '''
+    now=timezone.now()
+    # rows pending since before image_queued_at existed have none
+    stale=Q(image_status=Recipe.ImageStatus.PENDING) & (
+        Q(image_queued_at__lt=now-timedelta(seconds=settings.IMAGE_STALE_AFTER)) |
+        Q(image_queued_at__isnull=True)
+    )
+    claimed=[]
+    for recipe_id in Recipe.objects.filter(stale).order_by('id')\
+            .values_list('id' , flat=True)[:limit]:
+        if Recipe.objects.filter(stale , pk=recipe_id).update(image_queued_at=now):
+            claimed.append(recipe_id)
+    return claimed
+
+
+class ImagePipeline:
+    '''
+    bounded thread pool running func(recipe_id) off the request path .
+    the executor is created lazily so forked uwsgi workers get their own .
+    recover(limit) returns ids of lost jobs to queue again , called when the
+    executor starts and then at most every IMAGE_STALE_AFTER seconds , on
+    submits and finished jobs
+    '''
+    def __init__(self , func , workers=None , backlog=None , recover=None):
+        self.func=func
+        self.workers=workers
+        self.backlog=backlog
+        self.recover=recover
+        self._executor=None
+        self._slots=None
+        self._pid=None
+        self._next_recovery=0
+        self._lock=threading.Lock()
+
+    def _capacity(self):
+        workers=self.workers or settings.IMAGE_WORKERS
+        backlog=self.backlog if self.backlog is not None \
+            else settings.IMAGE_BACKLOG
+        return workers , workers+backlog
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                workers , capacity = self._capacity()
+                self._executor=ThreadPoolExecutor(
+                    max_workers=workers , thread_name_prefix='recipe-image'
+                )
+                self._slots=threading.BoundedSemaphore(capacity)
+                self._pid=os.getpid()
+                self._next_recovery=0
+
+    def _schedule_recovery(self):
+        if self.recover is None:
+            return
+        with self._lock:
+            now=time.monotonic()
+            if now < self._next_recovery or self._executor is None:
+                return
+            self._next_recovery=now+settings.IMAGE_STALE_AFTER
+            executor=self._executor
+        try:
+            executor.submit(self._recover)
+        except RuntimeError:
+            # shut down meanwhile
+            pass
+
+    def _recover(self):
+        try:
+            for recipe_id in self.recover(self._capacity()[1]):
+                logger.info('queueing stale image of recipe %s again' , recipe_id)
+                if not self.submit(recipe_id):
+                    break
+        except Exception:
+            logger.exception('image pipeline recovery failed')
+        finally:
+            connections.close_all()
+
+    def submit(self , recipe_id):
+        ''' queue recipe_id , False when the pool and its backlog are full '''
+        self._ensure_executor()
+        self._schedule_recovery()
+        if not self._slots.acquire(blocking=False):
+            logger.warning('image pipeline full , recipe %s stays pending' ,
+                recipe_id)
+            return False
+        self._executor.submit(self._run , recipe_id)
+        return True
+
+    def _run(self , recipe_id):
+        try:
+            self.func(recipe_id)
+        except Exception:
+            logger.exception('image pipeline failed for recipe %s' , recipe_id)
+        finally:
+            self._slots.release()
+            # worker threads own their connections , do not leak them
+            connections.close_all()
+        # jobs rejected while the pool was full
+        self._schedule_recovery()
+
+    def shutdown(self , wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+            self._executor=None
+            self._pid=None
+
+
+image_pipeline=ImagePipeline(process_recipe_image , recover=claim_stale_images)
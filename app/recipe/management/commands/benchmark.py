@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand , CommandError
+from django.db import transaction
+
+from recipe.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help='run recipe api benchmarks on a seeded dataset ( rolled back after )'
+
+    def add_arguments(self , parser):
+        parser.add_argument('names' , nargs='*' ,
+            help=f'benchmarks to run , default all of {sorted(BENCHMARKS)}')
+        parser.add_argument('--size' , type=int , default=1000 ,
+            help='number of recipes to seed')
+
+    def handle(self , *args , **options):
+        names=options['names'] or sorted(BENCHMARKS)
+        unknown=set(names)-set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f'unknown benchmarks {sorted(unknown)}')
+
+        def report(label , seconds):
+            self.stdout.write(f'  {label:<40} {seconds*1000:10.2f} ms')
+
+        for name in names:
+            self.stdout.write(f'{name} ( size={options["size"]} )')
+            with transaction.atomic():
+                BENCHMARKS[name](options['size'] , report)
+                transaction.set_rollback(True)
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand , CommandError
+
+from recipe.ndjson import export_library
+
+
+class Command(BaseCommand):
+    help='stream the recipe library of a user as ndjson'
+
+    def add_arguments(self , parser):
+        parser.add_argument('email')
+        parser.add_argument('--output' , help='file to write , default stdout')
+        parser.add_argument('--chunk-size' , type=int , default=500)
+
+    def handle(self , *args , **options):
+        try:
+            user=get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user with email {options["email"]}')
+
+        lines=export_library(user , chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'] , 'wb') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line.decode() , ending='')
@@ -0,0 +1,125 @@
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import StoredFile
+
+
+def iter_files(root):
+    '''
+    yield the os.DirEntry of every file below root . only the pending
+    directory paths are kept , never a whole listing
+    '''
+    pending=[root]
+    while pending:
+        try:
+            entries=os.scandir(pending.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def collect(path , name , trash , cutoff):
+    '''
+    delete the file at path unless it was touched after cutoff or is
+    referenced again , return its size when it was deleted . it is renamed
+    into trash first : a concurrent save of the same content then writes a
+    new copy , and a save or acquire that came before the rename is seen by
+    the checks after it , which put the file back
+    '''
+    trashed=os.path.join(trash , f'{os.getpid()}-{os.path.basename(path)}')
+    try:
+        os.rename(path , trashed)
+    except FileNotFoundError:
+        return None
+    stat=os.stat(trashed)
+    if stat.st_mtime > cutoff or \
+            StoredFile.objects.filter(name=name , refcount__gt=0).exists():
+        try:
+            # never over a copy saved meanwhile
+            os.link(trashed , path)
+        except FileExistsError:
+            pass
+        os.remove(trashed)
+        return None
+    os.remove(trashed)
+    StoredFile.objects.filter(name=name , refcount=0).delete()
+    return stat.st_size
+
+
+def chunked(iterable , size):
+    iterator=iter(iterable)
+    while True:
+        chunk=list(islice(iterator , size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help='delete media files no row references anymore'
+
+    def add_arguments(self , parser):
+        parser.add_argument('--prefix' , default='uploads' ,
+            help='directory below MEDIA_ROOT to collect , default uploads')
+        parser.add_argument('--min-age' , type=int , default=3600 ,
+            help='keep files modified less than this many seconds ago , they '
+            'may belong to an upload that is not committed yet')
+        parser.add_argument('--batch-size' , type=int , default=500)
+        parser.add_argument('--dry-run' , action='store_true')
+
+    def handle(self , *args , **options):
+        media_root=os.path.abspath(settings.MEDIA_ROOT)
+        # on the same filesystem as the files , renames stay atomic
+        trash=os.path.join(media_root , '.gc-trash')
+        os.makedirs(trash , exist_ok=True)
+        cutoff=time.time()-options['min_age']
+        removed=0
+        freed=0
+        files=(
+            entry for entry in iter_files(
+                os.path.join(media_root , options['prefix'])
+            )
+            # dot files are temporary files of uploads in progress
+            if not entry.name.startswith('.')
+        )
+        for chunk in chunked(files , options['batch_size']):
+            names={
+                os.path.relpath(entry.path , media_root).replace(os.sep , '/'):entry
+                for entry in chunk
+            }
+            referenced=set(
+                StoredFile.objects.filter(name__in=names , refcount__gt=0)
+                .values_list('name' , flat=True)
+            )
+            for name , entry in names.items():
+                if name in referenced:
+                    continue
+                try:
+                    # stat again , an upload of the same content may have
+                    # just touched it
+                    stat=os.stat(entry.path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > cutoff:
+                    continue
+                if options['dry_run']:
+                    removed+=1
+                    freed+=stat.st_size
+                    self.stdout.write(name)
+                    continue
+                size=collect(entry.path , name , trash , cutoff)
+                if size is not None:
+                    removed+=1
+                    freed+=size
+
+        verb='would remove' if options['dry_run'] else 'removed'
+        self.stdout.write(f'{verb} {removed} files , {freed} bytes')
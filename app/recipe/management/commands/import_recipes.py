@@ -0,0 +1,33 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand , CommandError
+
+from recipe.ndjson import import_library , LibraryImportError
+
+
+class Command(BaseCommand):
+    help='import an ndjson recipe library into the library of a user'
+
+    def add_arguments(self , parser):
+        parser.add_argument('email')
+        parser.add_argument('--input' , help='file to read , default stdin')
+        parser.add_argument('--batch-size' , type=int , default=500)
+
+    def handle(self , *args , **options):
+        try:
+            user=get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user with email {options["email"]}')
+
+        source=open(options['input'] , 'rb') if options['input'] else sys.stdin
+        try:
+            imported=import_library(
+                user , source , batch_size=options['batch_size']
+            )
+        except LibraryImportError as e:
+            raise CommandError(f'{e} , imported before it {e.imported}')
+        finally:
+            if options['input']:
+                source.close()
+        self.stdout.write(f'imported {imported}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    help='process recipe images left pending , e.g. after a restart'
+
+    def add_arguments(self , parser):
+        parser.add_argument('--retry-failed' , action='store_true' ,
+            help='also retry images whose processing failed')
+
+    def handle(self , *args , **options):
+        if options['retry_failed']:
+            # only pending images are processed
+            Recipe.objects.filter(image_status=Recipe.ImageStatus.FAILED)\
+                .update(image_status=Recipe.ImageStatus.PENDING)
+        recipe_ids=Recipe.objects.filter(image_status=Recipe.ImageStatus.PENDING)\
+            .values_list('id' , flat=True).order_by('id')
+        processed=0
+        for recipe_id in recipe_ids.iterator():
+            process_recipe_image(recipe_id)
+            processed+=1
+        self.stdout.write(f'processed {processed} images')
@@ -0,0 +1,203 @@
+'''
+newline delimited json export / import of a user recipe library .
+every line is one object with a "type" of tag , ingredient or recipe ,
+related items are referenced by name so a library can move between users
+and databases . both directions work in bounded chunks , memory does not
+grow with the size of the library .
+'''
+import json
+from itertools import islice
+
+from django.db import connection , transaction
+from rest_framework import serializers
+from rest_framework.parsers import BaseParser
+
+from core.models import Recipe , Tag , Ingredient
+from recipe.cache import response_cache
+from recipe.serializers import resolve_items
+
+CONTENT_TYPE='application/x-ndjson'
+RECIPE_FIELDS=['id' , 'title' , 'description' , 'price' , 'time_minutes' , 'link']
+
+
+class NDJSONParser(BaseParser):
+    ''' hand the raw request stream to the view so it can be read lazily '''
+    media_type=CONTENT_TYPE
+
+    def parse(self , stream , media_type=None , parser_context=None):
+        return stream if stream is not None else []
+
+
+def _chunks(iterable , size):
+    iterator=iter(iterable)
+    while True:
+        chunk=list(islice(iterator , size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _line(obj):
+    return (json.dumps(obj , separators=(',' , ':')) + '\n').encode()
+
+
+def _names_by_recipe(relation , recipe_ids):
+    ''' prefetch { recipe id : [names] } of one relation for a chunk '''
+    field=Recipe._meta.get_field(relation)
+    target=field.m2m_reverse_field_name()
+    rows=field.remote_field.through.objects.filter(recipe_id__in=recipe_ids)\
+        .values_list('recipe_id' , f'{target}__name')
+    names={}
+    for recipe_id , name in rows:
+        names.setdefault(recipe_id , []).append(name)
+    return names
+
+
+def export_library(user , chunk_size=500):
+    ''' yield the library of user as ndjson encoded lines '''
+    for line_type , model in (('tag' , Tag) , ('ingredient' , Ingredient)):
+        names=model.objects.filter(user=user).order_by('id')\
+            .values_list('name' , flat=True).iterator(chunk_size=chunk_size)
+        for name in names:
+            yield _line({'type':line_type , 'name':name})
+
+    # iterator() streams rows through a server side cursor , the relations
+    # are prefetched per chunk since prefetch_related can not be combined
+    # with it
+    recipes=Recipe.objects.filter(user=user).order_by('id')\
+        .values(*RECIPE_FIELDS).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(recipes , chunk_size):
+        ids=[recipe['id'] for recipe in chunk]
+        tags=_names_by_recipe('tags' , ids)
+        ingredients=_names_by_recipe('ingredients' , ids)
+        for recipe in chunk:
+            recipe_id=recipe.pop('id')
+            recipe['price']=str(recipe['price'])
+            yield _line({
+                'type':'recipe' ,
+                **recipe ,
+                'tags':sorted(tags.get(recipe_id , [])) ,
+                'ingredients':sorted(ingredients.get(recipe_id , [])) ,
+            })
+
+
+class RecipeLineSerializer(serializers.ModelSerializer):
+    ''' validate one recipe line of an import '''
+    tags = serializers.ListField(child=serializers.CharField(max_length=255) ,
+        required=False)
+    ingredients = serializers.ListField(
+        child=serializers.CharField(max_length=255) , required=False)
+
+    class Meta:
+        model=Recipe
+        fields=['title' , 'description' , 'price' , 'time_minutes' , 'link' ,
+            'tags' , 'ingredients']
+
+
+class LibraryImportError(Exception):
+    ''' a line of an import could not be parsed or validated '''
+    def __init__(self , line_number , errors , imported):
+        super().__init__(f'line {line_number}: {errors}')
+        self.line_number=line_number
+        self.errors=errors
+        self.imported=imported
+
+
+def _write_batch(user , items , recipes):
+    ''' insert one bounded batch of parsed lines in a transaction '''
+    with transaction.atomic():
+        tag_names={name for name in items['tag']}
+        ingred_names={name for name in items['ingredient']}
+        for recipe in recipes:
+            tag_names.update(recipe.get('tags' , []))
+            ingred_names.update(recipe.get('ingredients' , []))
+        tags=resolve_items(Tag , user , tag_names)
+        ingredients=resolve_items(Ingredient , user , ingred_names)
+
+        objs=[
+            Recipe(user=user , **{
+                k:v for k , v in recipe.items() if k not in ('tags' , 'ingredients')
+            })
+            for recipe in recipes
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(objs)
+            # bulk_create skips save() , fill the search vectors in one update
+            Recipe.objects.filter(id__in=[obj.id for obj in objs])\
+                .update_search_vector()
+        else:
+            for obj in objs:
+                obj.save()
+
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=obj.id , tag_id=tags[name].id)
+            for obj , recipe in zip(objs , recipes)
+            for name in set(recipe.get('tags' , []))
+        ])
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(
+                recipe_id=obj.id , ingredient_id=ingredients[name].id
+            )
+            for obj , recipe in zip(objs , recipes)
+            for name in set(recipe.get('ingredients' , []))
+        ])
+        # bulk inserts send no signals
+        response_cache.bump(user.pk)
+
+
+def import_library(user , lines , batch_size=500):
+    '''
+    read ndjson lines ( bytes or str ) into the library of user , writing
+    every batch_size lines in its own transaction . return the number of
+    imported lines by type , raise LibraryImportError on the first bad line ,
+    batches before it stay imported .
+    '''
+    imported={'tag':0 , 'ingredient':0 , 'recipe':0}
+    items={'tag':[] , 'ingredient':[]}
+    recipes=[]
+
+    def flush():
+        if not (recipes or items['tag'] or items['ingredient']):
+            return
+        _write_batch(user , items , recipes)
+        for line_type in items:
+            imported[line_type]+=len(items[line_type])
+            items[line_type].clear()
+        imported['recipe']+=len(recipes)
+        recipes.clear()
+
+    for line_number , line in enumerate(lines , start=1):
+        if isinstance(line , bytes):
+            try:
+                line=line.decode()
+            except UnicodeDecodeError:
+                raise LibraryImportError(line_number , 'invalid utf-8' , imported)
+        if not line.strip():
+            continue
+        try:
+            obj=json.loads(line)
+        except ValueError:
+            raise LibraryImportError(line_number , 'invalid json object' , imported)
+        if not isinstance(obj , dict):
+            raise LibraryImportError(line_number , 'invalid json object' , imported)
+        line_type=obj.pop('type' , None)
+        if not isinstance(line_type , str):
+            raise LibraryImportError(line_number , {'type':'unknown'} , imported)
+
+        if line_type in items:
+            name=obj.get('name')
+            if not isinstance(name , str) or not name or len(name) > 255:
+                raise LibraryImportError(line_number , {'name':'invalid'} , imported)
+            items[line_type].append(name)
+        elif line_type=='recipe':
+            serializer=RecipeLineSerializer(data=obj)
+            if not serializer.is_valid():
+                raise LibraryImportError(line_number , serializer.errors , imported)
+            recipes.append(serializer.validated_data)
+        else:
+            raise LibraryImportError(line_number , {'type':'unknown'} , imported)
+
+        if len(recipes) + len(items['tag']) + len(items['ingredient']) >= batch_size:
+            flush()
+    flush()
+    return imported
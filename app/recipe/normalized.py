@@ -0,0 +1,96 @@
+'''
+side loaded ( normalized ) list responses .
+
+?format=normalized on a list renders the many to many relations of every
+row as lists of ids and adds one dictionary per relation , by str id , with
+each related object of the page once :
+
+    {"next":... , "previous":... ,
+     "results":[{"id":7 , "title":"soup" , "tags":[1 , 2] , ...}] ,
+     "tags":{"1":{"id":1 , "name":"vegan"} , "2":{...}} ,
+     "ingredients":{...}}
+
+format only picks the shape , the renderer still follows the Accept header
+so the normalized list also comes as msgpack .
+'''
+from drf_spectacular.utils import OpenApiParameter , OpenApiTypes
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+NORMALIZED='normalized'
+
+NORMALIZED_PARAMETER=OpenApiParameter(
+    api_settings.URL_FORMAT_OVERRIDE,
+    OpenApiTypes.STR,
+    enum=[NORMALIZED],
+    description='normalized returns the tags and ingredients of each recipe as '
+    'id lists , with one tags and one ingredients dictionary by id for the page',
+)
+
+
+def normalize(results , side_loaded):
+    '''
+    ( results , included ) of serializer output with the nested lists of
+    side_loaded replaced by ids , for serializers the fast path can not run
+    '''
+    included={name:{} for name in side_loaded}
+    normalized=[]
+    for item in results:
+        item=dict(item)
+        for name in side_loaded:
+            objects=included[name]
+            ids=[]
+            for related in item[name]:
+                ids.append(related['id'])
+                objects.setdefault(str(related['id']) , related)
+            item[name]=ids
+        normalized.append(item)
+    return normalized , included
+
+
+class NormalizedContentNegotiation(DefaultContentNegotiation):
+    ''' ?format=normalized selects the renderer from Accept like no format '''
+
+    def filter_renderers(self , renderers , format):
+        if format==NORMALIZED:
+            return renderers
+        return super().filter_renderers(renderers , format)
+
+
+class NormalizedListMixin:
+    '''
+    viewset mixin serving ?format=normalized lists , goes before
+    FastReadMixin whose FastSerializer side loads without rendering the
+    repeated related objects
+    '''
+    side_loaded=()
+    content_negotiation_class=NormalizedContentNegotiation
+
+    def is_normalized(self):
+        return self.action=='list' and self.request.query_params.get(
+            api_settings.URL_FORMAT_OVERRIDE)==NORMALIZED
+
+    def list(self , request , *args , **kwargs):
+        if not self.is_normalized():
+            return super().list(request , *args , **kwargs)
+
+        queryset=self.filter_queryset(self.get_queryset())
+        fast=self.get_fast_serializer()
+        if fast is not None:
+            queryset=fast.values(queryset)
+        page=self.paginate_queryset(queryset)
+        rows=queryset if page is None else page
+        if fast is not None:
+            results , included=fast.to_normalized_many(rows , self.side_loaded)
+        else:
+            serializer=self.get_serializer(rows , many=True)
+            results , included=normalize(serializer.data , [
+                name for name in self.side_loaded
+                if name in serializer.child.fields
+            ])
+        if page is None:
+            return Response({'results':results , **included})
+        response=self.get_paginated_response(results)
+        response.data.update(included)
+        return response
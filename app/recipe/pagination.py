@@ -0,0 +1,39 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    ''' keyset pagination over the recipe list , newest first '''
+    ordering = '-id'
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_schema_operation_parameters(self , view):
+        parameters=super().get_schema_operation_parameters(view)
+        for parameter in parameters:
+            # see recipe.streaming
+            if parameter['name']==self.page_size_query_param:
+                parameter['description']='number of results per page , or all '\
+                    'to stream every result in a single json response'
+                parameter['schema']={'oneOf':[
+                    {'type':'integer'} , {'type':'string' , 'enum':['all']}
+                ]}
+        return parameters
+
+    def get_ordering(self , request , queryset , view):
+        # ranked search results are paged by relevance first
+        if 'rank' in queryset.query.annotations:
+            return ('-rank' , '-id')
+        return super().get_ordering(request , queryset , view)
+
+
+class RecipeItemCursorPagination(RecipeCursorPagination):
+    ''' keyset pagination for tags and ingredients ordered by name '''
+    ordering = '-name'
+
+    def get_ordering(self , request , queryset , view):
+        # most used first , ties keep the name order
+        if request.query_params.get('ordering')=='popular':
+            return ('-recipe_count' , '-name')
+        return super().get_ordering(request , queryset , view)
@@ -0,0 +1,34 @@
+from django.contrib.postgres.search import SearchQuery , SearchRank
+from django.db import connections
+from django.db.models import Case , F , FloatField , IntegerField , Value , When
+from django.db.models.functions import Cast
+
+from core.models import SEARCH_CONFIG
+
+
+def search_recipes(queryset , text):
+    '''
+    filter recipes matching text against their stored search vector and
+    annotate a relevance rank ( higher is better )
+    '''
+    if connections[queryset.db].vendor == 'postgresql':
+        query=SearchQuery(text , search_type='websearch' , config=SEARCH_CONFIG)
+        # ts_rank is a real , cast it so the value survives a round trip
+        # through the pagination cursor unchanged
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector') , query) , FloatField())
+        )
+
+    # portable fallback , every term must appear in the stored lower cased
+    # text , title matches rank higher
+    terms=text.lower().split()
+    if not terms:
+        return queryset
+    for term in terms:
+        queryset=queryset.filter(search_vector__contains=term)
+    title_hits=sum(
+        Case(When(title__icontains=term , then=Value(1)) , default=Value(0) ,
+            output_field=IntegerField())
+        for term in terms
+    )
+    return queryset.annotate(rank=Cast(title_hits , FloatField()))
@@ -1,23 +1,92 @@
 from rest_framework import serializers
+from drf_spectacular.utils import extend_schema_field
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
 from core.models import Recipe , Tag , Ingredient
+from recipe.variants import FORMATS
+from recipe.fieldsets import SparseFieldsMixin
 
-class TagSerializer(serializers.ModelSerializer):
+def resolve_items(model , user , names):
+    '''
+    map names to the user rows of model ( Tag / Ingredient ) with one
+    select , bulk inserting the missing names in a single statement
+    '''
+    names=set(names)
+    if not names:
+        return {}
+    found={obj.name:obj for obj in model.objects.filter(user=user , name__in=names)}
+    missing=names-found.keys()
+    if missing:
+        # rows inserted meanwhile by a concurrent request are skipped by the
+        # (user , name) unique constraint and picked up by the select below
+        model.objects.bulk_create(
+            [model(user=user , name=name) for name in missing] ,
+            ignore_conflicts=True ,
+        )
+        found.update({
+            obj.name:obj
+            for obj in model.objects.filter(user=user , name__in=missing)
+        })
+    return found
+
+class RecipeItemSerializer(SparseFieldsMixin , serializers.ModelSerializer):
+    ''' base for tags and ingredients , names are unique per user '''
+    # filled by annotate_recipe_count , skipped when the rows are not
+    # annotated , e.g. nested in a recipe
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    def validate_name(self , value):
+        # nested in a recipe payload , names refer to existing items on purpose
+        if self.parent is not None:
+            return value
+        queryset=self.Meta.model.objects.filter(
+            user=self.context['request'].user , name=value
+        )
+        if self.instance is not None:
+            queryset=queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(_('name already exists'))
+        return value
+
+class TagSerializer(RecipeItemSerializer):
 
     class Meta:
         model = Tag
-        fields = ['id' , 'name']
-        read_only_fields = ['id']
+        fields = ['id' , 'name' , 'recipe_count']
+        read_only_fields = ['id' , 'recipe_count']
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(RecipeItemSerializer):
     class Meta:
         model = Ingredient
-        fields = ['id' , 'name']
-        read_only_fields = ['id']
+        fields = ['id' , 'name' , 'recipe_count']
+        read_only_fields = ['id' , 'recipe_count']
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    ''' query params of the tag / ingredient autocomplete '''
+    prefix = serializers.CharField(max_length=255 , trim_whitespace=False)
+    limit = serializers.IntegerField(
+        min_value=1 ,
+        max_value=settings.AUTOCOMPLETE_MAX_RESULTS ,
+        default=settings.AUTOCOMPLETE_MAX_RESULTS ,
+    )
+
+class ImageVariantQuerySerializer(serializers.Serializer):
+    ''' query params of the resized recipe image '''
+    width = serializers.ChoiceField(choices=settings.IMAGE_VARIANT_WIDTHS)
+    format = serializers.ChoiceField(choices=sorted(FORMATS) , required=False ,
+        help_text='defaults to webp when the Accept header allows it')
+
+class ItemSuggestionSerializer(serializers.Serializer):
+    ''' one autocomplete suggestion , documentation only '''
+    id = serializers.IntegerField()
+    name = serializers.CharField()
 
 
 
 
-class RecipeSerializer(serializers.ModelSerializer ):
+class RecipeSerializer(SparseFieldsMixin , serializers.ModelSerializer ):
     # by deafult nested serializer are read_only
     tags = TagSerializer(many=True , required=False)
     ingredients = IngredientSerializer(many = True , required = False)
@@ -26,22 +95,30 @@ class RecipeSerializer(serializers.ModelSerializer ):
         fields=['id' , 'title' , 'price' , 'time_minutes' , 'link' , 'tags' , 'ingredients']
         read_only_fields=['id']
 
-    def _create_or_get_obj(self , tags , recipe):
-        auth_user=self.context['request'].user
+    def _resolve(self , model , items):
+        ''' rows for nested items , reusing a batch wide resolution if any '''
+        names=[item['name'] for item in items]
+        resolved=self.context.get('resolved_items' , {}).get(model)
+        if resolved is None:
+            resolved=resolve_items(model , self.context['request'].user , names)
+        return [resolved[name] for name in set(names)]
 
-        for tag in tags:
-            tag_obj , created = Tag.objects.\
-                get_or_create(user=auth_user , **tag)
-            recipe.tags.add(tag_obj)
+    def _create_or_get_obj(self , tags , recipe , replace=False):
+        found=self._resolve(Tag , tags)
+        # set() only deletes/inserts the through rows that differ
+        if replace:
+            recipe.tags.set(found)
+        else:
+            recipe.tags.add(*found)
 
-    def _get_or_create_ingred(self , ingredients , recipe):
-        auth_user=self.context['request'].user
-
-        for ingred in ingredients:
-            ingred_obj , created = Ingredient.objects.\
-                get_or_create(user=auth_user , **ingred)
-            recipe.ingredients.add(ingred_obj)
+    def _get_or_create_ingred(self , ingredients , recipe , replace=False):
+        found=self._resolve(Ingredient , ingredients)
+        if replace:
+            recipe.ingredients.set(found)
+        else:
+            recipe.ingredients.add(*found)
 
+    @transaction.atomic
     def create(self , validated_data):
         tags = validated_data.pop('tags' , [])
         ingredients = validated_data.pop('ingredients' , [])
@@ -52,32 +129,157 @@ class RecipeSerializer(serializers.ModelSerializer ):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags=validated_data.pop('tags' , None)
         ingreds=validated_data.pop('ingredients' , None)
         if tags is not None :
-            instance.tags.clear()
-            self._create_or_get_obj(tags, instance)
+            self._create_or_get_obj(tags, instance , replace=True)
         if ingreds is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingred(ingreds, instance)
+            self._get_or_create_ingred(ingreds, instance , replace=True)
 
         for k , v in validated_data.items():
             setattr(instance, k, v)
         instance.save()
         return instance
 
-class RecipeDetailSerializer(RecipeSerializer):
+class RecipeImagesMixin(serializers.Serializer):
+    ''' status and urls of the processed variants of the recipe image '''
+    images = serializers.SerializerMethodField()
+
+    @extend_schema_field(
+        serializers.DictField(child=serializers.URLField() , allow_null=True)
+    )
+    def get_images(self , recipe):
+        # urls only once every variant is rendered
+        if recipe.image_status != Recipe.ImageStatus.READY:
+            return None
+        request=self.context.get('request')
+        urls={}
+        for name , path in recipe.image_variants.items():
+            url=default_storage.url(path)
+            urls[name]=request.build_absolute_uri(url) if request else url
+        return urls
+
+class RecipeDetailSerializer(RecipeImagesMixin , RecipeSerializer):
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields
+        fields = RecipeSerializer.Meta.fields+['image_status' , 'images']
+        read_only_fields = RecipeSerializer.Meta.read_only_fields+['image_status']
+        fieldset_sources = {'images':['image_status' , 'image_variants']}
+
+class RecipeBatchOperationSerializer(serializers.Serializer):
+    ''' one create / update / delete operation of a batch request '''
+    op = serializers.ChoiceField(choices=['create' , 'update' , 'delete'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self , attrs):
+        if attrs['op']!='create' and 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id':_('required for update and delete')}
+            )
+        if attrs['op']=='create' and 'id' in attrs:
+            raise serializers.ValidationError(
+                {'id':_('not allowed for create')}
+            )
+        if attrs['op']!='delete' and 'data' not in attrs:
+            raise serializers.ValidationError(
+                {'data':_('required for create and update')}
+            )
+        return attrs
+
+class RecipeBatchSerializer(serializers.Serializer):
+    '''
+    validate a list of recipe operations together and apply them in one
+    transaction , nested tags/ingredients of the whole batch are resolved
+    in a single pass
+    '''
+    operations = RecipeBatchOperationSerializer(many=True , allow_empty=False)
+
+    def validate_operations(self , operations):
+        if len(operations) > settings.RECIPE_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(
+                _('at most %d operations per batch') % settings.RECIPE_BATCH_MAX_SIZE
+            )
+        ids=[op['id'] for op in operations if 'id' in op]
+        recipes=Recipe.objects.filter(
+            user=self.context['request'].user , id__in=ids
+        ).in_bulk()
+
+        errors=[]
+        for op in operations:
+            error={}
+            if 'id' in op and op['id'] not in recipes:
+                error['id']=[_('recipe not found')]
+            elif 'id' in op and ids.count(op['id']) > 1:
+                error['id']=[_('recipe appears more than once in the batch')]
+            elif op['op']!='delete':
+                # creates never get an instance , whatever they send
+                serializer=RecipeDetailSerializer(
+                    recipes[op['id']] if op['op']=='update' else None ,
+                    data=op['data'] ,
+                    partial=op['op']=='update' ,
+                    context=self.context ,
+                )
+                if serializer.is_valid():
+                    op['serializer']=serializer
+                else:
+                    error=serializer.errors
+            errors.append(error)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return operations
+
+    @transaction.atomic
+    def create(self , validated_data):
+        operations=validated_data['operations']
+        user=self.context['request'].user
+
+        def names(relation):
+            return [
+                item['name']
+                for op in operations if 'serializer' in op
+                for item in op['serializer'].validated_data.get(relation , [])
+            ]
+        self.context['resolved_items']={
+            Tag:resolve_items(Tag , user , names('tags')) ,
+            Ingredient:resolve_items(Ingredient , user , names('ingredients')) ,
+        }
+        Recipe.objects.filter(user=user , id__in=[
+            op['id'] for op in operations if op['op']=='delete'
+        ]).delete()
+
+        touched=[]
+        for op in operations:
+            if op['op']=='create':
+                touched.append(op['serializer'].save(user=user).id)
+            elif op['op']=='update':
+                touched.append(op['serializer'].save().id)
+            else:
+                touched.append(op['id'])
+
+        recipes=Recipe.objects.filter(id__in=touched)\
+            .prefetch_related('tags' , 'ingredients').in_bulk()
+        results=[]
+        for op , recipe_id in zip(operations , touched):
+            result={'op':op['op'] , 'id':recipe_id}
+            if op['op']!='delete':
+                result['data']=RecipeDetailSerializer(
+                    recipes[recipe_id] , context=self.context
+                ).data
+            results.append(result)
+        return results
+
+    def to_representation(self , instance):
+        return {'results':instance}
 
 # to seperate types as image different from other basic types
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(RecipeImagesMixin , serializers.ModelSerializer):
     class Meta:
         model=Recipe
-        fields=['id' , 'image']
-        read_only_fields=['id']
+        fields=['id' , 'image' , 'image_status' , 'images']
+        read_only_fields=['id' , 'image_status']
         extra_kwargs={
             'image':{'required':True}
         }
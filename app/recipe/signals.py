@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save , post_delete , m2m_changed
+from django.dispatch import receiver
+
+from core.models import Recipe , Tag , Ingredient , StoredFile
+from recipe.cache import response_cache
+
+
+@receiver(post_save , sender=Recipe)
+@receiver(post_save , sender=Tag)
+@receiver(post_save , sender=Ingredient)
+@receiver(post_delete , sender=Recipe)
+@receiver(post_delete , sender=Tag)
+@receiver(post_delete , sender=Ingredient)
+def bump_on_write(sender , instance , **kwargs):
+    response_cache.bump(instance.user_id)
+
+
+@receiver(m2m_changed , sender=Recipe.tags.through)
+@receiver(m2m_changed , sender=Recipe.ingredients.through)
+def bump_on_links_changed(sender , instance , action , **kwargs):
+    if action.startswith('post_'):
+        response_cache.bump(instance.user_id)
+
+
+@receiver(post_save , sender=get_user_model())
+def bump_on_new_user(sender , instance , created , **kwargs):
+    # ids can be reused after a rollback or restore , make sure a new
+    # account never sees entries cached for an old one
+    if created:
+        response_cache.bump(instance.pk)
+
+
+@receiver(post_delete , sender=Recipe)
+def release_image_files(sender , instance , **kwargs):
+    # the files themselves are removed by gc_media once unreferenced
+    StoredFile.objects.release(*instance.stored_files())
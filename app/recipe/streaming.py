@@ -0,0 +1,107 @@
+'''
+streamed list responses .
+
+?page_size=all returns every row of a list in one response without holding
+it in memory : the queryset is read with iterator() ( a server side cursor
+on postgres ) API_STREAM_CHUNK_SIZE rows at a time , each chunk is
+serialized , rendered and written out before the next one is read . the
+bytes are the ones of a single page holding every row , in the order of
+the cursor pagination .
+'''
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import JSONRenderer
+
+from recipe.normalized import normalize
+
+STREAM_ALL='all'
+
+
+def _chunks(iterable , size):
+    iterator=iter(iterable)
+    while True:
+        chunk=list(islice(iterator , size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_list(chunks , renderer , included=None):
+    '''
+    yield the json of {"next":null , "previous":null , "results":[...]}
+    from chunks , lists of serialized rows . included() returns the side
+    loaded dictionaries to close the object with once every chunk is out
+    '''
+    yield b'{"next":null,"previous":null,"results":['
+    separator=b''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # drop the brackets , the rows of every chunk go in one array
+        yield separator+renderer.render(chunk)[1:-1]
+        separator=b','
+    tail=renderer.render(included() if included else {})
+    yield b']'+(b','+tail[1:] if len(tail) > 2 else b'}')
+
+
+class StreamingListMixin:
+    '''
+    viewset mixin streaming ?page_size=all lists , goes before the response
+    cache ( nothing is cached ) and needs FastReadMixin
+    '''
+
+    def is_streamed(self):
+        paginator=self.paginator
+        return self.action=='list' and paginator is not None and \
+            self.request.query_params.get(paginator.page_size_query_param)==STREAM_ALL
+
+    def list(self , request , *args , **kwargs):
+        if not self.is_streamed():
+            return super().list(request , *args , **kwargs)
+        renderer=request.accepted_renderer
+        if not isinstance(renderer , JSONRenderer):
+            raise NotAcceptable(_('page_size=all is only available as json'))
+
+        queryset=self.filter_queryset(self.get_queryset())
+        queryset=queryset.order_by(
+            *self.paginator.get_ordering(request , queryset , self)
+        )
+        side_loaded=self.side_loaded if getattr(self , 'is_normalized' ,
+            lambda: False)() else ()
+
+        fast=self.get_fast_serializer()
+        if fast is not None:
+            rows=fast.values(queryset)
+            def represent(chunk):
+                return fast.to_normalized_many(chunk , side_loaded)
+        else:
+            rows=queryset
+            # iterator() ignores prefetch_related , prefetch per chunk
+            lookups=queryset._prefetch_related_lookups
+            def represent(chunk):
+                prefetch_related_objects(chunk , *lookups)
+                serializer=self.get_serializer(chunk , many=True)
+                return normalize(serializer.data , [
+                    name for name in side_loaded if name in serializer.child.fields
+                ])
+
+        # side loaded objects of every chunk , bounded by the library size
+        included=represent([])[1]
+
+        def chunks():
+            chunk_size=settings.API_STREAM_CHUNK_SIZE
+            for chunk in _chunks(rows.iterator(chunk_size=chunk_size) , chunk_size):
+                results , chunk_included=represent(chunk)
+                for name , objects in chunk_included.items():
+                    included[name].update(objects)
+                yield results
+
+        return StreamingHttpResponse(
+            stream_list(chunks() , renderer , lambda: included) ,
+            content_type=renderer.media_type ,
+        )
@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase , override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag , Ingredient
+
+BATCH_URL=reverse('recipe:recipe-batch')
+
+def create_recipe(user , **kwargs):
+    defaults={
+        'title':'sample',
+        'user':user,
+        'price':Decimal('5.50'),
+        'time_minutes':5,
+    }
+    defaults.update(**kwargs)
+    return Recipe.objects.create(**defaults)
+
+def recipe_data(title , tags=() , ingredients=()):
+    return {
+        'title':title,
+        'price':'5.50',
+        'time_minutes':10,
+        'tags':[{'name':name} for name in tags],
+        'ingredients':[{'name':name} for name in ingredients],
+    }
+
+class PublicRecipeBatchTest(TestCase):
+    def test_auth_required(self):
+        res=APIClient().post(BATCH_URL , {'operations':[]} , format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class PrivateRecipeBatchTest(TestCase):
+    ''' test batch create / update / delete of recipes '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='batch@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _post(self , operations):
+        return self.client.post(
+            BATCH_URL , {'operations':operations} , format='json'
+        )
+
+    def test_mixed_batch(self):
+        updated=create_recipe(self.user , title='old')
+        deleted=create_recipe(self.user , title='gone')
+        res=self._post([
+            {'op':'create' , 'data':recipe_data('new' , tags=['veg'])},
+            {'op':'update' , 'id':updated.id , 'data':{'title':'renamed'}},
+            {'op':'delete' , 'id':deleted.id},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results=res.data['results']
+        self.assertEqual([r['op'] for r in results], ['create' , 'update' , 'delete'])
+        created=Recipe.objects.get(id=results[0]['id'])
+        self.assertEqual(created.user, self.user)
+        self.assertEqual(results[0]['data']['tags'][0]['name'], 'veg')
+        updated.refresh_from_db()
+        self.assertEqual(updated.title, 'renamed')
+        self.assertEqual(results[1]['data']['title'], 'renamed')
+        self.assertFalse(Recipe.objects.filter(id=deleted.id).exists())
+
+    def test_invalid_item_rolls_back_whole_batch(self):
+        recipe=create_recipe(self.user)
+        res=self._post([
+            {'op':'create' , 'data':recipe_data('ok')},
+            {'op':'create' , 'data':{'title':'missing price'}},
+            {'op':'delete' , 'id':recipe.id},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors=res.data['operations']
+        self.assertEqual(errors[0], {})
+        self.assertIn('price', errors[1])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_other_users_recipe_not_found(self):
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        recipe=create_recipe(other)
+        res=self._post([{'op':'delete' , 'id':recipe.id}])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data['operations'][0])
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_duplicate_ids_rejected(self):
+        recipe=create_recipe(self.user)
+        res=self._post([
+            {'op':'update' , 'id':recipe.id , 'data':{'title':'a'}},
+            {'op':'delete' , 'id':recipe.id},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_id_and_data(self):
+        res=self._post([{'op':'update'} , {'op':'create'}])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data['operations'][0])
+        self.assertIn('data', res.data['operations'][1])
+
+    def test_create_with_id_rejected(self):
+        recipe=create_recipe(self.user , title='kept')
+        res=self._post([
+            {'op':'create' , 'id':recipe.id , 'data':recipe_data('overwritten')},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data['operations'][0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'kept')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    @override_settings(RECIPE_BATCH_MAX_SIZE=2)
+    def test_batch_size_limit(self):
+        res=self._post([
+            {'op':'create' , 'data':recipe_data(f'r{i}')} for i in range(3)
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 0)
+
+    def test_shared_items_resolved_once(self):
+        Tag.objects.create(user=self.user , name='veg')
+        operations=[
+            {'op':'create' , 'data':recipe_data(
+                f'r{i}' , tags=['veg' , f'tag {i}'] , ingredients=['salt']
+            )}
+            for i in range(5)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            res=self._post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 6)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        # one lookup of all names plus one reload of the inserted ones
+        tag_selects=[
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "core_tag"' in q['sql']
+            and '"core_tag"."name" IN' in q['sql']
+        ]
+        self.assertEqual(len(tag_selects), 2)
@@ -0,0 +1,187 @@
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase , TestCase , override_settings
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag , Ingredient
+from recipe.cache import ResponseCache , response_cache
+from recipe.checks import check_api_cache
+
+RECIPE_URL=reverse('recipe:recipe-list')
+TAG_URL=reverse('recipe:tag-list')
+INGREDIENTS_URL=reverse('recipe:ingredient-list')
+CACHE_STATS_URL=reverse('cache-stats')
+
+def create_recipe(user , **kwargs):
+    defaults={
+        'title':'sample',
+        'user':user,
+        'price':Decimal('5.50'),
+        'time_minutes':5,
+    }
+    defaults.update(**kwargs)
+    return Recipe.objects.create(**defaults)
+
+@override_settings(API_CACHE_ENABLED=True)
+class ResponseCacheApiTest(TestCase):
+    ''' list responses are cached per user and invalidated on writes '''
+    def setUp(self):
+        caches['api'].clear()
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='cache@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _get(self , url , params=None):
+        res=self.client.get(url , params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_second_request_is_hit(self):
+        create_recipe(self.user)
+        first=self._get(RECIPE_URL)
+        with self.assertNumQueries(0):
+            second=self._get(RECIPE_URL)
+
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+
+    def test_query_params_normalized(self):
+        self._get(RECIPE_URL , {'tags':'1' , 'match':'all'})
+        res=self.client.get(RECIPE_URL + '?match=all&tags=1')
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(self._get(RECIPE_URL , {'tags':'2'})['X-Cache'], 'MISS')
+
+    def test_cache_is_per_user(self):
+        create_recipe(self.user)
+        self._get(RECIPE_URL)
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(other)
+        res=self._get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_recipe_write_invalidates(self):
+        recipe=create_recipe(self.user)
+        self._get(RECIPE_URL)
+        recipe.title='changed'
+        recipe.save()
+        res=self._get(RECIPE_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'][0]['title'], 'changed')
+
+    def test_m2m_change_invalidates(self):
+        recipe=create_recipe(self.user)
+        self._get(RECIPE_URL)
+        recipe.tags.add(Tag.objects.create(user=self.user , name='veg'))
+
+        self.assertEqual(self._get(RECIPE_URL)['X-Cache'], 'MISS')
+
+    def test_delete_invalidates_item_lists(self):
+        ingred=Ingredient.objects.create(user=self.user , name='salt')
+        self._get(INGREDIENTS_URL)
+        ingred.delete()
+        res=self._get(INGREDIENTS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_other_user_write_keeps_cache(self):
+        self._get(TAG_URL)
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        Tag.objects.create(user=other , name='veg')
+
+        self.assertEqual(self._get(TAG_URL)['X-Cache'], 'HIT')
+
+    def test_stats_exposed_to_staff(self):
+        self._get(RECIPE_URL)
+        self._get(RECIPE_URL)
+        self.assertEqual(
+            self.client.get(CACHE_STATS_URL).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        staff=get_user_model().objects.create_superuser(
+            'admin@example.com' , 'testpass123'
+        )
+        self.client.force_authenticate(staff)
+        res=self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['hits'], 1)
+        self.assertEqual(res.data['misses'], 1)
+        self.assertTrue(res.data['enabled'])
+
+    @override_settings(API_CACHE_ENABLED=False)
+    def test_cache_disabled(self):
+        self._get(RECIPE_URL)
+        res=self._get(RECIPE_URL)
+
+        self.assertNotIn('X-Cache', res)
+
+class ResponseCacheTest(TestCase):
+    ''' test the cache primitives '''
+    def setUp(self):
+        caches['api'].clear()
+        self.cache=ResponseCache()
+
+    def test_stats(self):
+        self.cache.get_or_compute('k' , lambda: 1)
+        self.cache.get_or_compute('k' , lambda: 2)
+
+        self.assertEqual(self.cache.stats(), {'hits':1 , 'misses':1})
+
+    def test_waits_for_value_computed_elsewhere(self):
+        ''' a held lock makes callers wait for the value , not compute it '''
+        caches['api'].add('k:lock' , 1)
+        calls=[]
+        def fill(seconds):
+            caches['api'].set('k' , 'ready')
+        with patch('recipe.cache.time.sleep' , side_effect=fill):
+            value , hit=self.cache.get_or_compute('k' , lambda: calls.append(1))
+
+        self.assertEqual(value, 'ready')
+        self.assertTrue(hit)
+        self.assertEqual(calls, [])
+
+    def test_bump_changes_version(self):
+        before=self.cache.version(1)
+        self.cache.bump(1)
+
+        self.assertNotEqual(self.cache.version(1), before)
+        self.assertIs(response_cache.cache, caches['api'])
+
+class ApiCacheCheckTest(SimpleTestCase):
+    ''' the response cache needs a backend shared by the workers '''
+
+    @override_settings(API_CACHE_ENABLED=True)
+    def test_per_process_backend_warns(self):
+        self.assertEqual(
+            [message.id for message in check_api_cache(None)], ['recipe.W001']
+        )
+
+    @override_settings(API_CACHE_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(check_api_cache(None), [])
+
+    def test_shared_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with self.settings(API_CACHE_ENABLED=True , CACHES={
+                'default':{'BACKEND':'django.core.cache.backends.locmem.LocMemCache'} ,
+                'api':{'BACKEND':'django.core.cache.backends.filebased.FileBasedCache' ,
+                    'LOCATION':location} ,
+            }):
+                self.assertEqual(check_api_cache(None), [])
@@ -0,0 +1,135 @@
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase , TestCase , override_settings
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag
+from recipe.checks import check_conditional_get
+
+RECIPE_URL=reverse('recipe:recipe-list')
+
+def create_recipe_url(recipe_id):
+    return reverse('recipe:recipe-detail' , args=[recipe_id])
+
+def create_recipe(user , **kwargs):
+    defaults={
+        'title':'sample',
+        'user':user,
+        'price':Decimal('5.50'),
+        'time_minutes':5,
+    }
+    defaults.update(**kwargs)
+    return Recipe.objects.create(**defaults)
+
+@override_settings(API_CONDITIONAL_GET=True)
+class ConditionalGetTest(TestCase):
+    ''' test ETag / Last-Modified handling of recipe endpoints '''
+    def setUp(self):
+        caches['api'].clear()
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='etag@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe=create_recipe(self.user)
+
+    def later(self , seconds=2):
+        ''' the clock seconds after the last write '''
+        return patch('recipe.conditional.time.time' ,
+            return_value=time.time()+seconds)
+
+    def test_validators_on_list_and_detail(self):
+        for url in (RECIPE_URL , create_recipe_url(self.recipe.id)):
+            with self.later():
+                res=self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res['ETag'].startswith('"'))
+            self.assertIn('Last-Modified', res)
+
+    def test_if_none_match_short_circuits(self):
+        etag=self.client.get(RECIPE_URL)['ETag']
+        with self.assertNumQueries(0):
+            res=self.client.get(RECIPE_URL , HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def test_if_modified_since(self):
+        with self.later():
+            last_modified=self.client.get(RECIPE_URL)['Last-Modified']
+            res=self.client.get(RECIPE_URL , HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_no_last_modified_within_the_second_of_a_write(self):
+        modified=1000.2
+        with patch('recipe.cache.time.time' , return_value=modified):
+            self.recipe.save()
+        with patch('recipe.conditional.time.time' , return_value=modified+0.1):
+            res=self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', res)
+
+        with patch('recipe.conditional.time.time' , return_value=modified+1):
+            res=self.client.get(RECIPE_URL)
+        self.assertEqual(res['Last-Modified'], 'Thu, 01 Jan 1970 00:16:40 GMT')
+
+    def test_etag_differs_per_url(self):
+        list_etag=self.client.get(RECIPE_URL)['ETag']
+        detail_etag=self.client.get(create_recipe_url(self.recipe.id))['ETag']
+
+        self.assertNotEqual(list_etag, detail_etag)
+
+    def test_write_changes_etag(self):
+        etag=self.client.get(RECIPE_URL)['ETag']
+        self.recipe.title='changed'
+        self.recipe.save()
+        res=self.client.get(RECIPE_URL , HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_m2m_change_changes_etag(self):
+        url=create_recipe_url(self.recipe.id)
+        etag=self.client.get(url)['ETag']
+        self.recipe.tags.add(Tag.objects.create(user=self.user , name='veg'))
+        res=self.client.get(url , HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_is_per_user(self):
+        etag=self.client.get(RECIPE_URL)['ETag']
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(other)
+        res=self.client.get(RECIPE_URL , HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(API_CONDITIONAL_GET=False)
+    def test_disabled(self):
+        res=self.client.get(RECIPE_URL , HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', res)
+
+class ConditionalGetCheckTest(SimpleTestCase):
+    ''' conditional get refuses to start on a per process marker '''
+
+    @override_settings(API_CONDITIONAL_GET=True)
+    def test_per_process_backend_is_an_error(self):
+        self.assertEqual(
+            [message.id for message in check_conditional_get(None)], ['recipe.E001']
+        )
+
+    @override_settings(API_CONDITIONAL_GET=False)
+    def test_disabled(self):
+        self.assertEqual(check_conditional_get(None), [])
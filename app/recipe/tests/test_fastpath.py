@@ -0,0 +1,131 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase , override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe , Tag , Ingredient
+from recipe.fastpath import FastSerializer
+from recipe.serializers import RecipeBatchSerializer , RecipeSerializer
+
+RECIPE_URL=reverse('recipe:recipe-list')
+TAG_URL=reverse('recipe:tag-list')
+INGREDIENT_URL=reverse('recipe:ingredient-list')
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail' , args=[recipe_id])
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class FastPathParityTest(TestCase):
+    ''' the fast path renders the same bytes as the serializers '''
+
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='fast@example.com' , password='testpass123'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        tags=[Tag.objects.create(user=self.user , name=f'tag {i}') for i in range(3)]
+        ingredients=[
+            Ingredient.objects.create(user=self.user , name=f'ingred {i}')
+            for i in range(3)
+        ]
+        Tag.objects.create(user=self.user , name='unused')
+        for i in range(5):
+            recipe=Recipe.objects.create(
+                user=self.user , title=f'soup {i}' , price=Decimal('5.5')+i ,
+                time_minutes=i , link='https://example.com' if i%2 else '' ,
+                description='hot soup' ,
+            )
+            recipe.tags.add(*tags[:i%4])
+            recipe.ingredients.add(*ingredients[i%3:])
+        recipe.image='uploads/recipe/soup.jpg'
+        recipe.image_status=Recipe.ImageStatus.READY
+        recipe.image_variants={'thumb':'uploads/recipe/soup-thumb.jpg'}
+        recipe.save()
+
+    def assertSameResponse(self , url , params=None):
+        responses=[]
+        for fast in (True , False):
+            with self.settings(API_FAST_SERIALIZERS=fast):
+                res=self.client.get(url , params or {})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            responses.append(res.content)
+        self.assertEqual(responses[0], responses[1])
+        return responses[0]
+
+    def test_recipe_list(self):
+        self.assertSameResponse(RECIPE_URL)
+
+    def test_recipe_list_next_page(self):
+        with self.settings(API_FAST_SERIALIZERS=False):
+            next_url=self.client.get(RECIPE_URL , {'page_size':2}).data['next']
+
+        self.assertSameResponse(next_url)
+
+    def test_recipe_filters_and_search(self):
+        tag=Tag.objects.get(user=self.user , name='tag 1')
+
+        self.assertSameResponse(RECIPE_URL , {'tags':str(tag.id)})
+        self.assertSameResponse(RECIPE_URL , {'q':'soup 3'})
+
+    def test_recipe_detail(self):
+        for recipe in Recipe.objects.filter(user=self.user):
+            self.assertSameResponse(detail_url(recipe.id))
+
+    def test_sparse_fieldsets(self):
+        recipe=Recipe.objects.filter(user=self.user).last()
+
+        self.assertSameResponse(RECIPE_URL , {'fields':'id,price,tags'})
+        self.assertSameResponse(RECIPE_URL , {'omit':'ingredients'})
+        self.assertSameResponse(detail_url(recipe.id) , {'fields':'images'})
+
+    def test_tag_and_ingredient_lists(self):
+        self.assertSameResponse(TAG_URL)
+        self.assertSameResponse(TAG_URL , {'ordering':'popular'})
+        self.assertSameResponse(TAG_URL , {'assigned_only':1 , 'fields':'id'})
+        self.assertSameResponse(INGREDIENT_URL , {'fields':'name'})
+
+    def test_detail_of_other_user_not_found(self):
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        recipe=Recipe.objects.create(
+            user=other , title='other' , price=Decimal('1.00') , time_minutes=1
+        )
+
+        res=self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reads_values_rows(self):
+        for url in (RECIPE_URL , TAG_URL):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+            # only the columns the serializer renders , no model instances
+            self.assertFalse(any(
+                '"user_id"' in query['sql'].split(' FROM ')[0]
+                for query in ctx.captured_queries
+            ))
+
+    def test_list_queries(self):
+        # the page , then tags and ingredients of every recipe on it
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL)
+
+
+class FastSerializerCompileTest(TestCase):
+
+    def test_compiles_recipe_serializer(self):
+        fast=FastSerializer.compile(RecipeSerializer())
+
+        self.assertIsNotNone(fast)
+        self.assertIn('price', fast.columns)
+
+    def test_unsupported_serializer(self):
+        self.assertIsNone(FastSerializer.compile(RecipeBatchSerializer()))
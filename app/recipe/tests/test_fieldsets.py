@@ -0,0 +1,119 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe , Tag , Ingredient
+
+RECIPE_URL=reverse('recipe:recipe-list')
+TAG_URL=reverse('recipe:tag-list')
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail' , args=[recipe_id])
+
+
+class SparseFieldsetTest(TestCase):
+
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='fields@example.com' , password='testpass123'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            recipe=Recipe.objects.create(
+                user=self.user , title=f'recipe {i}' , price=Decimal('2.00') ,
+                time_minutes=5 , description='long text '*100 ,
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user , name=f'tag {i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user , name=f'ingred {i}')
+            )
+
+    def get(self , url , params):
+        with CaptureQueriesContext(connection) as ctx:
+            res=self.client.get(url , params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res , [query['sql'] for query in ctx.captured_queries]
+
+    def recipe_select(self , queries):
+        return next(sql for sql in queries if 'FROM "core_recipe"' in sql)
+
+    def test_fields_trims_payload_and_columns(self):
+        res , queries=self.get(RECIPE_URL , {'fields':'id,title'})
+
+        for recipe in res.data['results']:
+            self.assertEqual(set(recipe), {'id' , 'title'})
+        select=self.recipe_select(queries)
+        self.assertNotIn('"description"', select)
+        self.assertNotIn('"price"', select)
+        # no prefetch of tags or ingredients
+        self.assertFalse(any('core_tag' in sql for sql in queries))
+        self.assertFalse(any('core_ingredient' in sql for sql in queries))
+
+    def test_omit_skips_prefetch(self):
+        res , queries=self.get(RECIPE_URL , {'omit':'ingredients'})
+
+        recipe=res.data['results'][0]
+        self.assertNotIn('ingredients', recipe)
+        self.assertEqual(len(recipe['tags']), 1)
+        self.assertTrue(any('core_tag' in sql for sql in queries))
+        self.assertFalse(any('core_ingredient' in sql for sql in queries))
+
+    def test_same_rows_as_full_list(self):
+        full=self.client.get(RECIPE_URL).data['results']
+        sparse=self.client.get(RECIPE_URL , {'fields':'id,price'}).data['results']
+
+        self.assertEqual(
+            sparse, [{'id':r['id'] , 'price':r['price']} for r in full]
+        )
+
+    def test_detail_method_field_loads_its_columns(self):
+        recipe=Recipe.objects.filter(user=self.user).first()
+
+        res , queries=self.get(detail_url(recipe.id) , {'fields':'id,images'})
+
+        self.assertEqual(res.data, {'id':recipe.id , 'images':None})
+        self.assertIn('"image_status"', self.recipe_select(queries))
+        self.assertNotIn('"description"', self.recipe_select(queries))
+
+    def test_unknown_field(self):
+        res=self.client.get(RECIPE_URL , {'fields':'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+    def test_empty_fields_renders_everything(self):
+        recipe=Recipe.objects.filter(user=self.user).first()
+        full=self.client.get(detail_url(recipe.id)).data
+        for value in ('' , ' , '):
+            res=self.client.get(detail_url(recipe.id) , {'fields':value})
+            self.assertEqual(res.data, full)
+
+            res=self.client.get(RECIPE_URL , {'fields':value})
+            self.assertIn('title', res.data['results'][0])
+
+    def test_writes_ignore_fieldset(self):
+        res=self.client.post(
+            f'{RECIPE_URL}?fields=id' ,
+            {'title':'new' , 'price':'1.00' , 'time_minutes':3} ,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn('title', res.data)
+
+    def test_tags_without_count(self):
+        res , queries=self.get(TAG_URL , {'fields':'id' , 'page_size':2})
+
+        self.assertEqual(set(res.data['results'][0]), {'id'})
+        self.assertEqual(len([sql for sql in queries if 'core_tag' in sql]), 1)
+        self.assertNotIn('COUNT', queries[-1])
+
+        # the cursor still pages on name
+        res , _=self.get(res.data['next'] , {})
+        self.assertEqual(len(res.data['results']), 1)
@@ -0,0 +1,391 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase , override_settings
+from django.urls import reverse
+from django.utils import timezone
+from decimal import Decimal
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import Recipe , StoredFile
+from recipe.images import (ImagePipeline , claim_stale_images ,
+    process_recipe_image , render_variants)
+from recipe.management.commands.gc_media import collect
+
+SIZES={'full':64 , 'medium':32 , 'thumb':8}
+
+def jpeg_bytes(size=(40 , 20) , orientation=None , color='red'):
+    ''' a jpeg , optionally with an EXIF orientation and camera tags '''
+    image=Image.new('RGB' , size , color)
+    exif=Image.Exif()
+    exif[0x010f]='ACME camera'
+    if orientation:
+        exif[0x0112]=orientation
+    output=io.BytesIO()
+    image.save(output , format='JPEG' , exif=exif.tobytes())
+    return output.getvalue()
+
+def open_variant(data):
+    return Image.open(io.BytesIO(data))
+
+
+class RenderVariantsTest(TestCase):
+
+    def test_variants_fit_their_box(self):
+        variants=render_variants(io.BytesIO(jpeg_bytes((200 , 100))) , SIZES)
+
+        self.assertEqual(set(variants), set(SIZES))
+        self.assertEqual(open_variant(variants['full']).size, (64 , 32))
+        self.assertEqual(open_variant(variants['thumb']).size, (8 , 4))
+
+    def test_small_image_is_not_upscaled(self):
+        variants=render_variants(io.BytesIO(jpeg_bytes((20 , 10))) , SIZES)
+
+        self.assertEqual(open_variant(variants['full']).size, (20 , 10))
+
+    def test_orientation_applied_and_exif_stripped(self):
+        # orientation 6 , the camera was rotated 90 degrees
+        data=jpeg_bytes((40 , 20) , orientation=6)
+        variants=render_variants(io.BytesIO(data) , SIZES)
+
+        image=open_variant(variants['full'])
+        self.assertEqual(image.size, (20 , 40))
+        self.assertEqual(dict(image.getexif()), {})
+
+    def test_not_an_image(self):
+        with self.assertRaises(OSError):
+            render_variants(io.BytesIO(b'not an image') , SIZES)
+
+
+@override_settings(RECIPE_IMAGE_SIZES=SIZES)
+class ProcessRecipeImageTest(TestCase):
+
+    def setUp(self):
+        self.media=tempfile.mkdtemp()
+        media=override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree , self.media)
+        self.user=get_user_model().objects.create_user(
+            email='images@example.com' , password='testpass123'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self , data):
+        recipe=Recipe.objects.create(
+            user=self.user , title='photo' , price=Decimal('1.00') ,
+            time_minutes=5 , image_status=Recipe.ImageStatus.PENDING ,
+        )
+        self.upload(recipe , data)
+        return recipe
+
+    def upload(self , recipe , data):
+        ''' replace the image like the upload endpoint does '''
+        previous=recipe.image.name
+        recipe.image_status=Recipe.ImageStatus.PENDING
+        recipe.image.save('upload.jpg' , ContentFile(data))
+        StoredFile.objects.acquire(recipe.image.name)
+        StoredFile.objects.release(previous)
+
+    def refcount(self , name):
+        stored=StoredFile.objects.filter(name=name).first()
+        return stored.refcount if stored else 0
+
+    def test_process_stores_variants(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        raw=recipe.image.name
+
+        process_recipe_image(recipe.id)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.READY)
+        self.assertEqual(set(recipe.image_variants), set(SIZES))
+        self.assertEqual(recipe.image.name, recipe.image_variants['full'])
+        for name in recipe.image_variants.values():
+            self.assertTrue(default_storage.exists(name))
+        # referenced by image and by image_variants
+        self.assertEqual(self.refcount(recipe.image.name), 2)
+        self.assertEqual(self.refcount(recipe.image_variants['thumb']), 1)
+        self.assertEqual(self.refcount(raw), 0)
+
+    def test_detail_exposes_urls_once_ready(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        url=reverse('recipe:recipe-detail' , args=[recipe.id])
+
+        res=self.client.get(url)
+        self.assertEqual(res.data['image_status'], 'pending')
+        self.assertIsNone(res.data['images'])
+
+        process_recipe_image(recipe.id)
+        res=self.client.get(url)
+
+        self.assertEqual(res.data['image_status'], 'ready')
+        self.assertEqual(set(res.data['images']), set(SIZES))
+        self.assertTrue(res.data['images']['thumb'].startswith('http://'))
+
+    def test_broken_upload_fails(self):
+        recipe=self.create_recipe(b'not an image')
+
+        with self.assertLogs('recipe.images' , 'WARNING'):
+            process_recipe_image(recipe.id)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.FAILED)
+        self.assertEqual(recipe.image_variants, {})
+
+    def test_newer_upload_wins(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        newer=default_storage.save('newer.jpg' , ContentFile(jpeg_bytes()))
+        saved=[]
+
+        def upload_while_rendering(source):
+            # another upload lands while the first one is being processed
+            Recipe.objects.filter(pk=recipe.pk).update(image=newer)
+            return render_variants(source)
+
+        def save(name , content):
+            saved.append(original_save(name , content))
+            return saved[-1]
+
+        original_save=default_storage.save
+        with patch('recipe.images.render_variants' , upload_while_rendering) , \
+                patch.object(default_storage , 'save' , save):
+            process_recipe_image(recipe.id)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, newer)
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.PENDING)
+        self.assertEqual(len(saved), len(SIZES))
+        for name in saved:
+            self.assertEqual(self.refcount(name), 0)
+
+    def test_reprocessing_releases_previous_variants(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        process_recipe_image(recipe.id)
+        recipe.refresh_from_db()
+        previous=recipe.image_variants
+
+        self.upload(recipe , jpeg_bytes(color='green'))
+        process_recipe_image(recipe.id)
+
+        for name in previous.values():
+            self.assertEqual(self.refcount(name), 0)
+
+    def test_ready_image_not_processed_again(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        process_recipe_image(recipe.id)
+        recipe.refresh_from_db()
+
+        with patch('recipe.images.render_variants') as render:
+            process_recipe_image(recipe.id)
+
+        render.assert_not_called()
+        ready=Recipe.objects.get(pk=recipe.pk)
+        self.assertEqual(ready.image.name, recipe.image.name)
+        self.assertEqual(ready.image_variants, recipe.image_variants)
+
+    def test_upload_retry_shares_file(self):
+        recipe=Recipe.objects.create(
+            user=self.user , title='retry' , price=Decimal('1.00') ,
+            time_minutes=5 ,
+        )
+        url=reverse('recipe:recipe-upload-image' , args=[recipe.id])
+        names=[]
+        with patch('recipe.views.image_pipeline'):
+            for _ in range(2):
+                image=ContentFile(jpeg_bytes() , name='retry.jpg')
+                self.client.post(url , {'image':image} , format='multipart')
+                recipe.refresh_from_db()
+                names.append(recipe.image.name)
+
+        self.assertEqual(names[0], names[1])
+        self.assertEqual(self.refcount(names[0]), 1)
+
+    def test_delete_releases_files(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        process_recipe_image(recipe.id)
+        recipe.refresh_from_db()
+
+        recipe.delete()
+
+        for name in recipe.image_variants.values():
+            self.assertEqual(self.refcount(name), 0)
+
+    def test_command_processes_pending(self):
+        recipe=self.create_recipe(jpeg_bytes())
+
+        call_command('process_images' , stdout=io.StringIO())
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.READY)
+
+    def test_command_retries_failed(self):
+        recipe=self.create_recipe(jpeg_bytes())
+        Recipe.objects.filter(pk=recipe.pk)\
+            .update(image_status=Recipe.ImageStatus.FAILED)
+
+        call_command('process_images' , stdout=io.StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.FAILED)
+
+        call_command('process_images' , '--retry-failed' , stdout=io.StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.READY)
+
+    @override_settings(IMAGE_STALE_AFTER=600)
+    def test_claim_stale_images(self):
+        stale=self.create_recipe(jpeg_bytes())
+        fresh=self.create_recipe(jpeg_bytes())
+        lost=self.create_recipe(jpeg_bytes())
+        now=timezone.now()
+        Recipe.objects.filter(pk=stale.pk).update(
+            image_queued_at=now-timedelta(seconds=601))
+        Recipe.objects.filter(pk=fresh.pk).update(image_queued_at=now)
+
+        self.assertEqual(claim_stale_images(10), [stale.id , lost.id])
+        # claimed , the pools of other workers skip them now
+        self.assertEqual(claim_stale_images(10), [])
+
+    def test_upload_records_queue_time(self):
+        recipe=Recipe.objects.create(
+            user=self.user , title='queued' , price=Decimal('1.00') ,
+            time_minutes=5 ,
+        )
+        url=reverse('recipe:recipe-upload-image' , args=[recipe.id])
+        with patch('recipe.views.image_pipeline'):
+            image=ContentFile(jpeg_bytes() , name='queued.jpg')
+            self.client.post(url , {'image':image} , format='multipart')
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.ImageStatus.PENDING)
+        self.assertIsNotNone(recipe.image_queued_at)
+        self.assertEqual(claim_stale_images(10), [])
+
+
+class ImagePipelineTest(TestCase):
+
+    def test_pool_is_bounded(self):
+        release=threading.Event()
+        started=threading.Event()
+        done=[]
+
+        def job(recipe_id):
+            started.set()
+            release.wait(5)
+            done.append(recipe_id)
+
+        pipeline=ImagePipeline(job , workers=1 , backlog=1)
+        self.addCleanup(pipeline.shutdown)
+        self.assertTrue(pipeline.submit(1))
+        started.wait(5)
+        self.assertTrue(pipeline.submit(2))
+        # one running , one queued , no room left
+        with self.assertLogs('recipe.images' , 'WARNING'):
+            self.assertFalse(pipeline.submit(3))
+
+        release.set()
+        pipeline.shutdown()
+        self.assertEqual(done, [1 , 2])
+
+    def test_lost_jobs_recovered(self):
+        done=[]
+        recovered=threading.Event()
+
+        def job(recipe_id):
+            done.append(recipe_id)
+            if recipe_id==7:
+                recovered.set()
+
+        calls=[]
+        def recover(limit):
+            calls.append(limit)
+            return [7]
+
+        pipeline=ImagePipeline(job , workers=1 , backlog=1 , recover=recover)
+        self.addCleanup(pipeline.shutdown)
+        self.assertTrue(pipeline.submit(1))
+
+        self.assertTrue(recovered.wait(5))
+        pipeline.shutdown()
+        self.assertEqual(sorted(done), [1 , 7])
+        # once per IMAGE_STALE_AFTER , not after every job
+        self.assertEqual(calls, [2])
+
+
+class GarbageCollectMediaTest(TestCase):
+
+    def setUp(self):
+        self.media=tempfile.mkdtemp()
+        media=override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree , self.media)
+
+    def save(self , data):
+        return default_storage.save('uploads/recipe/a.jpg' , ContentFile(data))
+
+    def gc(self , *args):
+        output=io.StringIO()
+        call_command('gc_media' , '--min-age=0' , *args , stdout=output)
+        return output.getvalue()
+
+    def test_removes_unreferenced_files_only(self):
+        kept=self.save(b'kept')
+        dropped=self.save(b'dropped')
+        released=self.save(b'released')
+        StoredFile.objects.acquire(kept , released)
+        StoredFile.objects.release(released)
+
+        self.assertIn('removed 2 files', self.gc('--batch-size=1'))
+
+        self.assertTrue(default_storage.exists(kept))
+        self.assertFalse(default_storage.exists(dropped))
+        self.assertFalse(default_storage.exists(released))
+        self.assertFalse(StoredFile.objects.filter(name=released).exists())
+
+    def test_recent_files_are_kept(self):
+        name=self.save(b'uploading')
+
+        call_command('gc_media' , stdout=io.StringIO())
+
+        self.assertTrue(default_storage.exists(name))
+
+    def test_file_referenced_during_collection_is_kept(self):
+        name=self.save(b'shared')
+        path=default_storage.path(name)
+        trash=tempfile.mkdtemp(dir=self.media)
+        cutoff=time.time()+60
+
+        # gc saw it unreferenced , an upload of the same content acquires
+        # it before the file is deleted
+        StoredFile.objects.acquire(name)
+        self.assertIsNone(collect(path , name , trash , cutoff))
+        self.assertTrue(default_storage.exists(name))
+
+        # or saves it again , touching it
+        StoredFile.objects.release(name)
+        self.save(b'shared')
+        self.assertIsNone(collect(path , name , trash , time.time()-60))
+        self.assertTrue(default_storage.exists(name))
+
+        self.assertEqual(collect(path , name , trash , cutoff), len(b'shared'))
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(os.listdir(trash), [])
+
+    def test_dry_run(self):
+        name=self.save(b'unreferenced')
+
+        self.assertIn(name, self.gc('--dry-run'))
+        self.assertTrue(default_storage.exists(name))
@@ -7,6 +7,7 @@ from django.urls import reverse
 
 from core.models import Ingredient,Recipe
 from recipe.serializers import IngredientSerializer
+from recipe.filters import annotate_recipe_count
 
 INGREDIENTS_URL=reverse('recipe:ingredient-list')
 
@@ -45,10 +46,10 @@ class PrivateIngredientTestApi(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        ingreds=Ingredient.objects.all().order_by('-name')
+        ingreds=annotate_recipe_count(Ingredient.objects.all()).order_by('-name')
         serializer=IngredientSerializer(ingreds , many=True)
 
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data['results'])
 
     def test_ingred_limited_to_user(self):
         ''' test ingred limited to auth user '''
@@ -57,13 +58,13 @@ class PrivateIngredientTestApi(TestCase):
         Ingredient.objects.create(user=self.user , name='test2')
 
         res=self.client.get(INGREDIENTS_URL)
-        ingred=Ingredient.objects.filter(user=self.user)
+        ingred=annotate_recipe_count(Ingredient.objects.filter(user=self.user))
         serializer=IngredientSerializer(ingred , many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, res.data)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingred[0].name)
+        self.assertEqual(serializer.data, res.data['results'])
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingred[0].name)
 
     def test_update_ingredient(self):
         ingred = Ingredient.objects.create(user=self.user , name='test2')
@@ -100,12 +101,13 @@ class PrivateIngredientTestApi(TestCase):
             title='test ingred'
         )
         recipe.ingredients.add(in1)
+        in1.recipe_count , in2.recipe_count = 1 , 0
         s1=IngredientSerializer(in1)
         s2=IngredientSerializer(in2)
         res=self.client.get(INGREDIENTS_URL , {'assigned_only':1})
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_ingredients_assigned_unique(self):
         in1=Ingredient.objects.create(user=self.user , name='ing1')
@@ -127,4 +129,15 @@ class PrivateIngredientTestApi(TestCase):
         recipe1.ingredients.add(in1)
         recipe2.ingredients.add(in1)
         res=self.client.get(INGREDIENTS_URL , {'assigned_only':1})
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_autocomplete(self):
+        Ingredient.objects.create(user=self.user , name='Salt')
+        Ingredient.objects.create(user=self.user , name='sugar')
+
+        res=self.client.get(
+            reverse('recipe:ingredient-autocomplete') , {'prefix':'sa'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in res.data], ['Salt'])
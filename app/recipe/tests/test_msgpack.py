@@ -0,0 +1,123 @@
+import json
+from decimal import Decimal
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase , TestCase , override_settings
+from django.urls import reverse
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe , Tag , Ingredient
+
+RECIPE_URL=reverse('recipe:recipe-list')
+TAG_URL=reverse('recipe:tag-list')
+ME_URL=reverse('user:me')
+TOKEN_URL=reverse('user:token')
+MSGPACK='application/msgpack'
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail' , args=[recipe_id])
+
+
+class MessagePackApiTest(TestCase):
+
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='pack@example.com' , password='testpass123' , name='packer'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe=Recipe.objects.create(
+            user=self.user , title='crème brûlée' , price=Decimal('4.50') ,
+            time_minutes=40 ,
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user , name='dessert'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user , name='cream')
+        )
+
+    def assertSameData(self , url , params=None):
+        packed=self.client.get(url , params , HTTP_ACCEPT=MSGPACK)
+        plain=self.client.get(url , params , HTTP_ACCEPT='application/json')
+
+        self.assertEqual(packed.status_code, status.HTTP_200_OK)
+        self.assertEqual(packed['Content-Type'], MSGPACK)
+        self.assertEqual(
+            msgpack.unpackb(packed.content), json.loads(plain.content)
+        )
+        # conditional requests tell the two representations apart
+        self.assertNotEqual(packed['ETag'], plain['ETag'])
+
+    @override_settings(API_CONDITIONAL_GET=True)
+    def test_same_data_as_json(self):
+        self.assertSameData(RECIPE_URL)
+        self.assertSameData(RECIPE_URL , {'fields':'id,price'})
+        self.assertSameData(detail_url(self.recipe.id))
+        self.assertSameData(TAG_URL , {'ordering':'popular'})
+
+    def test_format_suffix_param(self):
+        res=self.client.get(RECIPE_URL , {'format':'msgpack'})
+
+        self.assertEqual(res['Content-Type'], MSGPACK)
+
+    def test_user_endpoint(self):
+        res=self.client.get(ME_URL , HTTP_ACCEPT=MSGPACK)
+
+        self.assertEqual(
+            msgpack.unpackb(res.content),
+            {'email':'pack@example.com' , 'name':'packer'}
+        )
+
+    def test_create_recipe_from_msgpack_body(self):
+        payload={
+            'title':'tiramisu' , 'price':'6.00' , 'time_minutes':20 ,
+            'tags':[{'name':'dessert'}] ,
+        }
+
+        res=self.client.post(RECIPE_URL , msgpack.packb(payload) ,
+            content_type=MSGPACK , HTTP_ACCEPT=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data=msgpack.unpackb(res.content)
+        self.assertEqual(data['price'], '6.00')
+        self.assertEqual([tag['name'] for tag in data['tags']], ['dessert'])
+
+    def test_token_from_msgpack_body(self):
+        client=APIClient()
+
+        res=client.post(TOKEN_URL ,
+            msgpack.packb({'email':'pack@example.com' , 'password':'testpass123'}) ,
+            content_type=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
+    def test_invalid_body(self):
+        res=self.client.post(RECIPE_URL , b'\xc1' , content_type=MSGPACK)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('MessagePack parse error', res.data['detail'])
+
+
+class MessagePackSchemaTest(SimpleTestCase):
+
+    def test_msgpack_documented_like_json(self):
+        schema=SchemaGenerator().get_schema(request=None , public=True)
+
+        for path , operations in schema['paths'].items():
+            if path=='/api/schema/':
+                continue
+            for method , operation in operations.items():
+                contents=[operation.get('requestBody' , {}).get('content' , {})]
+                contents+=[
+                    response.get('content' , {})
+                    for response in operation['responses'].values()
+                ]
+                for content in contents:
+                    if 'application/json' in content:
+                        self.assertEqual(
+                            content.get(MSGPACK) , content['application/json'] ,
+                            f'{method} {path}'
+                        )
@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag , Ingredient
+from recipe.ndjson import export_library , import_library
+
+EXPORT_URL=reverse('recipe:recipe-export')
+IMPORT_URL=reverse('recipe:recipe-import')
+
+def create_user(email):
+    return get_user_model().objects.create_user(email=email , password='testpass123')
+
+def create_library(user):
+    veg=Tag.objects.create(user=user , name='veg')
+    Tag.objects.create(user=user , name='unused')
+    salt=Ingredient.objects.create(user=user , name='salt')
+    for i in range(3):
+        recipe=Recipe.objects.create(
+            user=user ,
+            title=f'recipe {i}' ,
+            price=Decimal('5.50') ,
+            time_minutes=10 ,
+        )
+        recipe.tags.add(veg)
+        recipe.ingredients.add(salt)
+
+def snapshot(user):
+    ''' library content without ids to compare across users '''
+    return {
+        'tags':sorted(Tag.objects.filter(user=user).values_list('name' , flat=True)),
+        'ingredients':sorted(
+            Ingredient.objects.filter(user=user).values_list('name' , flat=True)
+        ),
+        'recipes':sorted(
+            (r.title , r.price , r.time_minutes ,
+                sorted(t.name for t in r.tags.all()) ,
+                sorted(i.name for i in r.ingredients.all()))
+            for r in Recipe.objects.filter(user=user)
+        ),
+    }
+
+class NDJSONLibraryTest(TestCase):
+    ''' test ndjson export / import functions and commands '''
+    def setUp(self):
+        self.user=create_user('source@example.com')
+        self.target=create_user('target@example.com')
+
+    def test_export_lines(self):
+        create_library(self.user)
+        lines=[json.loads(line) for line in export_library(self.user , chunk_size=2)]
+
+        types=[line['type'] for line in lines]
+        self.assertEqual(types, ['tag'] * 2 + ['ingredient'] + ['recipe'] * 3)
+        self.assertEqual(lines[-1]['tags'], ['veg'])
+        self.assertEqual(lines[-1]['price'], '5.50')
+
+    def test_roundtrip_in_small_batches(self):
+        create_library(self.user)
+        imported=import_library(
+            self.target , export_library(self.user) , batch_size=2
+        )
+
+        self.assertEqual(imported, {'tag':2 , 'ingredient':1 , 'recipe':3})
+        self.assertEqual(snapshot(self.target), snapshot(self.user))
+
+    def test_import_reuses_existing_names(self):
+        Tag.objects.create(user=self.target , name='veg')
+        create_library(self.user)
+        import_library(self.target , export_library(self.user))
+
+        self.assertEqual(Tag.objects.filter(user=self.target).count(), 2)
+
+    def test_commands_roundtrip(self):
+        create_library(self.user)
+        with tempfile.TemporaryDirectory() as tmp:
+            path=os.path.join(tmp , 'library.ndjson')
+            call_command('export_recipes' , self.user.email , output=path)
+            call_command(
+                'import_recipes' , self.target.email , input=path , stdout=StringIO()
+            )
+        self.assertEqual(snapshot(self.target), snapshot(self.user))
+
+    def test_command_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('export_recipes' , 'nobody@example.com')
+
+class NDJSONApiTest(TestCase):
+    ''' test export / import endpoints '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=create_user('api@example.com')
+        self.client.force_authenticate(self.user)
+
+    def test_export_streams_own_library(self):
+        create_library(self.user)
+        create_library(create_user('other@example.com'))
+        res=self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines=b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_import(self):
+        body='\n'.join([
+            json.dumps({'type':'tag' , 'name':'veg'}),
+            json.dumps({'type':'recipe' , 'title':'soup' , 'price':'2.00' ,
+                'time_minutes':5 , 'tags':['veg' , 'quick']}),
+            '',
+        ])
+        res=self.client.post(
+            IMPORT_URL , body , content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['imported']['recipe'], 1)
+        recipe=Recipe.objects.get(user=self.user)
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name' , flat=True)), ['quick' , 'veg']
+        )
+
+    def test_import_bad_line(self):
+        body='\n'.join([
+            json.dumps({'type':'tag' , 'name':'veg'}),
+            json.dumps({'type':'recipe' , 'title':'no price'}),
+        ])
+        res=self.client.post(
+            IMPORT_URL , body , content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 2)
+        self.assertIn('price', res.data['errors'])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_import_invalid_utf8(self):
+        body=json.dumps({'type':'tag' , 'name':'veg'}).encode()+b'\n\xff\xfe\n'
+        res=self.client.post(
+            IMPORT_URL , body , content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 2)
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_import_non_object_line(self):
+        body=json.dumps({'type':'tag' , 'name':'veg'})+'\n[1,2]\n'
+        res=self.client.post(
+            IMPORT_URL , body , content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 2)
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_import_unhashable_type(self):
+        body=json.dumps({'type':['tag'] , 'name':'veg'})+'\n'
+        res=self.client.post(
+            IMPORT_URL , body , content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['line'], 1)
+        self.assertIn('type', res.data['errors'])
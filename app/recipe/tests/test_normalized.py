@@ -0,0 +1,112 @@
+import json
+from decimal import Decimal
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.test import TestCase , override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe , Tag , Ingredient
+
+RECIPE_URL=reverse('recipe:recipe-list')
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail' , args=[recipe_id])
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class NormalizedListTest(TestCase):
+
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='normal@example.com' , password='testpass123'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags=[
+            Tag.objects.create(user=self.user , name=name)
+            for name in ('vegan' , 'quick' , 'unused')
+        ]
+        salt=Ingredient.objects.create(user=self.user , name='salt')
+        for i in range(4):
+            recipe=Recipe.objects.create(
+                user=self.user , title=f'soup {i}' , price=Decimal('3.00') ,
+                time_minutes=10 ,
+            )
+            recipe.tags.add(*self.tags[:1+i%2])
+            recipe.ingredients.add(salt)
+
+    def get(self , params=None , **extra):
+        res=self.client.get(RECIPE_URL , {'format':'normalized' , **(params or {})} ,
+            **extra)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_ids_and_side_loaded_objects(self):
+        data=json.loads(self.get().content)
+
+        vegan , quick , _ = self.tags
+        self.assertEqual(
+            data['tags'],
+            {str(vegan.id):{'id':vegan.id , 'name':'vegan'} ,
+             str(quick.id):{'id':quick.id , 'name':'quick'}}
+        )
+        self.assertEqual(len(data['ingredients']), 1)
+        for recipe in data['results']:
+            self.assertTrue(set(recipe['tags']) <= {vegan.id , quick.id})
+            self.assertEqual(len(recipe['ingredients']), 1)
+
+    def test_same_recipes_as_nested_list(self):
+        nested=json.loads(self.client.get(RECIPE_URL).content)
+        data=json.loads(self.get().content)
+
+        rebuilt=[
+            dict(recipe ,
+                tags=[data['tags'][str(pk)] for pk in recipe['tags']] ,
+                ingredients=[
+                    data['ingredients'][str(pk)] for pk in recipe['ingredients']
+                ])
+            for recipe in data['results']
+        ]
+        self.assertEqual(rebuilt, nested['results'])
+
+    def test_regular_serializers_same_output(self):
+        with self.settings(API_FAST_SERIALIZERS=False):
+            slow=self.get().content
+
+        self.assertEqual(self.get().content, slow)
+
+    def test_paginated(self):
+        res=self.get({'page_size':1})
+
+        self.assertEqual(len(res.data['results']), 1)
+        # only the tags of the page
+        self.assertEqual(
+            set(res.data['tags']), {str(pk) for pk in res.data['results'][0]['tags']}
+        )
+        self.assertIn('format=normalized', res.data['next'])
+
+    def test_sparse_fieldset(self):
+        data=self.get({'fields':'id,tags'}).data
+
+        self.assertEqual(set(data['results'][0]), {'id' , 'tags'})
+        self.assertIn('tags', data)
+        self.assertNotIn('ingredients', data)
+
+    def test_msgpack(self):
+        res=self.get(HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            msgpack.unpackb(res.content), json.loads(self.get().content)
+        )
+
+    def test_detail_unchanged(self):
+        recipe=Recipe.objects.filter(user=self.user).first()
+
+        res=self.client.get(detail_url(recipe.id) , {'format':'normalized'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'vegan')
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag
+
+RECIPE_URL=reverse('recipe:recipe-list')
+TAG_URL=reverse('recipe:tag-list')
+
+def create_recipe(user , **kwargs):
+    defaults={
+        'title':'sample',
+        'user':user,
+        'price':Decimal('5.50'),
+        'time_minutes':5,
+    }
+    defaults.update(**kwargs)
+    return Recipe.objects.create(**defaults)
+
+class CursorPaginationTest(TestCase):
+    ''' test keyset pagination of list endpoints '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='pages@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _walk(self , url , params):
+        ''' follow next links and return every page '''
+        pages=[]
+        res=self.client.get(url , params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data)
+            if not res.data['next']:
+                return pages
+            res=self.client.get(res.data['next'])
+
+    def test_recipe_pages_cover_all_rows_in_order(self):
+        recipes=[create_recipe(self.user , title=f'r{i}') for i in range(5)]
+        pages=self._walk(RECIPE_URL , {'page_size':2})
+
+        ids=[r['id'] for page in pages for r in page['results']]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(ids, sorted([r.id for r in recipes] , reverse=True))
+        self.assertIsNone(pages[0]['previous'])
+        self.assertIsNotNone(pages[1]['previous'])
+
+    def test_cursor_stable_when_rows_inserted(self):
+        for i in range(4):
+            create_recipe(self.user , title=f'r{i}')
+        first=self.client.get(RECIPE_URL , {'page_size':2}).data
+        create_recipe(self.user , title='newer')
+        second=self.client.get(first['next']).data
+
+        seen=[r['id'] for r in first['results'] + second['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertTrue(all(r['title'] != 'newer' for r in second['results']))
+
+    def test_cursor_pagination_with_filters(self):
+        tag=Tag.objects.create(user=self.user , name='veg')
+        tagged=[]
+        for i in range(5):
+            recipe=create_recipe(self.user , title=f'r{i}')
+            if i % 2 == 0:
+                recipe.tags.add(tag)
+                tagged.append(recipe.id)
+        pages=self._walk(RECIPE_URL , {'page_size':2 , 'tags':f'{tag.id}'})
+
+        ids=[r['id'] for page in pages for r in page['results']]
+        self.assertEqual(ids, sorted(tagged , reverse=True))
+        self.assertTrue(all('tags' in page['next'] for page in pages[:-1]))
+
+    def test_tag_pages_ordered_by_name(self):
+        for name in ['a' , 'b' , 'c' , 'd']:
+            Tag.objects.create(user=self.user , name=name)
+        pages=self._walk(TAG_URL , {'page_size':3})
+
+        names=[t['name'] for page in pages for t in page['results']]
+        self.assertEqual(names, ['d' , 'c' , 'b' , 'a'])
+        self.assertEqual(len(pages), 2)
@@ -0,0 +1,225 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag , Ingredient
+
+RECIPE_URL=reverse('recipe:recipe-list')
+
+def create_recipe_url(recipe_id):
+    return reverse('recipe:recipe-detail' , args=[recipe_id])
+
+def create_recipes(user , count):
+    ''' create recipes each linked to its own tag and ingredient '''
+    recipes=[]
+    start=Recipe.objects.filter(user=user).count()
+    for i in range(start , start+count):
+        recipe=Recipe.objects.create(
+            user=user ,
+            title=f'recipe {i}',
+            price=Decimal('5.50'),
+            time_minutes=10,
+        )
+        recipe.tags.add(Tag.objects.create(user=user , name=f'tag {i}'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=user , name=f'ingred {i}')
+        )
+        recipes.append(recipe)
+    return recipes
+
+class RecipeQueryCountTest(TestCase):
+    ''' query count of recipe endpoints must not grow with number of rows '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='queries@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _count_queries(self , func):
+        with CaptureQueriesContext(connection) as ctx:
+            res=func()
+        self.assertLess(res.status_code, 300)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self , func , grow):
+        ''' run func , add more rows with grow() , run it again and compare '''
+        before=self._count_queries(func)
+        grow()
+        after=self._count_queries(func)
+        self.assertEqual(before, after)
+
+    def test_list_queries_constant(self):
+        create_recipes(self.user , 2)
+        self.assertConstantQueries(
+            lambda: self.client.get(RECIPE_URL),
+            lambda: create_recipes(self.user , 10),
+        )
+
+    def test_filtered_list_queries_constant(self):
+        tag=Tag.objects.create(user=self.user , name='shared')
+        ingred=Ingredient.objects.create(user=self.user , name='shared')
+        def grow(count=5):
+            for recipe in create_recipes(self.user , count):
+                recipe.tags.add(tag)
+                recipe.ingredients.add(ingred)
+        grow(2)
+        params={'tags':f'{tag.id}' , 'ingredients':f'{ingred.id}'}
+        self.assertConstantQueries(
+            lambda: self.client.get(RECIPE_URL , params),
+            grow,
+        )
+
+    def test_item_list_queries_constant(self):
+        ''' recipe_count and assigned_only add no query per tag '''
+        tag_url=reverse('recipe:tag-list')
+        create_recipes(self.user , 2)
+        self.assertConstantQueries(
+            lambda: self.client.get(tag_url , {'assigned_only':1}),
+            lambda: create_recipes(self.user , 10),
+        )
+
+    def test_assigned_only_without_distinct(self):
+        tag_url=reverse('recipe:tag-list')
+        create_recipes(self.user , 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(tag_url , {'assigned_only':1})
+        select=next(
+            query['sql'] for query in ctx.captured_queries
+            if 'FROM "core_tag"' in query['sql']
+        )
+        self.assertNotIn('DISTINCT', select)
+        self.assertIn('EXISTS', select)
+
+    def test_detail_queries_constant(self):
+        recipe=create_recipes(self.user , 1)[0]
+        def grow():
+            recipe.tags.add(*[
+                Tag.objects.create(user=self.user , name=f'extra {i}')
+                for i in range(10)
+            ])
+        self.assertConstantQueries(
+            lambda: self.client.get(create_recipe_url(recipe.id)),
+            grow,
+        )
+
+    def test_create_queries_constant(self):
+        payload={
+            'title':'new recipe',
+            'price':Decimal('5.50'),
+            'time_minutes':10,
+            'tags':[{'name':'tag 0'}],
+            'ingredients':[{'name':'ingred 0'}],
+        }
+        create_recipes(self.user , 1)
+        self.assertConstantQueries(
+            lambda: self.client.post(RECIPE_URL , payload , format='json'),
+            lambda: create_recipes(self.user , 10),
+        )
+
+    def test_update_queries_constant(self):
+        recipe=create_recipes(self.user , 1)[0]
+        titles=(f'updated {i}' for i in range(2))
+        url=create_recipe_url(recipe.id)
+        self.assertConstantQueries(
+            lambda: self.client.patch(
+                url , {'title':next(titles) , 'tags':[{'name':'tag 0'}]} ,
+                format='json'
+            ),
+            lambda: create_recipes(self.user , 10),
+        )
+
+    def test_create_queries_flat_in_nested_items(self):
+        ''' nested tags/ingredients are resolved and linked in batches '''
+        def payload(count):
+            return {
+                'title':'nested',
+                'price':Decimal('5.50'),
+                'time_minutes':10,
+                'tags':[{'name':f'new tag {count} {i}'} for i in range(count)],
+                'ingredients':[
+                    {'name':f'new ingred {count} {i}'} for i in range(count)
+                ],
+            }
+        few=self._count_queries(
+            lambda: self.client.post(RECIPE_URL , payload(1) , format='json')
+        )
+        many=self._count_queries(
+            lambda: self.client.post(RECIPE_URL , payload(20) , format='json')
+        )
+        self.assertEqual(few, many)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 21)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 21)
+
+    def test_create_mixed_existing_and_new_items(self):
+        Tag.objects.create(user=self.user , name='old')
+        payload={
+            'title':'mixed',
+            'price':Decimal('5.50'),
+            'time_minutes':10,
+            'tags':[{'name':'old'} , {'name':'new'} , {'name':'new'}],
+        }
+        res=self.client.post(RECIPE_URL , payload , format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe=Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name' , flat=True)), ['new' , 'old']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+class RecipeM2MUpdateTest(TestCase):
+    ''' updates only write the through rows that changed '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='diff@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe=create_recipes(self.user , 1)[0]
+        self.url=create_recipe_url(self.recipe.id)
+
+    def _through_writes(self , payload):
+        ''' return insert/delete statements hitting the through tables '''
+        with CaptureQueriesContext(connection) as ctx:
+            res=self.client.patch(self.url , payload , format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith(('INSERT' , 'DELETE'))
+            and ('core_recipe_tags' in q['sql']
+                or 'core_recipe_ingredients' in q['sql'])
+        ]
+
+    def test_unchanged_patch_writes_nothing(self):
+        payload={
+            'tags':[{'name':t.name} for t in self.recipe.tags.all()],
+            'ingredients':[
+                {'name':i.name} for i in self.recipe.ingredients.all()
+            ],
+        }
+        self.assertEqual(self._through_writes(payload), [])
+
+    def test_patch_keeps_unchanged_links(self):
+        kept=self.recipe.tags.get()
+        dropped=Tag.objects.create(user=self.user , name='dropped')
+        self.recipe.tags.add(dropped)
+        through=Recipe.tags.through
+        kept_link=through.objects.get(recipe=self.recipe , tag=kept).id
+
+        writes=self._through_writes(
+            {'tags':[{'name':kept.name} , {'name':'added'}]}
+        )
+
+        self.assertEqual(len(writes), 2)
+        self.assertTrue(through.objects.filter(id=kept_link).exists())
+        self.assertEqual(
+            sorted(self.recipe.tags.values_list('name' , flat=True)),
+            sorted([kept.name , 'added']),
+        )
@@ -9,6 +9,7 @@ from recipe.serializers import RecipeSerializer , RecipeDetailSerializer
 
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
@@ -66,7 +67,7 @@ class PrivateRecipeApiTest(TestCase):
         recipes=Recipe.objects.all().order_by('-id')
         serilizers=RecipeSerializer(recipes , many=True)
 
-        self.assertEqual(serilizers.data, res.data)
+        self.assertEqual(serilizers.data, res.data['results'])
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
     def test_recipe_for_auth_user(self):
@@ -82,7 +83,7 @@ class PrivateRecipeApiTest(TestCase):
         serializers = RecipeSerializer(recipes , many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializers.data, res.data)
+        self.assertEqual(serializers.data, res.data['results'])
 
     def test_recipe_detail(self):
         ''' test get recipe detail '''
@@ -339,6 +340,55 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def test_filter_recipe_matching_many_tags_once(self):
+        ''' recipe linked to several requested tags is returned once '''
+        recipe=create_recipe(user=self.user)
+        t1=Tag.objects.create(user=self.user , name='tag1')
+        t2=Tag.objects.create(user=self.user , name='tag2')
+        recipe.tags.add(t1 , t2)
+
+        res=self.client.get(RECIPE_URL , {'tags':f'{t1.id},{t2.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_match_all_tags(self):
+        ''' match=all returns only recipes having every requested tag '''
+        t1=Tag.objects.create(user=self.user , name='tag1')
+        t2=Tag.objects.create(user=self.user , name='tag2')
+        both=create_recipe(user=self.user , title='both')
+        both.tags.add(t1 , t2)
+        one=create_recipe(user=self.user , title='one')
+        one.tags.add(t1)
+
+        params={'tags':f'{t1.id},{t2.id}' , 'match':'all'}
+        res=self.client.get(RECIPE_URL , params)
+
+        ids=[r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_match_all_tags_and_ingredients(self):
+        ''' match=all applies to tags and ingredients together '''
+        tag=Tag.objects.create(user=self.user , name='tag1')
+        i1=Ingredient.objects.create(user=self.user , name='ingred1')
+        i2=Ingredient.objects.create(user=self.user , name='ingred2')
+        full=create_recipe(user=self.user , title='full')
+        full.tags.add(tag)
+        full.ingredients.add(i1 , i2)
+        partial=create_recipe(user=self.user , title='partial')
+        partial.tags.add(tag)
+        partial.ingredients.add(i1)
+
+        params={
+            'tags':f'{tag.id}',
+            'ingredients':f'{i1.id},{i2.id},{i2.id}',
+            'match':'all',
+        }
+        res=self.client.get(RECIPE_URL , params)
+
+        ids=[r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [full.id])
+
 class TestImageUpload(TestCase):
     def setUp(self):
         self.client=APIClient()
@@ -363,11 +413,16 @@ class TestImageUpload(TestCase):
             payload={
                 'image' : img_file,
             }
-            res=self.client.post(url ,payload , format='multipart')
+            with patch('recipe.views.image_pipeline') as pipeline , \
+                    self.captureOnCommitCallbacks(execute=True):
+                res=self.client.post(url ,payload , format='multipart')
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
+        self.assertIsNone(res.data['images'])
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        pipeline.submit.assert_called_once_with(self.recipe.id)
 
     def test_upload_bad_request(self):
         url=image_upload_url(self.recipe.id)
@@ -394,9 +449,9 @@ class TestImageUpload(TestCase):
 
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         ''' test filtering recipe by ingredients '''
@@ -418,6 +473,6 @@ class TestImageUpload(TestCase):
 
         res=self.client.get(RECIPE_URL , params)
 
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from decimal import Decimal
+from rest_framework.test import APIClient
+from rest_framework import status
+from core.models import Recipe , Tag
+
+RECIPE_URL=reverse('recipe:recipe-list')
+
+def create_recipe(user , **kwargs):
+    defaults={
+        'title':'sample',
+        'user':user,
+        'price':Decimal('5.50'),
+        'time_minutes':5,
+    }
+    defaults.update(**kwargs)
+    return Recipe.objects.create(**defaults)
+
+class RecipeSearchVectorTest(TestCase):
+    ''' stored search vector is maintained on save '''
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='vector@example.com' , password='testpass123'
+        )
+
+    def test_vector_filled_on_create(self):
+        recipe=create_recipe(self.user , title='Tomato Soup')
+
+        self.assertIsNotNone(
+            Recipe.objects.values_list('search_vector' , flat=True).get(id=recipe.id)
+        )
+
+    def test_vector_updated_when_text_changes(self):
+        recipe=create_recipe(self.user , title='soup')
+        before=Recipe.objects.values_list('search_vector' , flat=True)\
+            .get(id=recipe.id)
+        recipe.title='stew'
+        recipe.save()
+        after=Recipe.objects.values_list('search_vector' , flat=True)\
+            .get(id=recipe.id)
+
+        self.assertNotEqual(before, after)
+
+    def test_no_vector_update_when_text_unchanged(self):
+        recipe=create_recipe(self.user , title='soup')
+        recipe=Recipe.objects.get(id=recipe.id)
+        recipe.price=Decimal('1.00')
+        with CaptureQueriesContext(connection) as ctx:
+            recipe.save()
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_resave_keeps_vector(self):
+        recipe=create_recipe(self.user , title='soup')
+        recipe.time_minutes=50
+        recipe.save()
+
+        self.assertIsNotNone(
+            Recipe.objects.values_list('search_vector' , flat=True).get(id=recipe.id)
+        )
+
+class RecipeSearchApiTest(TestCase):
+    ''' test ?q= search on the recipe list '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='search@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _search(self , **params):
+        res=self.client.get(RECIPE_URL , params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [r['title'] for r in res.data['results']]
+
+    def test_search_title_and_description(self):
+        create_recipe(self.user , title='Tomato soup')
+        create_recipe(self.user , title='Salad' , description='with tomato')
+        create_recipe(self.user , title='Pancakes')
+
+        self.assertEqual(
+            sorted(self._search(q='tomato')), ['Salad' , 'Tomato soup']
+        )
+
+    def test_search_ranks_title_matches_first(self):
+        create_recipe(self.user , title='Tomato soup')
+        create_recipe(self.user , title='Salad' , description='with tomato')
+        create_recipe(self.user , title='Tomato bread')
+
+        titles=self._search(q='tomato')
+        self.assertEqual(titles[-1], 'Salad')
+
+    def test_search_limited_to_user(self):
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        create_recipe(other , title='Tomato soup')
+
+        self.assertEqual(self._search(q='tomato'), [])
+
+    def test_search_combined_with_tags(self):
+        tag=Tag.objects.create(user=self.user , name='veg')
+        tagged=create_recipe(self.user , title='Tomato soup')
+        tagged.tags.add(tag)
+        create_recipe(self.user , title='Tomato pie')
+
+        self.assertEqual(
+            self._search(q='tomato' , tags=f'{tag.id}'), ['Tomato soup']
+        )
+
+    def test_search_pages_by_rank(self):
+        for i in range(3):
+            create_recipe(self.user , title=f'soup {i}')
+            create_recipe(self.user , title=f'stew {i}' , description='soup')
+        res=self.client.get(RECIPE_URL , {'q':'soup' , 'page_size':2})
+        titles=[r['title'] for r in res.data['results']]
+        while res.data['next']:
+            res=self.client.get(res.data['next'])
+            titles+=[r['title'] for r in res.data['results']]
+
+        self.assertEqual(len(titles), 6)
+        self.assertEqual(len(set(titles)), 6)
+        self.assertTrue(all(t.startswith('soup') for t in titles[:3]))
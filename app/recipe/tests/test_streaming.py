@@ -0,0 +1,94 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase , override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe , Tag , Ingredient
+
+RECIPE_URL=reverse('recipe:recipe-list')
+TAG_URL=reverse('recipe:tag-list')
+
+
+@override_settings(API_STREAM_CHUNK_SIZE=2)
+class StreamingListTest(TestCase):
+
+    def setUp(self):
+        self.user=get_user_model().objects.create_user(
+            email='stream@example.com' , password='testpass123'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags=[
+            Tag.objects.create(user=self.user , name=f'tag {i}') for i in range(3)
+        ]
+        salt=Ingredient.objects.create(user=self.user , name='salt')
+        for i in range(5):
+            recipe=Recipe.objects.create(
+                user=self.user , title=f'stew {i}' , price=Decimal('7.25') ,
+                time_minutes=i ,
+            )
+            recipe.tags.add(*self.tags[:i%3])
+            recipe.ingredients.add(salt)
+
+    def stream(self , url , params=None):
+        res=self.client.get(url , {'page_size':'all' , **(params or {})})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return res.getvalue()
+
+    def assertSameAsPage(self , url , params=None):
+        ''' streamed bytes are the ones of one page holding every row '''
+        streamed=self.stream(url , params)
+        with self.settings(API_CACHE_ENABLED=False):
+            page=self.client.get(url , {'page_size':200 , **(params or {})})
+
+        self.assertEqual(streamed, page.content)
+        return json.loads(streamed)
+
+    def test_recipes_streamed_in_chunks(self):
+        data=self.assertSameAsPage(RECIPE_URL)
+
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_regular_serializers(self):
+        with self.settings(API_FAST_SERIALIZERS=False):
+            self.assertSameAsPage(RECIPE_URL)
+            self.assertSameAsPage(RECIPE_URL , {'format':'normalized'})
+
+    def test_filters_and_fieldsets(self):
+        self.assertSameAsPage(RECIPE_URL , {'tags':str(self.tags[1].id)})
+        self.assertSameAsPage(RECIPE_URL , {'fields':'id,tags'})
+
+    def test_normalized(self):
+        data=self.assertSameAsPage(RECIPE_URL , {'format':'normalized'})
+
+        self.assertEqual(len(data['tags']), 2)
+        self.assertEqual(len(data['ingredients']), 1)
+
+    def test_empty_list(self):
+        Recipe.objects.all().delete()
+
+        self.assertSameAsPage(RECIPE_URL)
+        self.assertSameAsPage(RECIPE_URL , {'format':'normalized'})
+
+    def test_tags(self):
+        self.assertSameAsPage(TAG_URL)
+        self.assertSameAsPage(TAG_URL , {'ordering':'popular'})
+
+    @override_settings(API_CACHE_ENABLED=True , API_CONDITIONAL_GET=True)
+    def test_not_cached(self):
+        res=self.client.get(RECIPE_URL , {'page_size':'all'})
+
+        self.assertNotIn('X-Cache', res)
+        self.assertIn('ETag', res)
+
+    def test_json_only(self):
+        res=self.client.get(RECIPE_URL , {'page_size':'all'} ,
+            HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_406_NOT_ACCEPTABLE)
@@ -7,6 +7,7 @@ from rest_framework import status
 from core.models import Tag,Recipe
 
 from recipe.serializers import TagSerializer
+from recipe.filters import annotate_recipe_count
 
 def tag_url(tag_id):
     return reverse('recipe:tag-detail' , args=[tag_id])
@@ -15,6 +16,7 @@ def create_user(email='test6@example.com' , password='testpass123'):
     return get_user_model().objects.create_user(email=email , password=password)
 
 TAG_URL=reverse('recipe:tag-list')
+AUTOCOMPLETE_URL=reverse('recipe:tag-autocomplete')
 
 class PublicTagTest(TestCase):
     ''' test un authorized api request '''
@@ -42,10 +44,10 @@ class PrivateTagTest(TestCase):
         Tag.objects.create(user=self.user , name='test2')
 
         res=self.client.get(TAG_URL)
-        tags=Tag.objects.all().order_by('-name')
+        tags=annotate_recipe_count(Tag.objects.all()).order_by('-name')
         serializser=TagSerializer(tags , many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializser.data)
+        self.assertEqual(res.data['results'], serializser.data)
 
     def test_retireve_tag_limitedto_user(self):
         ''' test list of tags limited to authenticated user '''
@@ -56,9 +58,9 @@ class PrivateTagTest(TestCase):
         res=self.client.get(TAG_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
 
     def test_update_tage(self):
         ''' test for update tag '''
@@ -93,12 +95,13 @@ class PrivateTagTest(TestCase):
             title='test ingred'
         )
         recipe.tags.add(t1)
+        t1.recipe_count , t2.recipe_count = 1 , 0
         s1=TagSerializer(t1)
         s2=TagSerializer(t2)
         res=self.client.get(TAG_URL , {'assigned_only':1})
 
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_ingredients_assigned_unique(self):
         t1=Tag.objects.create(user=self.user , name='ing1')
@@ -118,5 +121,120 @@ class PrivateTagTest(TestCase):
         recipe1.tags.add(t1)
         recipe2.tags.add(t1)
         res=self.client.get(TAG_URL , {'assigned_only':1})
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
+
+    def test_create_duplicate_tag_name(self):
+        ''' tag names are unique per user '''
+        Tag.objects.create(user=self.user , name='dup')
+        res=self.client.post(TAG_URL , {'name':'dup'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user , name='dup').count(), 1)
+
+    def test_same_tag_name_for_other_user(self):
+        other=create_user(email='other@example.com')
+        Tag.objects.create(user=other , name='dup')
+        res=self.client.post(TAG_URL , {'name':'dup'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_rename_tag_to_existing_name(self):
+        Tag.objects.create(user=self.user , name='taken')
+        tag=Tag.objects.create(user=self.user , name='free')
+        res=self.client.patch(tag_url(tag.id) , {'name':'taken'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_count(self):
+        used=Tag.objects.create(user=self.user , name='used')
+        Tag.objects.create(user=self.user , name='unused')
+        for title in ('r1' , 'r2'):
+            recipe=Recipe.objects.create(
+                user=self.user , title=title , price=5.0 , time_minutes=10
+            )
+            recipe.tags.add(used)
+
+        res=self.client.get(TAG_URL)
+
+        counts={tag['name']:tag['recipe_count'] for tag in res.data['results']}
+        self.assertEqual(counts, {'used':2 , 'unused':0})
+
+    def test_order_by_popularity(self):
+        tags=[Tag.objects.create(user=self.user , name=name) for name in 'abc']
+        for count , tag in zip((1 , 3 , 2) , tags):
+            for i in range(count):
+                recipe=Recipe.objects.create(
+                    user=self.user , title=f'{tag.name}{i}' , price=5.0 ,
+                    time_minutes=10
+                )
+                recipe.tags.add(tag)
+
+        res=self.client.get(TAG_URL , {'ordering':'popular' , 'page_size':2})
+        names=[tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['b' , 'c'])
+
+        res=self.client.get(res.data['next'])
+        names=[tag['name'] for tag in res.data['results']]
+        self.assertEqual(names, ['a'])
+
+    def test_created_tag_has_zero_count(self):
+        res=self.client.post(TAG_URL , {'name':'new'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['recipe_count'], 0)
+
+    def test_nested_tags_without_count(self):
+        tag=Tag.objects.create(user=self.user , name='nested')
+        recipe=Recipe.objects.create(
+            user=self.user , title='r' , price=5.0 , time_minutes=10
+        )
+        recipe.tags.add(tag)
+
+        res=self.client.get(reverse('recipe:recipe-detail' , args=[recipe.id]))
+
+        self.assertEqual(res.data['tags'], [{'id':tag.id , 'name':'nested'}])
+
+    def test_autocomplete_prefix_ignores_case(self):
+        for name in ('Tomato' , 'tofu' , 'pasta'):
+            Tag.objects.create(user=self.user , name=name)
+        Tag.objects.create(user=create_user(email='o@example.com') , name='toast')
+
+        res=self.client.get(AUTOCOMPLETE_URL , {'prefix':'TO'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data], ['Tomato' , 'tofu'])
+        self.assertEqual(set(res.data[0]), {'id' , 'name'})
+
+    def test_autocomplete_prefix_is_literal(self):
+        Tag.objects.create(user=self.user , name='100% rye')
+        Tag.objects.create(user=self.user , name='1000 island')
+
+        res=self.client.get(AUTOCOMPLETE_URL , {'prefix':'100%'})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['100% rye'])
+
+    def test_autocomplete_limit(self):
+        for i in range(15):
+            Tag.objects.create(user=self.user , name=f'tag{i:02}')
+
+        res=self.client.get(AUTOCOMPLETE_URL , {'prefix':'tag'})
+        self.assertEqual(len(res.data), 10)
+
+        res=self.client.get(AUTOCOMPLETE_URL , {'prefix':'tag' , 'limit':3})
+        self.assertEqual(len(res.data), 3)
+
+        res=self.client.get(AUTOCOMPLETE_URL , {'prefix':'tag' , 'limit':500})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_requires_prefix(self):
+        res=self.client.get(AUTOCOMPLETE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_single_query(self):
+        Tag.objects.create(user=self.user , name='tomato')
+        self.client.get(AUTOCOMPLETE_URL , {'prefix':'t'})
+
+        with self.assertNumQueries(1):
+            self.client.get(AUTOCOMPLETE_URL , {'prefix':'to'})
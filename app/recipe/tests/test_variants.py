@@ -0,0 +1,241 @@
+import fcntl
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.test import TestCase , override_settings
+from django.urls import reverse
+from decimal import Decimal
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.variants import VariantCache , variant_cache
+
+def image_url(recipe_id):
+    return reverse('recipe:recipe-image' , args=[recipe_id])
+
+def png_bytes(size=(400 , 200)):
+    output=io.BytesIO()
+    Image.new('RGB' , size , 'blue').save(output , format='PNG')
+    return output.getvalue()
+
+
+class VariantCacheTest(TestCase):
+
+    def setUp(self):
+        self.root=tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree , self.root)
+        self.cache=VariantCache(root=self.root , max_bytes=1000)
+
+    def test_render_once(self):
+        calls=[]
+        def render():
+            calls.append(1)
+            return b'x'*10
+        name=self.cache.name('a.jpg' , 80 , 'jpeg')
+
+        self.assertFalse(self.cache.get_or_render(name , render))
+        self.assertTrue(self.cache.get_or_render(name , render))
+        self.assertEqual(len(calls), 1)
+        with open(self.cache.path(name) , 'rb') as cached:
+            self.assertEqual(cached.read(), b'x'*10)
+
+    def test_concurrent_requests_coalesce(self):
+        calls=[]
+        def render():
+            calls.append(1)
+            time.sleep(0.2)
+            return b'x'
+        name=self.cache.name('a.jpg' , 80 , 'jpeg')
+        threads=[
+            threading.Thread(target=self.cache.get_or_render , args=(name , render))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+
+    def test_workers_without_shared_memory_coalesce(self):
+        # two caches on the same root , as in two uwsgi workers
+        other=VariantCache(root=self.root , max_bytes=1000)
+        calls=[]
+        def render():
+            calls.append(1)
+            time.sleep(0.2)
+            return b'x'
+        name=self.cache.name('a.jpg' , 80 , 'jpeg')
+        threads=[
+            threading.Thread(target=cache.get_or_render , args=(name , render))
+            for cache in (self.cache , other)*3
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+
+    def test_waits_for_render_of_other_process(self):
+        name=self.cache.name('a.jpg' , 80 , 'jpeg')
+        path=self.cache.path(name)
+        os.makedirs(os.path.dirname(path))
+        # held through a descriptor of its own , like another worker
+        holder=os.open(self.cache.lock_path(path) , os.O_RDWR|os.O_CREAT)
+        self.addCleanup(os.close , holder)
+        fcntl.flock(holder , fcntl.LOCK_EX)
+        calls=[]
+        results=[]
+        waiter=threading.Thread(target=lambda: results.append(
+            self.cache.get_or_render(name , lambda: calls.append(1) or b'y')
+        ))
+        waiter.start()
+        time.sleep(0.2)
+        with open(path , 'wb') as rendered:
+            rendered.write(b'x')
+        fcntl.flock(holder , fcntl.LOCK_UN)
+        waiter.join()
+
+        self.assertEqual(results, [True])
+        self.assertEqual(calls, [])
+
+    def test_least_recently_used_evicted(self):
+        names=[self.cache.name(f'{i}.jpg' , 80 , 'jpeg') for i in range(3)]
+        now=time.time()
+        for age , name in zip((300 , 200 , 100) , names):
+            self.cache.get_or_render(name , lambda: b'x'*300)
+            os.utime(self.cache.path(name) , (now-age , now-age))
+        # a hit moves the oldest one to the front
+        self.cache.get_or_render(names[0] , lambda: b'')
+
+        # 1100 bytes is over the limit , evicted down to 900
+        self.cache.get_or_render(
+            self.cache.name('3.jpg' , 80 , 'jpeg') , lambda: b'x'*200
+        )
+
+        self.assertTrue(os.path.exists(self.cache.path(names[0])))
+        self.assertFalse(os.path.exists(self.cache.path(names[1])))
+        self.assertFalse(os.path.exists(self.cache.lock_path(self.cache.path(names[1]))))
+        self.assertTrue(os.path.exists(self.cache.path(names[2])))
+
+    def test_failed_render_leaves_no_lock(self):
+        name=self.cache.name('broken.jpg' , 80 , 'jpeg')
+        def render():
+            raise OSError('cannot identify image file')
+
+        with self.assertRaises(OSError):
+            self.cache.get_or_render(name , render)
+
+        self.assertFalse(os.path.exists(self.cache.lock_path(self.cache.path(name))))
+
+    def test_orphan_locks_swept(self):
+        stored=self.cache.name('stored.jpg' , 80 , 'jpeg')
+        self.cache.get_or_render(stored , lambda: b'x')
+        orphan=self.cache.lock_path(self.cache.path(
+            self.cache.name('crashed.jpg' , 80 , 'jpeg')))
+        os.makedirs(os.path.dirname(orphan) , exist_ok=True)
+        open(orphan , 'w').close()
+        expired=time.time()-VariantCache.LOCK_TIMEOUT-1
+        for path in (orphan , self.cache.lock_path(self.cache.path(stored))):
+            os.utime(path , (expired , expired))
+
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(os.path.exists(orphan))
+        # its variant is still there
+        self.assertTrue(os.path.exists(self.cache.lock_path(self.cache.path(stored))))
+
+
+class RecipeImageVariantTest(TestCase):
+
+    def setUp(self):
+        self.media=tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree , self.media)
+        overrides=override_settings(
+            MEDIA_ROOT=self.media ,
+            IMAGE_VARIANT_ROOT=os.path.join(self.media , 'variants') ,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(caches['api'].clear)
+        self.user=get_user_model().objects.create_user(
+            email='variants@example.com' , password='testpass123'
+        )
+        self.client=APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe=Recipe.objects.create(
+            user=self.user , title='photo' , price=Decimal('1.00') ,
+            time_minutes=5 ,
+        )
+        self.recipe.image.save('photo.png' , ContentFile(png_bytes()))
+
+    def get(self , width=160 , **kwargs):
+        return self.client.get(
+            image_url(self.recipe.id) , {'width':width , **kwargs} ,
+            HTTP_ACCEPT=kwargs.pop('accept' , 'image/webp,*/*') ,
+        )
+
+    def test_resized_on_first_request(self):
+        res=self.get(format='jpeg')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['X-Cache'], 'MISS')
+        image=Image.open(io.BytesIO(b''.join(res.streaming_content)))
+        self.assertEqual(image.size, (160 , 80))
+
+        self.assertEqual(self.get(format='jpeg')['X-Cache'], 'HIT')
+
+    def test_format_follows_accept(self):
+        with patch.dict('recipe.variants.FORMATS' , {'webp':('WEBP' , 'image/webp')}):
+            res=self.get()
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        self.assertIn('Accept', res['Vary'])
+
+    def test_width_not_allowed(self):
+        res=self.get(width=123)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(os.listdir(self.media), ['uploads'])
+
+    def test_not_modified(self):
+        etag=self.get(format='jpeg')['ETag']
+
+        with patch('recipe.variants.render_variant') as render:
+            res=self.client.get(
+                image_url(self.recipe.id) , {'width':160 , 'format':'jpeg'} ,
+                HTTP_IF_NONE_MATCH=etag ,
+            )
+
+        self.assertEqual(res.status_code, 304)
+        render.assert_not_called()
+
+    @override_settings(IMAGE_VARIANT_ACCEL_PREFIX='/internal/image-variants/')
+    def test_served_by_nginx(self):
+        res=self.get(format='jpeg')
+
+        name=variant_cache.name(self.recipe.image.name , 160 , 'jpeg')
+        self.assertEqual(res['X-Accel-Redirect'], f'/internal/image-variants/{name}')
+        self.assertEqual(res.content, b'')
+
+    def test_other_user_recipe(self):
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_recipe_without_image(self):
+        self.recipe.image.delete()
+
+        self.assertEqual(self.get().status_code, 404)
@@ -0,0 +1,273 @@
+'''
+on demand resized recipe images .
+
+GET /recipes/<id>/image/?width=320&format=webp renders the variant with
+pillow on the first request and keeps it in a size bounded disk cache under
+IMAGE_VARIANT_ROOT . later requests are served from disk , by nginx through
+X-Accel-Redirect when IMAGE_VARIANT_ACCEL_PREFIX is set . eviction is least
+recently used by file mtime , which hits refresh . concurrent requests for
+a variant , in any worker , wait for a single render through a flock on a
+lock file next to it .
+'''
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse , HttpResponse
+from PIL import features
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from recipe.images import LANCZOS , decode_image , encode_image
+
+# ?format= value -> ( pillow format , content type )
+FORMATS={'jpeg':('JPEG' , 'image/jpeg')}
+if features.check('webp'):
+    FORMATS['webp']=('WEBP' , 'image/webp')
+
+
+class VariantCache:
+    LOCK_TIMEOUT=30
+    LOCK_POLL=0.05
+    # a hit refreshes the mtime at most this often , in seconds
+    TOUCH_INTERVAL=60
+    # other workers write to the same directory , rescan its real size
+    # at least this often , in seconds
+    SCAN_INTERVAL=60
+    # eviction frees space down to this share of max_bytes
+    LOW_WATERMARK=0.9
+
+    def __init__(self , root=None , max_bytes=None):
+        self._root=root
+        self._max_bytes=max_bytes
+        self._lock=threading.Lock()
+        self._size=None
+        self._scanned_at=0
+
+    @property
+    def root(self):
+        return self._root or settings.IMAGE_VARIANT_ROOT
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes or settings.IMAGE_VARIANT_MAX_BYTES
+
+    def name(self , source , width , image_format):
+        ''' cache file name of a variant , relative to root '''
+        digest=hashlib.sha256(
+            f'{source}|{width}|{image_format}'.encode()
+        ).hexdigest()
+        return f'{digest[:2]}/{digest}.{image_format}'
+
+    def path(self , name):
+        return os.path.join(self.root , name)
+
+    def lock_path(self , path):
+        ''' lock file of the variant at path , a dot file evict() skips '''
+        directory , filename = os.path.split(path)
+        return os.path.join(directory , f'.{filename}.lock')
+
+    def _lookup(self , path):
+        ''' whether path is cached , refreshing its place in the LRU order '''
+        try:
+            mtime=os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        now=time.time()
+        if now-mtime > self.TOUCH_INTERVAL:
+            try:
+                os.utime(path , (now , now))
+            except FileNotFoundError:
+                # evicted in between
+                return False
+        return True
+
+    def get_or_render(self , name , render):
+        '''
+        make sure the variant name is on disk and return whether it already
+        was . render() returns its bytes , concurrent callers for the same
+        name wait for one render instead of all resizing the image
+        '''
+        path=self.path(name)
+        if self._lookup(path):
+            return True
+
+        os.makedirs(os.path.dirname(path) , exist_ok=True)
+        # every call opens its own descriptor , so the flock excludes the
+        # other threads as well as the other workers , the kernel drops it
+        # when the holder exits
+        lock_path=self.lock_path(path)
+        lock=os.open(lock_path , os.O_RDWR|os.O_CREAT , 0o644)
+        locked=False
+        try:
+            deadline=time.monotonic()+self.LOCK_TIMEOUT
+            while True:
+                try:
+                    fcntl.flock(lock , fcntl.LOCK_EX|fcntl.LOCK_NB)
+                    locked=True
+                    break
+                except BlockingIOError:
+                    time.sleep(self.LOCK_POLL)
+                    if self._lookup(path):
+                        return True
+                    if time.monotonic() > deadline:
+                        # the holder is too slow , render it ourselves
+                        break
+            # the previous holder may have finished right before we locked
+            if self._lookup(path):
+                return True
+            try:
+                self._store(path , render())
+            except BaseException:
+                # no variant for evict() to take the lock file with
+                if locked:
+                    self._remove(lock_path)
+                raise
+        finally:
+            # also releases the flock
+            os.close(lock)
+        return False
+
+    def _store(self , path , data):
+        directory=os.path.dirname(path)
+        os.makedirs(directory , exist_ok=True)
+        # readers ( and nginx ) never see a partially written file
+        with tempfile.NamedTemporaryFile(dir=directory , prefix='.' ,
+                delete=False) as output:
+            output.write(data)
+        os.replace(output.name , path)
+        self._account(len(data))
+
+    def _account(self , written):
+        with self._lock:
+            if self._size is not None:
+                self._size+=written
+            stale=time.monotonic()-self._scanned_at > self.SCAN_INTERVAL
+            if self._size is None or stale or self._size > self.max_bytes:
+                self._size=self.evict()
+                self._scanned_at=time.monotonic()
+
+    def _remove(self , path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        '''
+        delete the least recently used variants once the cache is over
+        max_bytes and return the size left . lock files of variants that
+        were never stored ( a worker died rendering ) go as well
+        '''
+        entries=[]
+        total=0
+        if not os.path.isdir(self.root):
+            return 0
+        lock_expired=time.time()-self.LOCK_TIMEOUT
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.lock'):
+                    variant=os.path.join(shard.path , entry.name[1:-len('.lock')])
+                    try:
+                        orphan=entry.stat().st_mtime < lock_expired and \
+                            not os.path.exists(variant)
+                    except FileNotFoundError:
+                        continue
+                    if orphan:
+                        self._remove(entry.path)
+                    continue
+                # skip files still being written
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat=entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime , stat.st_size , entry.path))
+                total+=stat.st_size
+        if total <= self.max_bytes:
+            return total
+
+        target=self.max_bytes*self.LOW_WATERMARK
+        for _ , size , path in sorted(entries):
+            if total <= target:
+                break
+            self._remove(path)
+            self._remove(self.lock_path(path))
+            total-=size
+        return total
+
+
+variant_cache=VariantCache()
+
+
+def preferred_format(request):
+    ''' webp for clients announcing it , jpeg for everyone else '''
+    if 'webp' in FORMATS and 'image/webp' in request.META.get('HTTP_ACCEPT' , ''):
+        return 'webp'
+    return 'jpeg'
+
+
+def render_variant(source , width , image_format):
+    ''' bytes of the storage file source scaled down to width '''
+    with default_storage.open(source , 'rb') as image_file:
+        image=decode_image(image_file , width)
+    if image.width > width:
+        image.thumbnail((width , image.height) , LANCZOS , reducing_gap=3.0)
+    return encode_image(image , FORMATS[image_format][0])
+
+
+def variant_response(request , source , width , image_format , cache=None):
+    '''
+    response with the variant of the storage file source , rendered on the
+    first request . raises OSError when source can not be decoded
+    '''
+    cache=cache or variant_cache
+    name=cache.name(source , width , image_format)
+    # the name changes with the recipe image , so it makes a strong etag
+    etag=f'"{os.path.basename(name)}"'
+    if etag in request.META.get('HTTP_IF_NONE_MATCH' , ''):
+        response=HttpResponse(status=304)
+        response['ETag']=etag
+        return response
+
+    hit=cache.get_or_render(
+        name , lambda: render_variant(source , width , image_format)
+    )
+    content_type=FORMATS[image_format][1]
+    prefix=settings.IMAGE_VARIANT_ACCEL_PREFIX
+    if prefix:
+        # nginx serves the file from an internal location
+        response=HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect']=prefix.rstrip('/')+'/'+name
+    else:
+        try:
+            response=FileResponse(open(cache.path(name) , 'rb') ,
+                content_type=content_type)
+        except FileNotFoundError:
+            # evicted right after it was rendered
+            response=HttpResponse(
+                render_variant(source , width , image_format) ,
+                content_type=content_type ,
+            )
+    response['X-Cache']='HIT' if hit else 'MISS'
+    response['ETag']=etag
+    # the url stays the same when the recipe image changes , revalidate
+    response['Cache-Control']='private, no-cache'
+    return response
+
+
+class ImageContentNegotiation(DefaultContentNegotiation):
+    '''
+    images are returned as plain django responses , only errors are rendered
+    so use the first renderer ( json ) whatever the Accept header says , and
+    leave ?format= to the variant format
+    '''
+    def select_renderer(self , request , renderers , format_suffix=None):
+        return renderers[0] , renderers[0].media_type
@@ -1,10 +1,34 @@
 from rest_framework import (viewsets , mixins , status)
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from recipe.serializers import (RecipeSerializer,RecipeDetailSerializer,
-TagSerializer , IngredientSerializer , RecipeImageSerializer)
-from core.models import Recipe,Tag,Ingredient
+TagSerializer , IngredientSerializer , RecipeImageSerializer ,
+RecipeBatchSerializer , AutocompleteQuerySerializer ,
+ItemSuggestionSerializer , ImageVariantQuerySerializer)
+from recipe.filters import (filter_by_related , filter_assigned ,
+annotate_recipe_count , filter_prefix)
+from recipe.search import search_recipes
+from recipe.ndjson import (CONTENT_TYPE as NDJSON_CONTENT_TYPE , NDJSONParser ,
+export_library , import_library , LibraryImportError)
+from recipe.cache import CachedListMixin
+from recipe.images import image_pipeline
+from recipe.variants import (FORMATS as IMAGE_FORMATS , ImageContentNegotiation ,
+preferred_format , variant_response)
+from recipe.conditional import ConditionalGetMixin
+from recipe.fieldsets import SparseFieldsetMixin , FIELDSET_PARAMETERS
+from recipe.fastpath import FastReadMixin
+from recipe.normalized import NormalizedListMixin , NORMALIZED_PARAMETER
+from recipe.streaming import StreamingListMixin
+from recipe.pagination import RecipeCursorPagination , RecipeItemCursorPagination
+from core.models import Recipe,Tag,Ingredient,StoredFile
+from user.authentication import api_authentication_classes
 
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
 from rest_framework.decorators import action
@@ -27,16 +51,35 @@ from drf_spectacular.utils import (
                 OpenApiTypes.STR,
                 description='comma seperaeted list to filter recipe by ingredients'
             ),
-
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description='full text search over title and description , '
+                'results are ranked by relevance'
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR,
+                enum=['any' , 'all'],
+                description='any returns recipes with at least one of the given '
+                'tags/ingredients , all returns recipes having every one of them'
+            ),
+            *FIELDSET_PARAMETERS,
+            NORMALIZED_PARAMETER,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELDSET_PARAMETERS),
 )
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SparseFieldsetMixin , ConditionalGetMixin , StreamingListMixin ,
+        CachedListMixin , NormalizedListMixin , FastReadMixin , viewsets.ModelViewSet):
     serializer_class=RecipeDetailSerializer
-    authentication_classes=[TokenAuthentication]
+    authentication_classes=api_authentication_classes()
     permission_classes=[IsAuthenticated]
+    pagination_class=RecipeCursorPagination
     queryset=Recipe.objects.all()
+    # ?format=normalized lists them once per page
+    side_loaded=('tags' , 'ingredients')
 
     def _params_to_ints(self , qs):
         return [int(params_id) for params_id in qs.split(',') ]
@@ -44,19 +87,29 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         tags=self.request.query_params.get("tags")
         ingredients=self.request.query_params.get('ingredients')
+        match_all=self.request.query_params.get('match' , 'any')=='all'
+        search=self.request.query_params.get('q')
 
         queryset=self.queryset
 
         if tags:
 
             tags_ids=self._params_to_ints(tags)
-            queryset=queryset.filter(tags__id__in=tags_ids)
+            queryset=filter_by_related(queryset , 'tags' , tags_ids , match_all)
 
 
         if ingredients:
             ingred_ids=self._params_to_ints(ingredients)
-            queryset=queryset.filter(ingredients__id__in = ingred_ids)
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+            queryset=filter_by_related(
+                queryset , 'ingredients' , ingred_ids , match_all
+            )
+
+        if search:
+            queryset=search_recipes(queryset , search)
+        queryset=queryset.filter(user=self.request.user).order_by('-id')\
+            .defer('search_vector')
+        # prefetch nested relations so serializing n recipes costs 2 extra queries not 2n
+        return self.sparse_queryset(queryset , prefetch=('tags' , 'ingredients'))
 
     def get_serializer_class(self):
         if self.action=='list':
@@ -64,23 +117,102 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         elif self.action=='upload_image':
             return RecipeImageSerializer
+        elif self.action=='batch':
+            return RecipeBatchSerializer
         return self.serializer_class
 
     def perform_create(self , serializer ):
         serializer.save(user = self.request.user)
     # detail means specefic id of recipe , detail view
 
+    @extend_schema(responses={202:RecipeImageSerializer})
     @action(methods=['POST'] , detail=True , url_path='upload-image')
     def upload_image(self , request , pk=None):
+        ''' store the upload and process it in the background '''
         recipe=self.get_object()
         seriapizer=self.get_serializer(recipe , data=request.data)
 
         if seriapizer.is_valid():
-            seriapizer.save()
-            return Response(seriapizer.data , status=status.HTTP_200_OK)
+            previous=recipe.image.name
+            with transaction.atomic():
+                recipe=seriapizer.save(image_status=Recipe.ImageStatus.PENDING ,
+                    image_queued_at=timezone.now())
+                StoredFile.objects.acquire(recipe.image.name)
+                StoredFile.objects.release(previous)
+            # workers use their own connection , let them see the new image
+            transaction.on_commit(lambda: image_pipeline.submit(recipe.id))
+            return Response(seriapizer.data , status=status.HTTP_202_ACCEPTED)
 
         return Response(seriapizer.errors , status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=[ImageVariantQuerySerializer],
+        responses={
+            (200 , content_type):OpenApiTypes.BINARY
+            for _ , content_type in IMAGE_FORMATS.values()
+        },
+    )
+    @action(methods=['GET'] , detail=True , url_path='image' ,
+        content_negotiation_class=ImageContentNegotiation)
+    def image(self , request , pk=None):
+        ''' recipe image scaled down to ?width= , resized on first request '''
+        params=ImageVariantQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # only the image name is needed , skip the prefetches of get_queryset
+        recipe=get_object_or_404(
+            Recipe.objects.filter(user=request.user).only('id' , 'image') ,
+            pk=pk ,
+        )
+        if not recipe.image:
+            raise NotFound(_('recipe has no image'))
+        image_format=params.validated_data.get('format')
+        try:
+            response=variant_response(
+                request ,
+                recipe.image.name ,
+                params.validated_data['width'] ,
+                image_format or preferred_format(request) ,
+            )
+        except OSError:
+            raise NotFound(_('recipe image can not be decoded'))
+        if image_format is None:
+            patch_vary_headers(response , ['Accept'])
+        return response
+
+    @extend_schema(responses={200:OpenApiTypes.OBJECT})
+    @action(methods=['POST'] , detail=False , url_path='batch')
+    def batch(self , request):
+        ''' create , update and delete many recipes in one transaction '''
+        serializer=self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data , status=status.HTTP_200_OK)
+
+    @extend_schema(responses={200:OpenApiTypes.BINARY})
+    @action(methods=['GET'] , detail=False , url_path='export')
+    def export(self , request):
+        ''' stream the tags , ingredients and recipes of user as ndjson '''
+        response=StreamingHttpResponse(
+            export_library(request.user) , content_type=NDJSON_CONTENT_TYPE
+        )
+        response['Content-Disposition']='attachment; filename="recipes.ndjson"'
+        return response
+
+    @extend_schema(request={NDJSON_CONTENT_TYPE:OpenApiTypes.BINARY} ,
+        responses={200:OpenApiTypes.OBJECT})
+    @action(methods=['POST'] , detail=False , url_path='import' ,
+        url_name='import' , parser_classes=[NDJSONParser])
+    def import_(self , request):
+        ''' read an ndjson library from the request body in batches '''
+        try:
+            imported=import_library(request.user , request.data)
+        except LibraryImportError as e:
+            return Response(
+                {'line':e.line_number , 'errors':e.errors , 'imported':e.imported},
+                status=status.HTTP_400_BAD_REQUEST ,
+            )
+        return Response({'imported':imported} , status=status.HTTP_200_OK)
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -90,23 +222,55 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 enum=[0,1],
                 description='filter by items assigned to recipe '
             ),
-
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=['name' , 'popular'],
+                description='popular sorts by recipe_count , most used first'
+            ),
+            *FIELDSET_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELDSET_PARAMETERS),
 )
 
-class BaserecipeItem(viewsets.ModelViewSet):
-    authentication_classes=[TokenAuthentication]
+class BaserecipeItem(SparseFieldsetMixin , ConditionalGetMixin , StreamingListMixin ,
+        CachedListMixin , FastReadMixin , viewsets.ModelViewSet):
+    authentication_classes=api_authentication_classes()
     permission_classes=[IsAuthenticated]
+    pagination_class=RecipeItemCursorPagination
     def get_queryset(self):
         ''' filter auery according to auth user '''
-        queryset=self.queryset
+        queryset=self.queryset.filter(user=self.request.user)
         assinged_only=bool(int(self.request.query_params.get('assigned_only' , 0)))
         if assinged_only:
-            queryset=queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+            queryset=filter_assigned(queryset)
+        fieldset=self.get_fieldset()
+        popular=self.request.query_params.get('ordering')=='popular'
+        if fieldset is None or popular or 'recipe_count' in fieldset.names:
+            queryset=annotate_recipe_count(queryset)
+        return self.sparse_queryset(queryset.order_by('-name'))
     def perform_create(self , serializer ):
-        serializer.save(user = self.request.user)
+        item=serializer.save(user = self.request.user)
+        # a new item is not used yet , spare the count query
+        item.recipe_count=0
+
+    @extend_schema(
+        parameters=[AutocompleteQuerySerializer],
+        responses=ItemSuggestionSerializer(many=True),
+    )
+    @action(methods=['GET'] , detail=False , url_path='autocomplete')
+    def autocomplete(self , request):
+        ''' names starting with ?prefix= ignoring case , for type ahead '''
+        params=AutocompleteQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # bypasses the counted list queryset , only id and name are read
+        queryset=filter_prefix(
+            self.queryset.filter(user=request.user) ,
+            params.validated_data['prefix'] ,
+        )
+        suggestions=queryset.order_by('name').values('id' , 'name')
+        return Response(list(suggestions[:params.validated_data['limit']]))
 
 
 class TagViewSet(BaserecipeItem):
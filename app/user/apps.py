@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        # connect token cache invalidation signals
+        from user import signals  # noqa
+        # register the signing key check
+        from user import checks  # noqa
@@ -0,0 +1,237 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from rest_framework import exceptions
+from rest_framework.authentication import (BaseAuthentication ,
+    TokenAuthentication , get_authorization_header)
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from core.cache import is_shared_cache
+from user.tokens import AccessTokensDisabled , verify_access_token
+
+
+class _AuthenticationClasses:
+    '''
+    the classes of API_AUTHENTICATION_CLASSES , read again on every use as
+    the views are created before the setting can change ( override_settings )
+    '''
+
+    def __iter__(self):
+        return iter([import_string(path) for path in settings.API_AUTHENTICATION_CLASSES])
+
+
+def api_authentication_classes():
+    ''' authentication classes of the api views , see API_AUTHENTICATION_CLASSES '''
+    return _AuthenticationClasses()
+
+
+class TokenCache:
+    '''
+    bounded in process LRU of token key -> ( user , token ) with a TTL ,
+    backed by a shared django cache .
+
+    local entries remember the shared generation they were filled at ,
+    every revocation bumps it so the entries of all workers sharing the
+    backend are dropped . a local hit reads the generation again at most
+    every AUTH_TOKEN_CACHE_SYNC_INTERVAL seconds , not on every request :
+    a revocation takes effect at once in the worker that made it and
+    within that interval in the others . without a shared cache nothing
+    is cached at all .
+
+    hits return a copy , views change request.user in place ( PATCH /me )
+    and must not touch the entry other requests are served from .
+    '''
+    GENERATION_KEY='auth:token:generation'
+
+    def __init__(self):
+        self._entries=OrderedDict()
+        self._lock=threading.Lock()
+        self._generation_value=None
+        self._generation_read_at=None
+
+    @property
+    def shared(self):
+        ''' the cache of AUTH_TOKEN_CACHE_ALIAS if every worker sees it '''
+        alias=settings.AUTH_TOKEN_CACHE_ALIAS
+        return caches[alias] if alias and is_shared_cache(alias) else None
+
+    def _shared_key(self , key):
+        return f'auth:token:{key}'
+
+    def _generation(self):
+        now=time.monotonic()
+        with self._lock:
+            read_at=self._generation_read_at
+            if read_at is not None and \
+                    now-read_at < settings.AUTH_TOKEN_CACHE_SYNC_INTERVAL:
+                return self._generation_value
+        generation=self.shared.get_or_set(self.GENERATION_KEY , 0 , None)
+        with self._lock:
+            self._generation_value=generation
+            self._generation_read_at=now
+        return generation
+
+    def get(self , key):
+        if self.shared is None:
+            return None
+        generation=self._generation()
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is not None:
+                value , expires , filled_at=entry
+                if expires > time.monotonic() and filled_at==generation:
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(value)
+                del self._entries[key]
+        # unpickled , a fresh copy already
+        value=self.shared.get(self._shared_key(key))
+        if value is not None:
+            self._store_local(key , value , generation)
+        return value
+
+    def set(self , key , value):
+        if self.shared is None:
+            return
+        generation=self._generation()
+        self.shared.set(
+            self._shared_key(key) , value , settings.AUTH_TOKEN_CACHE_TTL
+        )
+        self._store_local(key , value , generation)
+
+    def _store_local(self , key , value , generation):
+        with self._lock:
+            self._entries[key]=(
+                value , time.monotonic()+settings.AUTH_TOKEN_CACHE_TTL , generation
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self , keys):
+        ''' drop tokens everywhere , immediately '''
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key , None)
+            self._generation_read_at=None
+        if self.shared is not None:
+            self.shared.delete_many([self._shared_key(key) for key in keys])
+            try:
+                self.shared.incr(self.GENERATION_KEY)
+            except ValueError:
+                self.shared.set(self.GENERATION_KEY , 1 , None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation_read_at=None
+
+
+token_cache=TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+    drop in TokenAuthentication that serves token -> user lookups from
+    token_cache instead of querying authtoken_token and core_user on
+    every request
+    '''
+
+    def authenticate_credentials(self , key):
+        cached=token_cache.get(key)
+        if cached is not None:
+            return cached
+        user , token=super().authenticate_credentials(key)
+        token_cache.set(key , (user , token))
+        return user , token
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    '''
+    authenticate "Bearer <access token>" headers with signed access tokens
+    from user.tokens without touching the database . request.user only has
+    its pk loaded , other fields are fetched on first access .
+
+    the user is not looked up , one deactivated after the token was issued
+    keeps access until the token expires ( ACCESS_TOKEN_TTL ) , only the
+    profile ( see signed_token_user ) and refreshes check is_active . a
+    deleted one is answered 401 as soon as a request needs its row , see
+    exception_handler .
+    '''
+    keyword='Bearer'
+
+    def authenticate(self , request):
+        auth=get_authorization_header(request).split()
+        if not auth or auth[0].lower()!=self.keyword.lower().encode():
+            return None
+        if len(auth)!=2:
+            raise exceptions.AuthenticationFailed(_('Invalid bearer header.'))
+        try:
+            user_id=verify_access_token(auth[1].decode())
+        except (signing.BadSignature , UnicodeError):
+            raise exceptions.AuthenticationFailed(_('Invalid or expired token.'))
+        except AccessTokensDisabled:
+            # listed without a signing key , accept nothing
+            raise exceptions.AuthenticationFailed(_('Signed tokens are disabled.'))
+
+        # a deferred instance , no query until a field besides pk is read
+        User=get_user_model()
+        user=User.from_db(User.objects.db , [User._meta.pk.attname] , [user_id])
+        return user , None
+
+    def authenticate_header(self , request):
+        return self.keyword
+
+
+def _signed_token_user_gone(request):
+    ''' whether request carries a signed token of a deleted or inactive user '''
+    if not isinstance(request.successful_authenticator , SignedTokenAuthentication):
+        return False
+    return not get_user_model().objects.filter(
+        pk=request.user.pk , is_active=True).exists()
+
+
+def signed_token_user(request):
+    '''
+    request.user with every field loaded , raise AuthenticationFailed when
+    a signed token outlived its deleted or deactivated user
+    '''
+    if not isinstance(request.successful_authenticator , SignedTokenAuthentication):
+        return request.user
+    user=get_user_model().objects.filter(pk=request.user.pk , is_active=True)\
+        .first()
+    if user is None:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    return user
+
+
+def exception_handler(exc , context):
+    '''
+    rest_framework's handler , a missing row or foreign key of a request
+    whose signed token outlived its user is answered 401 instead of 500
+    '''
+    request=context.get('request')
+    if isinstance(exc , (ObjectDoesNotExist , IntegrityError)) and \
+            request is not None and _signed_token_user_gone(request):
+        exc=exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        exc.auth_header=request.successful_authenticator.authenticate_header(request)
+    return drf_exception_handler(exc , context)
+
+
+class SignedTokenScheme(OpenApiAuthenticationExtension):
+    target_class='user.authentication.SignedTokenAuthentication'
+    name='signedTokenAuth'
+
+    def get_security_definition(self , auto_schema):
+        return {'type':'http' , 'scheme':'bearer'}
+
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error , register
+
+from user.tokens import AccessTokensDisabled , signing_key
+
+
+@register()
+def check_signing_key(app_configs , **kwargs):
+    ''' signed tokens are enabled only with a key of their own '''
+    if 'user.authentication.SignedTokenAuthentication' not in \
+            settings.API_AUTHENTICATION_CLASSES:
+        return []
+    try:
+        signing_key()
+    except AccessTokensDisabled:
+        return [Error(
+            'SignedTokenAuthentication without an ACCESS_TOKEN_SIGNING_KEY' ,
+            hint='set ACCESS_TOKEN_SIGNING_KEY to a random value of at least '
+                '32 characters or remove the class from API_AUTHENTICATION_CLASSES' ,
+            id='user.E001' ,
+        )]
+    return []
@@ -53,3 +53,13 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user']=user
         return attrs
+
+class TokenPairSerializer(serializers.Serializer):
+    ''' signed access token with its rotating refresh token '''
+    access=serializers.CharField(read_only=True)
+    refresh=serializers.CharField(read_only=True)
+    expires_in=serializers.IntegerField(read_only=True)
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh=serializers.CharField(trim_whitespace=False)
+
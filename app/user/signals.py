@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save , post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+
+
+@receiver(post_delete , sender=Token)
+def invalidate_revoked_token(sender , instance , **kwargs):
+    token_cache.invalidate([instance.key])
+
+
+@receiver(post_save , sender=get_user_model())
+def invalidate_user_tokens(sender , instance , created , **kwargs):
+    # covers deactivation and keeps the cached user object up to date
+    if not created:
+        keys=list(Token.objects.filter(user=instance).values_list('key' , flat=True))
+        if keys:
+            token_cache.invalidate(keys)
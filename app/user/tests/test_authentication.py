@@ -0,0 +1,130 @@
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase , override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+
+from user.authentication import CachedTokenAuthentication , token_cache
+
+def auth_request(key):
+    return APIRequestFactory().get('/' , HTTP_AUTHORIZATION=f'Token {key}')
+
+class CachedTokenAuthenticationTest(TestCase):
+    ''' test token lookups are cached and invalidated '''
+    def setUp(self):
+        # a cache shared by the workers , file based
+        location=tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared=self.settings(AUTH_TOKEN_CACHE_ALIAS='tokens' , CACHES={
+            **settings.CACHES ,
+            'tokens':{'BACKEND':'django.core.cache.backends.filebased.FileBasedCache' ,
+                'LOCATION':location.name} ,
+        })
+        shared.enable()
+        self.addCleanup(shared.disable)
+        token_cache.clear()
+        self.auth=CachedTokenAuthentication()
+        self.user=get_user_model().objects.create_user(
+            email='token@example.com' , password='testpass123'
+        )
+        self.token=Token.objects.create(user=self.user)
+
+    def test_second_lookup_skips_database(self):
+        user , token=self.auth.authenticate(auth_request(self.token.key))
+        with self.assertNumQueries(0):
+            cached_user , cached_token=self.auth.authenticate(
+                auth_request(self.token.key)
+            )
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token.key, self.token.key)
+
+    def test_invalid_token(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(auth_request('bad'))
+
+    def test_revoked_token_rejected(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(auth_request(self.token.key))
+
+    def test_deactivated_user_rejected(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        self.user.is_active=False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate(auth_request(self.token.key))
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_expired_entry_reloaded(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        with self.assertNumQueries(1):
+            self.auth.authenticate(auth_request(self.token.key))
+
+    @override_settings(AUTH_TOKEN_CACHE_SIZE=1)
+    def test_lru_bounded(self):
+        other=get_user_model().objects.create_user(
+            email='other@example.com' , password='testpass123'
+        )
+        other_token=Token.objects.create(user=other)
+        self.auth.authenticate(auth_request(self.token.key))
+        self.auth.authenticate(auth_request(other_token.key))
+        # only the local entries , the first one was evicted
+        caches['tokens'].delete(f'auth:token:{self.token.key}')
+        with self.assertNumQueries(1):
+            self.auth.authenticate(auth_request(self.token.key))
+
+    def test_shared_cache_fills_other_workers(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        # a worker with an empty local cache
+        token_cache.clear()
+        with self.assertNumQueries(0):
+            user , _=self.auth.authenticate(auth_request(self.token.key))
+
+        self.assertEqual(user, self.user)
+
+    def test_hits_are_copies(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        user , _=self.auth.authenticate(auth_request(self.token.key))
+        # a failed PATCH /me leaves its changes on request.user
+        user.name='changed'
+
+        cached_user , _=self.auth.authenticate(auth_request(self.token.key))
+        self.assertEqual(cached_user.name, self.user.name)
+
+    @override_settings(AUTH_TOKEN_CACHE_SYNC_INTERVAL=60)
+    def test_generation_read_once_per_interval(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        shared=caches['tokens']
+        with patch.object(type(shared) , 'get_or_set' ,
+                wraps=shared.get_or_set) as get_or_set:
+            for _ in range(3):
+                self.auth.authenticate(auth_request(self.token.key))
+
+        get_or_set.assert_not_called()
+
+    @override_settings(AUTH_TOKEN_CACHE_SYNC_INTERVAL=0)
+    def test_shared_revocation_drops_local_entries(self):
+        self.auth.authenticate(auth_request(self.token.key))
+        # revocation seen by another worker , only the shared state changes
+        caches['tokens'].incr(token_cache.GENERATION_KEY)
+        caches['tokens'].delete(f'auth:token:{self.token.key}')
+        with self.assertNumQueries(1):
+            self.auth.authenticate(auth_request(self.token.key))
+
+    def test_not_cached_without_shared_cache(self):
+        # none , or a per process backend the other workers never see
+        for alias in (None , 'default'):
+            with self.settings(AUTH_TOKEN_CACHE_ALIAS=alias):
+                self.auth.authenticate(auth_request(self.token.key))
+                with self.assertNumQueries(1):
+                    self.auth.authenticate(auth_request(self.token.key))
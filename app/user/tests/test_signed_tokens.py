@@ -0,0 +1,259 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.test import (SimpleTestCase , TestCase , TransactionTestCase ,
+    override_settings)
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import RefreshToken
+from user.checks import check_signing_key
+from user.tokens import ACCESS_SALT , issue_access_token
+
+SIGNED_TOKEN_URL=reverse('user:signed-token')
+REFRESH_URL=reverse('user:refresh-token')
+REVOKE_URL=reverse('user:revoke-token')
+ME_URL=reverse('user:me')
+RECIPE_URL=reverse('recipe:recipe-list')
+TAGS_URL=reverse('recipe:tag-list')
+
+SIGNING_KEY='signing-key-for-the-tests-only-0123456789'
+TOKEN_AUTHENTICATION='rest_framework.authentication.TokenAuthentication'
+SIGNED_AUTHENTICATION='user.authentication.SignedTokenAuthentication'
+
+@override_settings(ACCESS_TOKEN_SIGNING_KEY=SIGNING_KEY ,
+    API_AUTHENTICATION_CLASSES=[TOKEN_AUTHENTICATION , SIGNED_AUTHENTICATION])
+class SignedTokenApiTest(TestCase):
+    ''' test signed access tokens and refresh token rotation '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='signed@example.com' , password='testpass123' , name='signed'
+        )
+
+    def _login(self):
+        res=self.client.post(SIGNED_TOKEN_URL , {
+            'email':'signed@example.com' , 'password':'testpass123'
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_returns_pair(self):
+        pair=self._login()
+
+        self.assertIn('access', pair)
+        self.assertIn('refresh', pair)
+        self.assertEqual(pair['expires_in'], 300)
+
+    def test_bad_credentials(self):
+        res=self.client.post(SIGNED_TOKEN_URL , {
+            'email':'signed@example.com' , 'password':'wrong'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(API_CONDITIONAL_GET=True)
+    def test_access_token_without_db_hit(self):
+        access=issue_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        etag=self.client.get(RECIPE_URL)['ETag']
+        with self.assertNumQueries(0):
+            res=self.client.get(RECIPE_URL , HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_access_token_profile(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._login()["access"]}')
+        res=self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(res.data['name'], 'signed')
+
+    def test_access_token_profile_update(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self._login()["access"]}')
+        res=self.client.patch(ME_URL , {'name':'renamed'})
+        self.user.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.name, 'renamed')
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_access_token_of_deleted_user(self):
+        access=issue_access_token(self.user)
+        self.user.delete()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        for res in (
+            self.client.get(ME_URL),
+            self.client.patch(ME_URL , {'name':'renamed'}),
+        ):
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertIn('WWW-Authenticate', res)
+
+    def test_access_token_of_inactive_user(self):
+        access=issue_access_token(self.user)
+        self.user.is_active=False
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        # not looked up elsewhere until the token expires
+        self.assertEqual(
+            self.client.get(RECIPE_URL).status_code, status.HTTP_200_OK
+        )
+
+    def test_tampered_or_expired_access_token(self):
+        access=issue_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}x')
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        later=timezone.now().timestamp()+301
+        with patch('django.core.signing.time.time' , return_value=later):
+            res=self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_db_token_still_works(self):
+        token=Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+    def test_refresh_rotates(self):
+        pair=self._login()
+        res=self.client.post(REFRESH_URL , {'refresh':pair['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], pair['refresh'])
+        self.assertEqual(
+            RefreshToken.objects.filter(user=self.user , revoked_at__isnull=True).count(),
+            1
+        )
+
+    def test_reused_refresh_revokes_family(self):
+        pair=self._login()
+        rotated=self.client.post(REFRESH_URL , {'refresh':pair['refresh']}).data
+        reused=self.client.post(REFRESH_URL , {'refresh':pair['refresh']})
+        res=self.client.post(REFRESH_URL , {'refresh':rotated['refresh']})
+
+        self.assertEqual(reused.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_refresh(self):
+        pair=self._login()
+        RefreshToken.objects.update(expires_at=timezone.now()-timedelta(seconds=1))
+        res=self.client.post(REFRESH_URL , {'refresh':pair['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_cannot_refresh(self):
+        pair=self._login()
+        self.user.is_active=False
+        self.user.save()
+        res=self.client.post(REFRESH_URL , {'refresh':pair['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke(self):
+        pair=self._login()
+        res=self.client.post(REVOKE_URL , {'refresh':pair['refresh']})
+        refreshed=self.client.post(REFRESH_URL , {'refresh':pair['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(refreshed.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ACCESS_TOKEN_TTL=60)
+    def test_ttl_setting(self):
+        self.assertEqual(self._login()['expires_in'], 60)
+
+    def test_secret_key_signature_rejected(self):
+        forged=signing.dumps({'uid':self.user.pk} , salt=ACCESS_SALT , compress=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {forged}')
+
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+@override_settings(ACCESS_TOKEN_SIGNING_KEY=SIGNING_KEY ,
+    API_AUTHENTICATION_CLASSES=[TOKEN_AUTHENTICATION , SIGNED_AUTHENTICATION])
+class DeletedUserWriteTest(TransactionTestCase):
+    ''' foreign keys are only checked on commit , outside of TestCase '''
+
+    def test_create_with_access_token_of_deleted_user(self):
+        user=get_user_model().objects.create_user(
+            email='gone@example.com' , password='testpass123'
+        )
+        access=issue_access_token(user)
+        user.delete()
+        client=APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        res=client.post(TAGS_URL , {'name':'veg'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Bearer')
+
+
+class SignedTokensDisabledTest(TestCase):
+    ''' without a signing key no access token is issued or accepted '''
+    def setUp(self):
+        self.client=APIClient()
+        self.user=get_user_model().objects.create_user(
+            email='signed@example.com' , password='testpass123'
+        )
+
+    def test_login_unavailable(self):
+        res=self.client.post(SIGNED_TOKEN_URL , {
+            'email':'signed@example.com' , 'password':'testpass123'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(RefreshToken.objects.exists())
+
+    def test_bearer_not_accepted_by_default(self):
+        with self.settings(ACCESS_TOKEN_SIGNING_KEY=SIGNING_KEY):
+            access=issue_access_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    @override_settings(ACCESS_TOKEN_SIGNING_KEY='short' ,
+        API_AUTHENTICATION_CLASSES=[SIGNED_AUTHENTICATION])
+    def test_short_key_fails_closed(self):
+        forged=signing.dumps({'uid':self.user.pk} , key='short' ,
+            salt=ACCESS_SALT , compress=False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {forged}')
+
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+class SigningKeyCheckTest(SimpleTestCase):
+
+    @override_settings(ACCESS_TOKEN_SIGNING_KEY='' ,
+        API_AUTHENTICATION_CLASSES=[SIGNED_AUTHENTICATION])
+    def test_missing_key_is_an_error(self):
+        self.assertEqual(
+            [message.id for message in check_signing_key(None)], ['user.E001']
+        )
+
+    @override_settings(ACCESS_TOKEN_SIGNING_KEY=SIGNING_KEY ,
+        API_AUTHENTICATION_CLASSES=[SIGNED_AUTHENTICATION])
+    def test_key_set(self):
+        self.assertEqual(check_signing_key(None), [])
+
+    @override_settings(ACCESS_TOKEN_SIGNING_KEY='' ,
+        API_AUTHENTICATION_CLASSES=[TOKEN_AUTHENTICATION])
+    def test_scheme_off(self):
+        self.assertEqual(check_signing_key(None), [])
@@ -0,0 +1,109 @@
+'''
+stateless access tokens and rotating refresh tokens .
+
+access tokens are HMAC signed ( django.core.signing ) with their own
+ACCESS_TOKEN_SIGNING_KEY and short lived , verifying one needs no database
+access . refresh tokens are random ,
+stored hashed in core.RefreshToken and single use : every refresh revokes
+the presented token and issues a new one of the same family .
+'''
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import RefreshToken
+
+ACCESS_SALT='user.access-token'
+MIN_SIGNING_KEY_LENGTH=32
+
+
+class InvalidRefreshToken(Exception):
+    ''' refresh token unknown , expired , revoked or of an inactive user '''
+
+
+class AccessTokensDisabled(Exception):
+    ''' ACCESS_TOKEN_SIGNING_KEY is missing or too short '''
+
+
+def signing_key():
+    ''' the key of access tokens , raise AccessTokensDisabled without one '''
+    key=settings.ACCESS_TOKEN_SIGNING_KEY
+    # never fall back to SECRET_KEY , a default one would let anyone sign
+    if len(key) < MIN_SIGNING_KEY_LENGTH:
+        raise AccessTokensDisabled()
+    return key
+
+
+def issue_access_token(user):
+    return signing.dumps({'uid':user.pk} , key=signing_key() , salt=ACCESS_SALT ,
+        compress=False)
+
+
+def verify_access_token(token):
+    '''
+    return the user id of a valid token , raise signing.BadSignature or
+    AccessTokensDisabled
+    '''
+    claims=signing.loads(token , key=signing_key() , salt=ACCESS_SALT ,
+        max_age=settings.ACCESS_TOKEN_TTL)
+    return claims['uid']
+
+
+def _hash(raw):
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def issue_token_pair(user , family=None):
+    # before anything is stored
+    access=issue_access_token(user)
+    raw=secrets.token_urlsafe(32)
+    refresh=RefreshToken(
+        user=user ,
+        token_hash=_hash(raw) ,
+        expires_at=timezone.now()+timedelta(seconds=settings.REFRESH_TOKEN_TTL) ,
+    )
+    if family is not None:
+        refresh.family=family
+    refresh.save()
+    return {
+        'access':access ,
+        'refresh':raw ,
+        'expires_in':settings.ACCESS_TOKEN_TTL ,
+    }
+
+
+def rotate_refresh_token(raw):
+    ''' revoke raw and return a new token pair of the same family '''
+    now=timezone.now()
+    with transaction.atomic():
+        refresh=RefreshToken.objects.select_for_update().select_related('user')\
+            .filter(token_hash=_hash(raw)).first()
+        if refresh is None:
+            raise InvalidRefreshToken()
+        if refresh.revoked_at is None:
+            if refresh.expires_at <= now or not refresh.user.is_active:
+                raise InvalidRefreshToken()
+            refresh.revoked_at=now
+            refresh.save(update_fields=['revoked_at'])
+            return issue_token_pair(refresh.user , family=refresh.family)
+    # a rotated token came back , treat the family as stolen
+    revoke_family(refresh.family)
+    raise InvalidRefreshToken()
+
+
+def revoke_family(family):
+    RefreshToken.objects.filter(family=family , revoked_at__isnull=True)\
+        .update(revoked_at=timezone.now())
+
+
+def revoke_refresh_token(raw):
+    ''' log out , revoke raw and every token rotated from the same login '''
+    refresh=RefreshToken.objects.filter(token_hash=_hash(raw)).first()
+    if refresh is None:
+        raise InvalidRefreshToken()
+    revoke_family(refresh.family)
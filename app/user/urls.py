@@ -7,6 +7,9 @@ urlpatterns=[
 
 path('create/' ,UserCreateView.as_view() , name='create'),
 path('token/' ,AuthTokenView.as_view() , name='token'),
+path('token/signed/' ,SignedTokenView.as_view() , name='signed-token'),
+path('token/refresh/' ,RefreshTokenView.as_view() , name='refresh-token'),
+path('token/revoke/' ,RevokeTokenView.as_view() , name='revoke-token'),
 path('me/' ,ManageUserView.as_view() , name='me'),
 
 
@@ -1,9 +1,23 @@
-from rest_framework import generics,authentication,permissions
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics,permissions,status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import APIException , AuthenticationFailed
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
 
-from user.serializers import (UserSerializer,AuthTokenSerializer)
+from user.serializers import (UserSerializer,AuthTokenSerializer,
+    TokenPairSerializer,RefreshTokenSerializer)
+from user.authentication import api_authentication_classes , signed_token_user
+from user.tokens import (issue_token_pair , rotate_refresh_token ,
+    revoke_refresh_token , InvalidRefreshToken , AccessTokensDisabled)
+
+class SignedTokensUnavailable(APIException):
+    ''' no ACCESS_TOKEN_SIGNING_KEY , signed tokens are neither issued nor accepted '''
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail=_('Signed tokens are disabled.')
+    default_code='signed_tokens_disabled'
 
 class UserCreateView(generics.CreateAPIView):
     """ Crete a new user in system """
@@ -13,13 +27,63 @@ class AuthTokenView(ObtainAuthToken):
     '''create token for user '''
     serializer_class=AuthTokenSerializer # to validate auth based on email not in name
     renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES
+    parser_classes=api_settings.DEFAULT_PARSER_CLASSES
+
+class SignedTokenView(generics.GenericAPIView):
+    ''' log in and get a signed access token with a refresh token '''
+    serializer_class=AuthTokenSerializer
+    # only to answer failures with 401 and a WWW-Authenticate header
+    authentication_classes=api_authentication_classes()
+
+    @extend_schema(responses=TokenPairSerializer)
+    def post(self , request):
+        serializer=self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            pair=issue_token_pair(serializer.validated_data['user'])
+        except AccessTokensDisabled:
+            raise SignedTokensUnavailable()
+        return Response(pair , status=status.HTTP_200_OK)
+
+class RefreshTokenView(generics.GenericAPIView):
+    ''' exchange a refresh token for a new token pair , once '''
+    serializer_class=RefreshTokenSerializer
+    authentication_classes=api_authentication_classes()
+
+    @extend_schema(responses=TokenPairSerializer)
+    def post(self , request):
+        serializer=self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            pair=rotate_refresh_token(serializer.validated_data['refresh'])
+        except InvalidRefreshToken:
+            raise AuthenticationFailed(_('Invalid or expired refresh token.'))
+        except AccessTokensDisabled:
+            raise SignedTokensUnavailable()
+        return Response(pair , status=status.HTTP_200_OK)
+
+class RevokeTokenView(generics.GenericAPIView):
+    ''' log out , revoke a refresh token and the ones rotated with it '''
+    serializer_class=RefreshTokenSerializer
+    authentication_classes=api_authentication_classes()
+
+    @extend_schema(responses={204:None})
+    def post(self , request):
+        serializer=self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            revoke_refresh_token(serializer.validated_data['refresh'])
+        except InvalidRefreshToken:
+            raise AuthenticationFailed(_('Invalid refresh token.'))
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     ''' manage auth user , methid get put patch  '''
     serializer_class=UserSerializer
-    authentication_classes=[authentication.TokenAuthentication]
+    authentication_classes=api_authentication_classes()
     permission_classes=[permissions.IsAuthenticated]
 
     def get_object(self):
         ''' retireve and return authenticared user '''
-        return self.request.user
\ No newline at end of file
+        # signed tokens only carry the pk , of a user that may be gone
+        return signed_token_user(self.request)
\ No newline at end of file
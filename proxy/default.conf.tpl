@@ -5,6 +5,18 @@ server {
         alias /vol/static;
     }
 
+    # the variant cache shares the volume , only served through the
+    # internal location below
+    location /static/cache/ {
+        deny all;
+    }
+
+    # resized recipe images , only reachable through X-Accel-Redirect
+    location /internal/image-variants/ {
+        internal;
+        alias /vol/static/cache/variants/;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
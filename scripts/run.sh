@@ -4,4 +4,7 @@ set -e
 
 python manage.py collectstatic --noinput
 python manage.py migrate
+# images left pending when the previous container stopped , in the
+# background so a large backlog or a failure does not hold up the server
+python manage.py process_images &
 uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file